@@ -0,0 +1,115 @@
+"""每个群聊一个执行者
+
+每个群聊对应一个队列及一个处理协程, 同一群聊的命令及提醒按到达顺序逐个执行,
+不同群聊之间并发执行. 空闲超过 idle_timeout 秒的执行者自动回收, 下次有任务时重新创建.
+每个群聊的队列长度导出为 room_queue_depth 指标.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from logger import logger
+from metrics import Gauge, metrics
+from settings import Config
+
+Job = Callable[[], Awaitable]
+
+
+class RoomActor:
+    def __init__(self, room: str, max_queue: int):
+        self.room = room
+        self.queue: "asyncio.Queue[Tuple[Job, asyncio.Future]]" = asyncio.Queue(
+            max_queue
+        )
+        self.task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self.queue.qsize()
+
+
+class RoomActors:
+    def __init__(
+        self,
+        idle_timeout: float = Config.ACTOR_IDLE_TIMEOUT,
+        max_queue: int = Config.ACTOR_QUEUE_SIZE,
+    ):
+        """
+        :param idle_timeout: 执行者空闲该秒数后回收
+        :param max_queue: 每个群聊最多排队的任务数, 超出时拒绝
+        """
+        self.idle_timeout = idle_timeout
+        self.max_queue = max_queue
+        self._actors: Dict[str, RoomActor] = {}
+        metrics.register("room_actors", Gauge(self.__len__), "当前存在的群聊执行者数")
+
+    def __len__(self) -> int:
+        return len(self._actors)
+
+    def __contains__(self, room: str) -> bool:
+        return room in self._actors
+
+    def depth(self, room: str) -> int:
+        actor = self._actors.get(room)
+        return len(actor) if actor is not None else 0
+
+    def submit(self, room: str, job: Job) -> "asyncio.Future[Any]":
+        """放入群聊的队列, 返回的 future 在执行完成后得到结果"""
+        actor = self._actors.get(room)
+        if actor is None:
+            actor = self._actors[room] = RoomActor(room, self.max_queue)
+            actor.task = asyncio.create_task(self._work(actor))
+            metrics.register(
+                "room_queue_depth",
+                Gauge(actor.__len__),
+                "群聊执行者中排队的任务数",
+                room=room,
+            )
+        future = asyncio.get_event_loop().create_future()
+        try:
+            actor.queue.put_nowait((job, future))
+        except asyncio.QueueFull:
+            raise AssertionError("当前群聊待处理的消息过多, 请稍后再试")
+        return future
+
+    async def _work(self, actor: RoomActor):
+        while True:
+            try:
+                job, future = await asyncio.wait_for(
+                    actor.queue.get(), self.idle_timeout
+                )
+            except asyncio.TimeoutError:
+                # 取出与回收之间没有 await, 不会有新任务放入
+                if actor.queue.empty():
+                    self._reap(actor)
+                    return
+                continue
+
+            if future.cancelled():
+                continue
+            try:
+                result = await job()
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+
+    def _reap(self, actor: RoomActor):
+        if self._actors.get(actor.room) is actor:
+            del self._actors[actor.room]
+        metrics.unregister("room_queue_depth", room=actor.room)
+        logger.debug("reap room actor: %s", actor.room)
+
+    async def close(self):
+        """取消全部执行者, 未执行的任务随之取消"""
+        actors, self._actors = list(self._actors.values()), {}
+        for actor in actors:
+            actor.task.cancel()
+            while not actor.queue.empty():
+                actor.queue.get_nowait()[1].cancel()
+            metrics.unregister("room_queue_depth", room=actor.room)
+        await asyncio.gather(*(a.task for a in actors), return_exceptions=True)
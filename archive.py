@@ -0,0 +1,230 @@
+"""提醒记录及已结束任务的归档
+
+提醒记录每次触发写入一条且从不删除, 已完成/已取消的任务也一直保留, 热表会越来越大.
+定期把 retention_days 天前的提醒记录, 以及其后不再被引用的已结束任务, 按月移入归档数据库
+(archive/2021-07.db), 再对主数据库做增量 VACUUM 释放空间.
+完整 VACUUM 会长时间独占数据库, 运行中不做; 非增量模式的旧数据库需停机后用 scripts.vacuum 转换.
+归档的提醒记录中冗余保存群聊及任务ID, 查询群聊的提醒历史时依次读取主数据库及各月归档.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from peewee import (
+    JOIN,
+    CharField,
+    IntegerField,
+    Model,
+    SqliteDatabase,
+    TextField,
+    chunked,
+    fn,
+)
+
+import dao
+from dao import ScheduleRecordDao
+from logger import logger
+from models import INCREMENTAL, TableScheduleJob, TableScheduleRecord
+from settings import Config
+from storage import BATCH_SIZE, RoomRecord, SqliteStorage
+from typevar import JobState
+
+
+class ArchivedJob(Model):
+    id = IntegerField(primary_key=True, help_text="真实ID")
+    job_id = IntegerField(help_text="任务ID")
+    room = TextField(index=True, help_text="群聊房间")
+    name = CharField(help_text="任务名称")
+    start_time = IntegerField(help_text="开始时间")
+    next_run_time = IntegerField(help_text="最后一次执行时间")
+    schedule_info = CharField(null=True, help_text="周期类型或天数")
+    anchor_time = IntegerField(null=True, help_text="周期任务最初设定的执行时间")
+    state = IntegerField(help_text="任务执行状态")
+    remind_msg = TextField(help_text="定时提醒内容")
+
+
+class ArchivedRecord(Model):
+    id = IntegerField(primary_key=True)
+    job_real_id = IntegerField(help_text="任务真实ID")
+    room = TextField(null=True, help_text="群聊房间")
+    job_id = IntegerField(null=True, help_text="任务ID")
+    remind_msg = TextField(help_text="本次提醒内容")
+    create_time = IntegerField(help_text="执行时间")
+
+    class Meta:
+        indexes = ((("room", "create_time"), False),)
+
+
+ARCHIVE_MODELS = [ArchivedJob, ArchivedRecord]
+
+# 归档数据库通过 bind_ctx 绑定模型, 同一时间只能操作一个
+_archive_lock = threading.Lock()
+
+
+def _month(timestamp: int) -> str:
+    return time.strftime("%Y-%m", time.localtime(timestamp))
+
+
+class Archiver:
+    def __init__(
+        self,
+        directory: str = Config.ARCHIVE_DIR,
+        retention_days: int = Config.ARCHIVE_RETENTION_DAYS,
+        vacuum_pages: int = Config.ARCHIVE_VACUUM_PAGES,
+        batch_size: int = 1000,
+    ):
+        """
+        :param directory: 归档数据库所在目录
+        :param retention_days: 主数据库中保留最近多少天的提醒记录, 0为不归档
+        :param vacuum_pages: 每次增量 VACUUM 最多释放的页数
+        :param batch_size: 每批移动的行数, 控制单个事务的大小
+        """
+        self.directory = directory
+        self.retention_days = retention_days
+        self.vacuum_pages = vacuum_pages
+        self.batch_size = batch_size
+
+    @property
+    def enabled(self) -> bool:
+        # 归档基于 sqlite 主数据库
+        return self.retention_days > 0 and isinstance(dao.storage, SqliteStorage)
+
+    def months(self) -> List[str]:
+        """已有的归档月份, 由近及远"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            (name[:-3] for name in os.listdir(self.directory) if name.endswith(".db")),
+            reverse=True,
+        )
+
+    def _write(self, model: Model, rows_by_month: Dict[str, List[dict]]):
+        """写入归档, 按主键覆盖, 移动中途退出后重新归档不会重复"""
+        os.makedirs(self.directory, exist_ok=True)
+        for month, rows in sorted(rows_by_month.items()):
+            archive_db = SqliteDatabase(os.path.join(self.directory, f"{month}.db"))
+            with _archive_lock, archive_db.bind_ctx(ARCHIVE_MODELS), archive_db:
+                archive_db.create_tables(ARCHIVE_MODELS)
+                with archive_db.atomic():
+                    for batch in chunked(rows, BATCH_SIZE // len(rows[0])):
+                        model.insert_many(batch).on_conflict_replace().execute()
+
+    @staticmethod
+    def _delete(model: Model, ids: List[int]):
+        for batch in chunked(ids, BATCH_SIZE):
+            model.delete().where(model.id.in_(batch)).execute()
+
+    def archive_records(self, cutoff: int) -> int:
+        """移动 cutoff 之前的提醒记录"""
+        record, job = TableScheduleRecord, TableScheduleJob
+        total = 0
+        while True:
+            rows = list(
+                record.select(
+                    record.id,
+                    record.job_real_id,
+                    job.room,
+                    job.job_id,
+                    record.remind_msg,
+                    record.create_time,
+                )
+                .join(job, JOIN.LEFT_OUTER, on=(record.job_real_id == job.id))
+                .where(record.create_time < cutoff)
+                .order_by(record.id)
+                .limit(self.batch_size)
+                .dicts()
+            )
+            if not rows:
+                return total
+            by_month = defaultdict(list)
+            for row in rows:
+                by_month[_month(row["create_time"])].append(row)
+            self._write(ArchivedRecord, by_month)
+            self._delete(record, [row["id"] for row in rows])
+            total += len(rows)
+
+    def archive_jobs(self, cutoff: int) -> int:
+        """移动 cutoff 之前结束且不再被提醒记录引用的任务
+        每个群聊任务ID最大的任务保留在主数据库, 避免新任务复用任务ID
+        """
+        record, job = TableScheduleRecord, TableScheduleJob
+        latest = job.select(fn.MAX(job.id)).group_by(job.room)
+        referenced = record.select(record.id).where(record.job_real_id == job.id)
+        total = 0
+        while True:
+            rows = list(
+                # 只读取归档表中有的字段
+                job.select(
+                    *(job._meta.fields[name] for name in ArchivedJob._meta.fields)
+                )
+                .where(
+                    job.state != JobState.ready,
+                    job.next_run_time < cutoff,
+                    job.id.not_in(latest),
+                    ~fn.EXISTS(referenced),
+                )
+                .order_by(job.id)
+                .limit(self.batch_size)
+                .dicts()
+            )
+            if not rows:
+                return total
+            by_month = defaultdict(list)
+            for row in rows:
+                by_month[_month(row["next_run_time"])].append(row)
+            self._write(ArchivedJob, by_month)
+            self._delete(job, [row["id"] for row in rows])
+            total += len(rows)
+
+    def vacuum(self) -> int:
+        """增量 VACUUM, 最多释放 vacuum_pages 页 -> 释放的页数"""
+        db = TableScheduleJob._meta.database
+        if db.pragma("auto_vacuum") != INCREMENTAL:
+            logger.warning("数据库不是增量 VACUUM 模式, 需停机后执行 scripts.vacuum 转换")
+            return 0
+        free_pages = db.pragma("freelist_count")
+        # 每一步释放一页, 该语句没有结果行, execute 只执行一步, 需用 executescript 执行完
+        db.connection().executescript(f"PRAGMA incremental_vacuum({self.vacuum_pages})")
+        return free_pages - db.pragma("freelist_count")
+
+    def run(self, now: float = None) -> Tuple[int, int]:
+        """执行一次归档 -> (归档的提醒记录数, 归档的任务数)"""
+        if not self.enabled:
+            return 0, 0
+        if now is None:
+            now = time.time()
+        cutoff = int(now) - self.retention_days * 86400
+        records = self.archive_records(cutoff)
+        jobs = self.archive_jobs(cutoff)
+        self.vacuum()
+        logger.info(
+            "archive %s records, %s jobs before %s", records, jobs, _month(cutoff)
+        )
+        return records, jobs
+
+    def get_room_history(self, room: str, limit: int) -> List[RoomRecord]:
+        """群聊最近的提醒记录, 包括已归档的, 按时间倒序"""
+        ret = ScheduleRecordDao.get_room_records(room, limit)
+        for month in self.months():
+            if len(ret) >= limit:
+                break
+            archive_db = SqliteDatabase(os.path.join(self.directory, f"{month}.db"))
+            with _archive_lock, archive_db.bind_ctx(ARCHIVE_MODELS), archive_db:
+                query = (
+                    ArchivedRecord.select(
+                        ArchivedRecord.job_id,
+                        ArchivedRecord.remind_msg,
+                        ArchivedRecord.create_time,
+                    )
+                    .where(ArchivedRecord.room == room)
+                    .order_by(
+                        ArchivedRecord.create_time.desc(), ArchivedRecord.id.desc()
+                    )
+                    .limit(limit - len(ret))
+                    .tuples()
+                )
+                ret.extend(RoomRecord(*row) for row in query)
+        return ret
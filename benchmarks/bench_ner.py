@@ -0,0 +1,228 @@
+"""时间识别的性能测试
+分别测试 NerUtil.extract_time / ZHDatetimeExtractor.parse / ZHNumberExtractor.parse_datetime_num
+的吞吐量, p50/p99 延迟及每次调用的内存分配峰值, 与保存的基准比较, 超出容差时返回非零.
+
+python -m benchmarks.bench_ner              # 与基准比较
+python -m benchmarks.bench_ner --update     # 更新基准
+基准与机器相关, 更换机器后需要先更新基准.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from ner.dtime.dtime import ZHDatetimeExtractor
+from ner.number import ZHNumberExtractor
+from utils import NerUtil, TimeUtil
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "bench_ner.json")
+SEED = 20210707
+NOW = datetime(2021, 7, 7, 15)
+
+ZH_DIGITS = "零一二三四五六七八九"
+PERIODS = ["上午", "下午", "晚上", "早上", "中午", ""]
+WEEKDAYS = "一二三四五六日"
+HOLIDAYS = ["元旦", "春节", "清明节", "劳动节", "端午节", "中秋节", "国庆节", "除夕"]
+
+
+def zh_number(n: int) -> str:
+    """1-99 的中文数字"""
+    tens, ones = divmod(n, 10)
+    if not tens:
+        return ZH_DIGITS[ones]
+    return f"{'' if tens == 1 else ZH_DIGITS[tens]}十{ZH_DIGITS[ones] if ones else ''}"
+
+
+def _num(rnd: random.Random, low: int, high: int) -> str:
+    """随机使用中文数字或阿拉伯数字"""
+    n = rnd.randint(low, high)
+    return zh_number(n) if rnd.random() < 0.5 else str(n)
+
+
+def _time(rnd: random.Random) -> str:
+    minute = rnd.choice(["", "半", f"{_num(rnd, 1, 59)}分", "一刻"])
+    return f"{rnd.choice(PERIODS)}{_num(rnd, 1, 11)}点{minute}"
+
+
+CATEGORIES: Dict[str, List[Callable[[random.Random], str]]] = {
+    "relative": [
+        lambda r: f"{_num(r, 1, 30)}天后",
+        lambda r: f"{_num(r, 1, 12)}个小时后",
+        lambda r: f"{_num(r, 1, 59)}分钟后",
+        lambda r: f"明天{_time(r)}",
+        lambda r: f"后天{_time(r)}",
+        lambda r: f"下周{r.choice(WEEKDAYS)}{_time(r)}",
+        lambda r: f"周{r.choice(WEEKDAYS)}{_time(r)}",
+        lambda r: f"今晚{_num(r, 7, 11)}点",
+    ],
+    "weekly": [
+        lambda r: f"每周{r.choice(WEEKDAYS)}{_time(r)}",
+        lambda r: f"每天{_time(r)}",
+        lambda r: f"每{_num(r, 2, 30)}天",
+    ],
+    "monthly": [
+        lambda r: f"每月{_num(r, 1, 28)}号{_time(r)}",
+        lambda r: f"每年{_num(r, 1, 12)}月{_num(r, 1, 28)}号",
+        lambda r: f"下个月{_num(r, 1, 28)}号",
+        lambda r: f"{_num(r, 1, 12)}月{_num(r, 1, 28)}日{_time(r)}",
+    ],
+    "holiday": [
+        lambda r: f"{r.choice(HOLIDAYS)}",
+        lambda r: f"明年{r.choice(HOLIDAYS)}{_time(r)}",
+        lambda r: f"{r.randint(2022, 2030)}年{r.choice(HOLIDAYS)}",
+    ],
+    "mixed": [
+        lambda r: f"{r.randint(2022, 2030)}年{_num(r, 1, 12)}月{_num(r, 1, 28)}号{_time(r)}",
+        lambda r: f"{_num(r, 1, 12)}月{r.randint(1, 28)}号{_num(r, 1, 23)}:{r.randint(10, 59)}",
+        lambda r: f"提醒我{_num(r, 1, 5)}天后{_time(r)}去开会",
+    ],
+}
+
+
+def build_corpus(size: int = 1000, seed: int = SEED) -> List[str]:
+    rnd = random.Random(seed)
+    generators = [g for gs in CATEGORIES.values() for g in gs]
+    return [rnd.choice(generators)(rnd) for _ in range(size)]
+
+
+def _call(func: Callable[[str], object], text: str) -> bool:
+    try:
+        func(text)
+        return True
+    except Exception:
+        return False
+
+
+def measure(func: Callable[[str], object], corpus: List[str], repeat: int) -> dict:
+    for text in corpus[:100]:
+        _call(func, text)
+
+    best_total, latencies, errors = None, [], 0
+    for _ in range(repeat):
+        round_latencies = []
+        errors = 0
+        start = time.perf_counter()
+        for text in corpus:
+            t0 = time.perf_counter_ns()
+            errors += not _call(func, text)
+            round_latencies.append(time.perf_counter_ns() - t0)
+        total = time.perf_counter() - start
+        if best_total is None or total < best_total:
+            best_total, latencies = total, round_latencies
+    latencies.sort()
+
+    peaks = []
+    tracemalloc.start()
+    for text in corpus:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        _call(func, text)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return {
+        "ops": len(corpus) / best_total,
+        "p50_us": latencies[len(latencies) // 2] / 1000,
+        "p99_us": latencies[int(len(latencies) * 0.99)] / 1000,
+        "alloc_kb": sum(peaks) / len(peaks) / 1024,
+        "errors": errors,
+    }
+
+
+def targets() -> Dict[str, Callable[[str], object]]:
+    # 固定当前时间, 保证每次识别结果一致
+    TimeUtil.now_datetime = staticmethod(lambda: NOW)
+    ner = NerUtil()
+    return {
+        "NerUtil.extract_time": ner.extract_time,
+        "ZHDatetimeExtractor.parse": ZHDatetimeExtractor(now_func=lambda: NOW).parse,
+        "ZHNumberExtractor.parse_datetime_num": ZHNumberExtractor().parse_datetime_num,
+    }
+
+
+# 越小越好的指标, 吞吐量越大越好
+LOWER_IS_BETTER = ("p50_us", "p99_us", "alloc_kb")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """-> 超出容差的指标"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for key in LOWER_IS_BETTER:
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(
+                    f"{name} {key}: {base[key]:.1f} -> {result[key]:.1f}"
+                )
+        if result["ops"] < base["ops"] / (1 + tolerance):
+            regressions.append(f"{name} ops: {base['ops']:.0f} -> {result['ops']:.0f}")
+        if result["errors"] != base["errors"]:
+            regressions.append(
+                f"{name} errors: {base['errors']} -> {result['errors']}, 识别结果有变化"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="时间识别的性能测试")
+    parser.add_argument("--size", type=int, default=1000, help="语料条数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数, 取最快的一次")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="允许的退化比例")
+    parser.add_argument("--update", action="store_true", help="用本次结果更新基准")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    corpus = build_corpus(args.size)
+    results = {
+        name: measure(func, corpus, args.repeat) for name, func in targets().items()
+    }
+
+    print(
+        f"{'':<40}{'ops/s':>10}{'p50(us)':>10}{'p99(us)':>10}{'alloc(KB)':>11}{'errors':>8}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<40}{r['ops']:>10.0f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}"
+            f"{r['alloc_kb']:>11.1f}{r['errors']:>8}"
+        )
+
+    machine = {"python": platform.python_version(), "platform": platform.platform()}
+    if args.update:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(
+                {"machine": machine, "size": args.size, "results": results}, f, indent=2
+            )
+        print(f"基准已更新: {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("没有基准, 请先运行 --update")
+        return 1
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    if baseline.get("size") != args.size:
+        print(f"语料条数与基准不同({baseline.get('size')}), 不比较")
+        return 1
+    if baseline.get("machine") != machine:
+        print(f"基准来自不同环境: {baseline.get('machine')}")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("性能退化:\n" + "\n".join(regressions))
+        return 1
+    print("与基准相比无退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""识别结果类型的性能对比: pydantic 模型 vs NamedTuple
+先用 ZHDatetimeExtractor / ZHNumberExtractor 识别语料得到结果, 再分别以
+带校验的 pydantic 模型(旧的构造方式) / NamedTuple / to_model() 重新构造,
+比较每个结果的构造耗时, 以及识别的端到端耗时.
+python -m benchmarks.bench_ner_models
+"""
+
+import logging
+import timeit
+from typing import Callable, List
+
+from benchmarks.bench_ner import NOW, build_corpus
+from ner.dtime.dtime import ZHDatetimeExtractor
+from ner.models import Datetime, DatetimeResult, Number
+from ner.number import ZHNumberExtractor
+
+
+def _parse_all(parse: Callable[[str], list], corpus: List[str]) -> list:
+    results = []
+    for text in corpus:
+        try:
+            results.extend(parse(text))
+        except Exception:
+            pass
+    return results
+
+
+def _validate(result) -> object:
+    """旧的构造方式: 由字典构造并校验"""
+    data = result._asdict()
+    if isinstance(result, DatetimeResult):
+        data["values"] = [v._asdict() for v in result.values]
+        return Datetime(**data)
+    return Number(**data)
+
+
+def _per_item_us(func: Callable[[], object], items: int, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number / items * 1e6
+
+
+def bench(size: int = 1000, number: int = 5):
+    logging.disable(logging.INFO)
+    corpus = build_corpus(size)
+    extractors = {
+        "datetime": ZHDatetimeExtractor(now_func=lambda: NOW).parse,
+        "number": ZHNumberExtractor().parse,
+    }
+    print(
+        f"{'类型':<10}{'结果数':>8}{'pydantic(us)':>14}{'NamedTuple(us)':>16}"
+        f"{'to_model(us)':>14}{'识别(us)':>10}"
+    )
+    for name, parse in extractors.items():
+        results = _parse_all(parse, corpus)
+        if not results:
+            continue
+        cls = type(results[0])
+        fields = [tuple(r) for r in results]
+        n = len(results)
+        validated = _per_item_us(lambda: [_validate(r) for r in results], n, number)
+        tuples = _per_item_us(lambda: [cls(*f) for f in fields], n, number)
+        models = _per_item_us(lambda: [r.to_model() for r in results], n, number)
+        parsing = _per_item_us(lambda: _parse_all(parse, corpus), len(corpus), 1)
+        print(
+            f"{name:<12}{n:>8}{validated:>14.2f}{tuples:>16.2f}"
+            f"{models:>14.2f}{parsing:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    bench()
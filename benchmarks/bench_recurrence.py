@@ -0,0 +1,72 @@
+"""周期任务续期的性能对比: 逐周期累加 vs 直接计算, 以及周期规则的续期耗时
+python -m benchmarks.bench_recurrence
+"""
+import time
+import timeit
+from datetime import date
+
+from dateutil import relativedelta
+
+from recurrence import next_run_time
+from typevar import JobScheduleType
+
+DAY = 24 * 60 * 60
+GAPS = {"1天": DAY, "30天": 30 * DAY, "1年": 365 * DAY, "5年": 5 * 365 * DAY}
+
+
+def legacy_renew(schedule_info: str, current_run_time: int, now_time: int) -> int:
+    """旧版 ReminderBot._renew_job 的计算方式"""
+    deltas = {
+        JobScheduleType.daily: relativedelta.relativedelta(days=1),
+        JobScheduleType.weekly: relativedelta.relativedelta(weeks=1),
+        JobScheduleType.monthly: relativedelta.relativedelta(months=1),
+        JobScheduleType.yearly: relativedelta.relativedelta(years=1),
+    }
+    while True:
+        if schedule_info not in JobScheduleType.all_values():
+            time_diff = int(schedule_info) * DAY
+        else:
+            diff_delta = deltas[JobScheduleType.get_type(schedule_info)]
+            time_diff = ((date.today() + diff_delta) - date.today()).days * DAY
+        current_run_time = current_run_time + time_diff
+        if current_run_time > now_time:
+            return current_run_time
+
+
+def bench(number: int = 20):
+    now = int(time.time())
+    print(f"{'周期':<8}{'停机时长':<8}{'逐周期(ms)':>14}{'直接计算(ms)':>14}")
+    for schedule_info in ("daily", "3", "weekly", "monthly", "yearly"):
+        for gap_name, gap in GAPS.items():
+            current = now - gap
+            legacy = timeit.timeit(
+                lambda: legacy_renew(schedule_info, current, now), number=number
+            )
+            closed = timeit.timeit(
+                lambda: next_run_time(schedule_info, current, now), number=number
+            )
+            print(
+                f"{schedule_info:<10}{gap_name:<10}"
+                f"{legacy / number * 1000:>14.3f}{closed / number * 1000:>14.3f}"
+            )
+
+
+
+def bench_rules(number: int = 2000):
+    now = int(time.time())
+    print(f"\n{'规则':<10}" + "".join(f"{name:>12}" for name in GAPS) + "  (us)")
+    for rule in ("h/2", "w/2", "d:12345", "m:-1", "m:1#1"):
+        row = []
+        for gap in GAPS.values():
+            anchor = now - gap
+            elapsed = timeit.timeit(
+                lambda: next_run_time(rule, anchor, now, anchor_time=anchor),
+                number=number,
+            )
+            row.append(f"{elapsed / number * 1e6:>12.2f}")
+        print(f"{rule:<12}" + "".join(row))
+
+
+if __name__ == "__main__":
+    bench()
+    bench_rules()
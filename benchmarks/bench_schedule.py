@@ -0,0 +1,148 @@
+"""周期时间识别的性能对比: 旧的识别流程 vs 单次识别
+旧流程对"每周X"先识别时刻, 再对"周X"单独运行一次时间识别, 周期后没有时刻时也会运行一次;
+新流程每条输入只运行一次时间识别(周期部分没有识别出时间, 按一次性提醒处理整句时除外).
+同时检查两者的识别结果是否一致.
+
+python -m benchmarks.bench_schedule
+"""
+
+import argparse
+import logging
+import random
+import time
+from datetime import timedelta
+from typing import Callable, List
+
+import recurrence
+from benchmarks.bench_ner import NOW, _time
+from utils import NerUtil, ScheduleRe, TimeUtil
+
+WEEKDAYS = "一二三四五六日天"
+
+
+def build_corpus(size: int = 1000, seed: int = 20210707) -> List[str]:
+    rnd = random.Random(seed)
+    generators = [
+        lambda: f"每周{rnd.choice(WEEKDAYS)}{_time(rnd)}",
+        lambda: f"每周{rnd.choice(WEEKDAYS)}",
+        lambda: f"每天{_time(rnd)}",
+        lambda: f"每月{rnd.randint(1, 28)}号{_time(rnd)}",
+        lambda: f"每年{rnd.randint(1, 12)}月{rnd.randint(1, 28)}号",
+        lambda: f"每{rnd.randint(2, 30)}天",
+        lambda: f"每个工作日{_time(rnd)}",
+        lambda: f"明天{_time(rnd)}",
+    ]
+    return [rnd.choice(generators)() for _ in range(size)]
+
+
+class LegacyNerUtil(NerUtil):
+    """旧的识别流程"""
+
+    def _schedule_refresh_d_datetime(self, match_weekly: str) -> timedelta:
+        now = TimeUtil.now_datetime()
+        start_date = self.extract_datetime(match_weekly)
+        days_7 = timedelta(days=7)
+        if start_date.date() - now.date() == days_7:
+            return timedelta(days=0)
+        elif start_date.date() < now.date():
+            start_date += days_7
+        return timedelta(days=(start_date - now).days + 1)
+
+    def extract_schedule(self, text: str):
+        res = self.extract_rule(text)
+        if res:
+            return res
+        match_result = ScheduleRe.match(text)
+        if not match_result:
+            return
+        match_dict = match_result.groupdict()
+        given_date = match_dict.pop("date")
+        if match_dict["days"]:
+            return self._schedule_days_process(match_dict["days"])
+        d_datetime = self.extract_datetime(given_date)
+        if not d_datetime:
+            return
+        schedule_type = self._schedule_get_type(match_dict)
+        match_weekly = match_dict["weekly"]
+        if match_weekly and len(match_weekly) != 1:
+            d_datetime += self._schedule_refresh_d_datetime(match_weekly)
+        now = TimeUtil.now_datetime()
+        if d_datetime <= now:
+            next_run_time = recurrence.next_run_time(
+                schedule_type.value,
+                TimeUtil.datetime2timestamp(d_datetime),
+                now=TimeUtil.datetime2timestamp(now),
+            )
+        else:
+            next_run_time = int(d_datetime.timestamp())
+        return next_run_time, schedule_type.value
+
+
+def _result(func: Callable[[str], object], text: str) -> object:
+    try:
+        return func(text)
+    except Exception as e:
+        return type(e)
+
+
+def count_parses(ner: NerUtil, corpus: List[str]) -> int:
+    calls = 0
+    parse = ner.date_extractor.parse
+
+    def counting(text, *args):
+        nonlocal calls
+        calls += 1
+        return parse(text, *args)
+
+    ner.date_extractor.parse = counting
+    try:
+        for text in corpus:
+            _result(ner.extract_time, text)
+    finally:
+        del ner.date_extractor.parse
+    return calls
+
+
+def measure(ner: NerUtil, corpus: List[str], repeat: int) -> float:
+    """-> 每条输入的耗时(us), 取最快的一次"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            _result(ner.extract_time, text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(corpus) * 1e6
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="周期时间识别的性能对比")
+    parser.add_argument("--size", type=int, default=1000, help="语料条数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数, 取最快的一次")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    # 固定当前时间, 周三下午三点
+    TimeUtil.now_datetime = staticmethod(lambda: NOW)
+    corpus = build_corpus(args.size)
+    legacy, current = LegacyNerUtil(), NerUtil()
+
+    mismatches = [
+        text
+        for text in corpus
+        if _result(legacy.extract_time, text) != _result(current.extract_time, text)
+    ]
+    print(f"{'':<10}{'us/条':>10}{'时间识别次数':>14}")
+    for name, ner in (("旧流程", legacy), ("单次识别", current)):
+        print(
+            f"{name:<10}{measure(ner, corpus, args.repeat):>10.1f}"
+            f"{count_parses(ner, corpus):>14}"
+        )
+    if mismatches:
+        print(f"识别结果不一致 {len(mismatches)} 条, 如: {mismatches[:5]}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
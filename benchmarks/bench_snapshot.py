@@ -0,0 +1,100 @@
+"""时间轮调度重启后首次加载的耗时: 扫描任务表 vs 从快照恢复
+在临时 sqlite 数据库中写入 N 个任务, 保存快照后修改其中一部分, 分别统计两种方式的首次加载耗时,
+并检查两者加载到时间轮中的任务一致.
+
+python -m benchmarks.bench_snapshot --jobs 200000 --changed 1000
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Set, Tuple
+
+from peewee import SqliteDatabase
+
+import dao
+from benchmarks.load_test import MODELS
+from models import create_search_index, room_partition
+from storage import SqliteStorage
+from timing_wheel import WheelScheduler
+
+WINDOW = 3600
+
+
+def _loaded(scheduler: WheelScheduler, now: int) -> Set[int]:
+    return set(scheduler._wheel.advance(now + WINDOW))
+
+
+def _first_load(snapshot_path: str, now: int) -> Tuple[float, Set[int]]:
+    scheduler = WheelScheduler(None, window=WINDOW, snapshot_path=snapshot_path)
+    start = time.perf_counter()
+    scheduler.collect_due_jobs(now)
+    elapsed = time.perf_counter() - start
+    return elapsed, _loaded(scheduler, now)
+
+
+def bench(jobs: int, changed: int, horizon: int, seed: int = 0) -> int:
+    rnd = random.Random(seed)
+    now = int(time.time())
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_db = SqliteDatabase(os.path.join(tmp_dir, "bench.db"))
+        test_db.register_function(room_partition, "room_partition", 2)
+        snapshot_path = os.path.join(tmp_dir, "scheduler.snap")
+        old_storage, dao.storage = dao.storage, SqliteStorage()
+        try:
+            with test_db.bind_ctx(MODELS):
+                test_db.create_tables(MODELS)
+                create_search_index()
+                dao.ScheduleJobDao.create_jobs(
+                    (f"room{i % 500}", now + rnd.randrange(horizon), f"job-{i}", None)
+                    for i in range(jobs)
+                )
+                start = time.perf_counter()
+                count = WheelScheduler(
+                    None, window=WINDOW, snapshot_path=snapshot_path
+                ).checkpoint()
+                checkpoint = time.perf_counter() - start
+                # 快照之后修改部分任务, 一半改到窗口内
+                time.sleep(1)
+                rooms = [f"room{i}" for i in range(500)]
+                for _ in range(changed):
+                    dao.ScheduleJobDao.update_job(
+                        rnd.randrange(1, jobs // 500),
+                        rnd.choice(rooms),
+                        next_run_time=now + rnd.randrange(2 * WINDOW),
+                    )
+
+                cold, cold_ids = _first_load("", now)
+                warm, warm_ids = _first_load(snapshot_path, now)
+        finally:
+            dao.storage = old_storage
+
+    print(f"任务数: {jobs}, 快照后修改: {changed}, 窗口内: {len(cold_ids)}")
+    print(f"保存快照({count}条): {checkpoint * 1000:.1f} ms")
+    print(f"扫描任务表: {cold * 1000:.1f} ms")
+    print(f"从快照恢复: {warm * 1000:.1f} ms")
+    # 快照中的过期条目在触发前以数据库为准, 恢复的任务应包含扫描得到的全部任务
+    missing = cold_ids - warm_ids
+    if missing:
+        print(f"从快照恢复时缺少 {len(missing)} 个任务")
+        return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="时间轮调度从快照恢复的耗时")
+    parser.add_argument("--jobs", type=int, default=200000, help="任务数")
+    parser.add_argument("--changed", type=int, default=1000, help="快照后修改的任务数")
+    parser.add_argument(
+        "--horizon", type=int, default=30 * 86400, help="任务执行时间分布范围(秒)"
+    )
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+    return bench(args.jobs, args.changed, args.horizon)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
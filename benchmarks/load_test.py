@@ -0,0 +1,243 @@
+"""调度端到端压力测试
+在临时 sqlite 数据库中写入 N 个集中在几个时间点到期的任务, 用进程内的假群聊
+(Room.find / room.ready / room.say)运行 ReminderBot 的调度及发送队列,
+统计触发延迟, 吞吐量, 数据库写入耗时及事件循环延迟. 不需要网络及 Wechaty 服务.
+
+python -m benchmarks.load_test --jobs 2000 --rooms 100 --clusters 5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from peewee import SqliteDatabase
+
+import dao
+from main import SCHEDULERS, ReminderBot
+from models import (
+    TableCatchupPolicy,
+    TableJobSearch,
+    TableScheduleJob,
+    TableScheduleRecord,
+    TableSchedulerLease,
+    create_search_index,
+    room_partition,
+)
+from outbox import Outbox
+from storage import SqliteStorage
+
+MODELS = [
+    TableScheduleJob,
+    TableScheduleRecord,
+    TableCatchupPolicy,
+    TableSchedulerLease,
+    TableJobSearch,
+]
+# 记录耗时的写入操作
+WRITE_METHODS = ["create_records", "set_state", "update_job", "settle_jobs"]
+JOB_RE = re.compile(r"load-job-(\d+)")
+
+
+class _Payload:
+    def __init__(self, topic: str):
+        self.topic = topic
+
+
+class FakeRoom:
+    """替代 Wechaty 的 Room, 记录每个任务的送达时间"""
+
+    rooms: Dict[str, "FakeRoom"] = {}
+    # {任务序号: 送达时间}
+    delivered: Dict[int, float] = {}
+    say_latency = 0.0
+
+    def __init__(self, topic: str):
+        self.room_id = topic
+        self.payload = _Payload(topic)
+
+    @classmethod
+    async def find(cls, query) -> "FakeRoom":
+        if query.topic not in cls.rooms:
+            cls.rooms[query.topic] = cls(query.topic)
+        return cls.rooms[query.topic]
+
+    async def ready(self):
+        pass
+
+    async def say(self, msg):
+        if self.say_latency:
+            await asyncio.sleep(self.say_latency)
+        now = time.time()
+        for index in JOB_RE.findall(str(msg)):
+            self.delivered.setdefault(int(index), now)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def _summary(values: List[float]) -> str:
+    return (
+        f"p50 {_percentile(values, 0.5) * 1000:.1f}ms, "
+        f"p99 {_percentile(values, 0.99) * 1000:.1f}ms, "
+        f"max {max(values, default=0) * 1000:.1f}ms"
+    )
+
+
+def _time_writes(storage: SqliteStorage, latencies: Dict[str, List[float]]):
+    for name in WRITE_METHODS:
+        method = getattr(storage, name)
+
+        def timed(*args, _method=method, _name=name, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                latencies[_name].append(time.perf_counter() - start)
+
+        setattr(storage, name, timed)
+
+
+async def _sample_loop_lag(lags: List[float], interval: float = 0.01):
+    loop = asyncio.get_event_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(loop.time() - start - interval, 0))
+
+
+async def run_load_test(
+    jobs: int = 1000,
+    rooms: int = 50,
+    clusters: int = 5,
+    spread: float = 1.0,
+    lead: float = 2.0,
+    scheduler: str = "polling",
+    say_latency: float = 0.0,
+    send_rate: float = 1e6,
+    timeout: float = 120.0,
+) -> dict:
+    """
+    :param clusters: 到期时间的个数, 任务平均分配到各个时间点
+    :param spread: 相邻两个到期时间的间隔(秒)
+    :param lead: 第一个到期时间距开始的秒数, 期间完成写入任务
+    :param say_latency: 每次发送消息的模拟耗时(秒)
+    :param send_rate: 发送队列的全局及每个群聊的限速(条/秒)
+    """
+    assert scheduler in ("polling", "wheel"), "分片调度需要多个进程, 不支持"
+    FakeRoom.rooms, FakeRoom.delivered = {}, {}
+    FakeRoom.say_latency = say_latency
+    write_latencies: Dict[str, List[float]] = defaultdict(list)
+    loop_lags: List[float] = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_db = SqliteDatabase(os.path.join(tmp_dir, "load_test.db"))
+        test_db.register_function(room_partition, "room_partition", 2)
+        storage = SqliteStorage()
+        _time_writes(storage, write_latencies)
+        old_storage, dao.storage = dao.storage, storage
+        try:
+            with test_db.bind_ctx(MODELS):
+                test_db.create_tables(MODELS)
+                create_search_index()
+                first = int(time.time() + lead) + 1
+                deadlines = [first + int(i % clusters * spread) for i in range(jobs)]
+                dao.ScheduleJobDao.create_jobs(
+                    (f"room{i % rooms}", deadlines[i], f"load-job-{i}", None)
+                    for i in range(jobs)
+                )
+
+                bot = ReminderBot()
+                bot.Room = FakeRoom
+                bot.outbox = Outbox(
+                    global_rate=send_rate,
+                    global_burst=send_rate,
+                    room_rate=send_rate,
+                    room_burst=send_rate,
+                )
+                bot.scheduler = SCHEDULERS[scheduler](bot._fire_due_jobs)
+                bot.outbox.start()
+                tasks = [
+                    asyncio.ensure_future(bot.scheduler.run()),
+                    asyncio.ensure_future(_sample_loop_lag(loop_lags)),
+                ]
+                start = time.time()
+                while len(FakeRoom.delivered) < jobs and time.time() - start < timeout:
+                    await asyncio.sleep(0.05)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            dao.storage = old_storage
+
+    lateness = [t - deadlines[i] for i, t in FakeRoom.delivered.items()]
+    elapsed = max(FakeRoom.delivered.values(), default=first) - first
+    return {
+        "jobs": jobs,
+        "delivered": len(FakeRoom.delivered),
+        "throughput": len(FakeRoom.delivered) / max(elapsed, 1e-6),
+        "lateness": lateness,
+        "write_latencies": dict(write_latencies),
+        "loop_lags": loop_lags,
+    }
+
+
+def report(result: dict):
+    print(f"送达: {result['delivered']}/{result['jobs']}")
+    print(f"吞吐量: {result['throughput']:.0f}条/秒")
+    print(f"触发延迟: {_summary(result['lateness'])}")
+    for name, values in result["write_latencies"].items():
+        print(f"数据库写入 {name} x{len(values)}: {_summary(values)}")
+    print(f"事件循环延迟: {_summary(result['loop_lags'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="调度端到端压力测试")
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--clusters", type=int, default=5, help="到期时间的个数")
+    parser.add_argument("--spread", type=float, default=1.0, help="到期时间的间隔(秒)")
+    parser.add_argument(
+        "--lead", type=float, default=2.0, help="第一个到期时间距开始的秒数"
+    )
+    parser.add_argument("--scheduler", default="polling", choices=["polling", "wheel"])
+    parser.add_argument(
+        "--say-latency", type=float, default=0.0, help="每次发送的模拟耗时(秒)"
+    )
+    parser.add_argument(
+        "--send-rate", type=float, default=1e6, help="发送队列限速(条/秒)"
+    )
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--verbose", action="store_true", help="输出机器人日志")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    report(
+        asyncio.run(
+            run_load_test(
+                jobs=args.jobs,
+                rooms=args.rooms,
+                clusters=args.clusters,
+                spread=args.spread,
+                lead=args.lead,
+                scheduler=args.scheduler,
+                say_latency=args.say_latency,
+                send_rate=args.send_rate,
+                timeout=args.timeout,
+            )
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""停机期间错过的任务的补发
+
+按任务 > 群聊 > 全局默认的优先级确定补发策略, 生成需要写入数据库的变更及需要发送的消息,
+由调用方在一个事务中批量写入, 消息经发送队列限速发出.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import recurrence
+from models import TableScheduleJob
+from settings import Config
+from typevar import CatchupPolicy
+from utils import TimeUtil
+
+
+class CatchupPlan:
+    def __init__(self):
+        # [(任务真实ID, 提醒内容)]
+        self.records: List[Tuple[int, str]] = []
+        # 需要完成的一次性任务真实ID
+        self.done_ids: List[int] = []
+        # {任务真实ID: 下一次执行时间}
+        self.renewals: Dict[int, int] = {}
+        # {群聊房间: [消息]}
+        self.messages: Dict[str, List[str]] = defaultdict(list)
+
+
+def resolve_policy(
+    job: TableScheduleJob,
+    policies: Dict[Tuple[str, int], CatchupPolicy],
+    default: CatchupPolicy,
+) -> CatchupPolicy:
+    return (
+        policies.get((job.room, job.job_id)) or policies.get((job.room, 0)) or default
+    )
+
+
+def _job_text(job: TableScheduleJob, next_run_time: Optional[int]) -> str:
+    text = (
+        f"{TimeUtil.timestamp2datetime(job.next_run_time)}\n"
+        f"内容:\n"
+        f"{job.remind_msg}"
+    )
+    if next_run_time:
+        text += f"\n下一次执行时间: \n{TimeUtil.timestamp2datetime(next_run_time)}"
+    return text
+
+
+def plan_catch_up(
+    jobs: Iterable[TableScheduleJob],
+    policies: Dict[Tuple[str, int], CatchupPolicy],
+    now: int,
+    default: CatchupPolicy = None,
+) -> CatchupPlan:
+    if default is None:
+        default = (
+            CatchupPolicy.get_policy(Config.CATCHUP_POLICY) or CatchupPolicy.replay
+        )
+
+    plan = CatchupPlan()
+    summaries = defaultdict(list)
+    for job in jobs:
+        if job.schedule_info:
+            next_run_time = recurrence.next_run_time(
+                job.schedule_info, job.next_run_time, now, anchor_time=job.anchor_time
+            )
+            plan.renewals[job.id] = next_run_time
+        else:
+            next_run_time = None
+            plan.done_ids.append(job.id)
+
+        policy = resolve_policy(job, policies, default)
+        if policy == CatchupPolicy.skip:
+            continue
+        plan.records.append((job.id, job.remind_msg))
+        text = _job_text(job, next_run_time)
+        if policy == CatchupPolicy.replay:
+            plan.messages[job.room].append(f"任务超时, 应执行时间为:\n{text}")
+        else:
+            summaries[job.room].append(text)
+
+    for room, texts in summaries.items():
+        plan.messages[room].append(
+            f"停机期间共有{len(texts)}条任务超时:\n"
+            + "".join(f"{'-' * 25}\n{text}\n" for text in texts)
+        )
+    return plan
@@ -1,46 +1,99 @@
 import uuid
-from typing import Tuple, Union, List, Optional
+from typing import Tuple, Union, List, Optional, Dict, Iterable, Set
 
-from models import TableScheduleRecord, TableScheduleJob
-from typevar import JobState
+from peewee import chunked
+
+from models import (
+    TableScheduleRecord,
+    TableScheduleJob,
+    TableCatchupPolicy,
+    TableSchedulerLease,
+)
+from metrics import metrics
+from storage import BATCH_SIZE, BaseStorage, RoomRecord, create_storage
+from typevar import JobState, CatchupPolicy
+
+storage: BaseStorage = create_storage()
+
+_timed = metrics.timed("dao_seconds", "数据库操作耗时(秒)")
 
 
 class ScheduleRecordDao:
     model = TableScheduleRecord
 
     @classmethod
-    def create_record(cls, job_real_id: int, remind_msg: str) -> TableScheduleRecord:
-        return cls.model.create(job_real_id=job_real_id, remind_msg=remind_msg)
+    @_timed
+    def create_record(cls, job_real_id: int, remind_msg: str):
+        storage.create_records([(job_real_id, remind_msg)])
+
+    @classmethod
+    @_timed
+    def create_records(cls, records: Iterable[Tuple[int, str]]):
+        """批量写入提醒记录 records: [(任务真实ID, 提醒内容)]"""
+        storage.create_records(records)
+
+    @classmethod
+    @_timed
+    def get_records(cls, job_real_id: int) -> List[TableScheduleRecord]:
+        return storage.get_records(job_real_id)
+
+    @classmethod
+    @_timed
+    def get_room_records(cls, room: str, limit: int) -> List[RoomRecord]:
+        """群聊最近的提醒记录(不包括已归档的), 按时间倒序"""
+        return storage.get_room_records(room, limit)
 
 
 class ScheduleJobDao:
     model = TableScheduleJob
 
     @classmethod
+    @_timed
     def get_all_jobs(
         cls, room: str = None, state: JobState = JobState.ready
+    ) -> Tuple[int, Iterable[TableScheduleJob]]:
+        return storage.get_all_jobs(room, state)
+
+    @classmethod
+    @_timed
+    def count_jobs(cls, room: str = None, state: JobState = JobState.ready) -> int:
+        return storage.count_jobs(room, state)
+
+    @classmethod
+    @_timed
+    def get_jobs_page(
+        cls,
+        room: str,
+        after: Optional[Tuple[int, int]],
+        limit: int,
+        state: JobState = JobState.ready,
+    ) -> List[TableScheduleJob]:
+        """按 (执行时间, 真实ID) 键集分页, after 为上一页最后一条的排序键"""
+        return storage.get_jobs_page(room, state, after, limit)
+
+    @classmethod
+    @_timed
+    def get_page_key(
+        cls, room: str, offset: int, state: JobState = JobState.ready
+    ) -> Optional[Tuple[int, int]]:
+        """排序后第 offset 条任务的 (执行时间, 真实ID)"""
+        return storage.get_page_key(room, state, offset)
+
+    @classmethod
+    @_timed
+    def search_jobs(
+        cls, room: str, keyword: str, offset: int, limit: int
     ) -> Tuple[int, List[TableScheduleJob]]:
-        query_filter = []
-        if state is not None:
-            query_filter.append(cls.model.state == state)
-        if room:
-            query_filter.append(cls.model.room == room)
-        query = cls.model.select()
-        if query_filter:
-            query = query.where(*query_filter)
-        return query.count(), query.order_by(cls.model.next_run_time)
+        """按内容搜索群聊中生效中的任务, 按相关度排序 -> (总数, 本页任务)"""
+        return storage.search_jobs(room, keyword, offset, limit)
 
     @classmethod
+    @_timed
     def get_new_id(cls, room: str) -> int:
-        row = (
-            cls.model.select()
-            .where(cls.model.room == room)
-            .order_by(-cls.model.job_id)
-            .first()
-        )
-        return row.job_id + 1 if row else 1
+        return storage.get_new_id(room)
 
     @classmethod
+    @_timed
     def create_job(
         cls,
         room: str,
@@ -52,16 +105,48 @@ class ScheduleJobDao:
         if name is None:
             name = str(uuid.uuid4())
         job_id = cls.get_new_id(room)
-        return cls.model.create(
+        return storage.create_job(
             room=room,
             job_id=job_id,
             name=name,
             next_run_time=next_run_time,
             schedule_info=schedule_info,
+            anchor_time=next_run_time if schedule_info else None,
             remind_msg=remind_msg,
         )
 
     @classmethod
+    @_timed
+    def create_jobs(cls, jobs: Iterable[tuple]) -> int:
+        """在同一事务中批量创建任务
+        jobs: [(群聊房间, 执行时间, 提醒内容, 周期[, 最初设定的执行时间])],
+        周期任务未指定最初设定的执行时间时取执行时间
+        """
+        rows = []
+        for room, next_run_time, remind_msg, schedule_info, *anchor in jobs:
+            anchor_time = (anchor[0] if anchor else None) or next_run_time
+            rows.append(
+                {
+                    "room": room,
+                    "name": str(uuid.uuid4()),
+                    "next_run_time": next_run_time,
+                    "schedule_info": schedule_info,
+                    "anchor_time": anchor_time if schedule_info else None,
+                    "remind_msg": remind_msg,
+                }
+            )
+        return storage.create_jobs(rows)
+
+    @classmethod
+    @_timed
+    def iter_jobs(
+        cls, room: str = None, state: JobState = JobState.ready
+    ) -> Iterable[TableScheduleJob]:
+        """逐条读取任务, 用于导出等不需要一次读入全部任务的场景"""
+        return storage.iter_jobs(room, state)
+
+    @classmethod
+    @_timed
     def update_job(
         cls,
         job_id: int,
@@ -69,47 +154,168 @@ class ScheduleJobDao:
         next_run_time: int = None,
         remind_msg: str = None,
         schedule_info: Union[str, int] = None,
+        anchor_time: int = None,
     ) -> int:
         _update = {}
         if next_run_time:
             _update["next_run_time"] = next_run_time
         if schedule_info:
             _update["schedule_info"] = schedule_info
+        if anchor_time:
+            _update["anchor_time"] = anchor_time
         if remind_msg:
             _update["remind_msg"] = remind_msg
 
         assert _update, "你必须更新点什么"
-        return (
-            cls.model.update(**_update)
-            .where(cls.model.job_id == job_id, cls.model.room == room)
-            .execute()
-        )
+        return storage.update_job(job_id, room, _update)
 
     @classmethod
+    @_timed
     def job_done(cls, job_id: int, room: str) -> int:
-        return (
-            cls.model.update(state=JobState.done)
-            .where(cls.model.job_id == job_id, cls.model.room == room)
-            .execute()
-        )
+        return storage.set_state(room, [job_id], JobState.done)
 
     @classmethod
+    @_timed
     def cancel_jobs(cls, *job_ids: int, room: str) -> int:
-        return (
-            cls.model.update(state=JobState.cancel)
-            .where(cls.model.job_id.in_(job_ids), cls.model.room == room)
-            .execute()
-        )
+        return storage.set_state(room, job_ids, JobState.cancel)
+
+    @classmethod
+    @_timed
+    def get_due_jobs(
+        cls, before: int, rooms: Iterable[str] = None
+    ) -> List[TableScheduleJob]:
+        """获取在 before 及之前到期的任务"""
+        return storage.get_due_jobs(before, rooms)
 
     @classmethod
+    @_timed
+    def get_jobs_by_ids(cls, real_ids: Iterable[int]) -> List[TableScheduleJob]:
+        """按真实ID获取生效中的任务"""
+        return storage.get_jobs_by_ids(real_ids)
+
+    @classmethod
+    @_timed
+    def iter_job_times(
+        cls,
+        before: int,
+        after: int = None,
+        partitions: Iterable[int] = None,
+        partition_count: int = None,
+    ) -> Iterable[Tuple[int, int]]:
+        """按 next_run_time 范围 (after, before] 获取生效中的任务 -> (真实ID, 下一次执行时间)
+        指定 partitions 时只获取群聊属于这些哈希分区的任务
+        """
+        return storage.iter_job_times(before, after, partitions, partition_count)
+
+    @classmethod
+    @_timed
+    def get_next_run_time(
+        cls,
+        after: float,
+        partitions: Iterable[int] = None,
+        partition_count: int = None,
+    ) -> Optional[int]:
+        """获取 after 之后最近的执行时间"""
+        return storage.get_next_run_time(after, partitions, partition_count)
+
+    @classmethod
+    @_timed
+    def iter_pending_jobs(cls) -> Iterable[Tuple[int, int, str]]:
+        """生效中的任务 (下一次执行时间, 真实ID, 群聊房间), 按执行时间排序"""
+        return storage.iter_pending_jobs()
+
+    @classmethod
+    @_timed
+    def iter_changed_job_times(
+        cls, since: int, before: int
+    ) -> Iterable[Tuple[int, int]]:
+        """since 及之后修改过, 在 before 及之前到期的生效中任务 -> (真实ID, 下一次执行时间)"""
+        return storage.iter_changed_job_times(since, before)
+
+    @classmethod
+    @_timed
+    def get_overdue_jobs(cls, before: float) -> List[TableScheduleJob]:
+        return storage.get_overdue_jobs(before)
+
+    @classmethod
+    @_timed
+    def settle_jobs(
+        cls,
+        done_ids: List[int],
+        renewals: Dict[int, int],
+        records: List[Tuple[int, str]],
+    ):
+        """在同一事务中批量完成/续期任务, 并写入提醒记录
+        :param done_ids: 需要完成的任务真实ID
+        :param renewals: {任务真实ID: 下一次执行时间}
+        :param records: [(任务真实ID, 提醒内容)]
+        """
+        storage.settle_jobs(done_ids, renewals, records)
+
+    @classmethod
+    @_timed
     def get_job(
         cls, job_id: int, room: str, job_state: JobState = JobState.ready
     ) -> Optional[TableScheduleJob]:
-        return cls.model.get_or_none(
-            cls.model.job_id == job_id,
-            cls.model.room == room,
-            cls.model.state == job_state,
-        )
+        return storage.get_job(job_id, room, job_state)
+
+
+class CatchupPolicyDao:
+    model = TableCatchupPolicy
+
+    @classmethod
+    def set_policy(cls, room: str, policy: CatchupPolicy, *job_ids: int) -> int:
+        """设置补发策略, 不指定任务ID时设置整个群聊的默认策略"""
+        rows = [
+            {"room": room, "job_id": job_id, "policy": policy.value}
+            for job_id in job_ids or (0,)
+        ]
+        return cls.model.insert_many(rows).on_conflict_replace().execute()
+
+    @classmethod
+    def get_policies(cls, rooms: Set[str]) -> Dict[Tuple[str, int], CatchupPolicy]:
+        """-> {(群聊房间, 任务ID): 补发策略}"""
+        ret = {}
+        for batch in chunked(rooms, BATCH_SIZE):
+            for row in cls.model.select().where(cls.model.room.in_(batch)):
+                ret[(row.room, row.job_id)] = CatchupPolicy.get_policy(row.policy)
+        return ret
+
+
+class SchedulerLeaseDao:
+    model = TableSchedulerLease
+
+    @classmethod
+    def refresh(
+        cls,
+        owner: str,
+        home: Set[int],
+        partition_count: int,
+        now: float,
+        ttl: float,
+    ) -> Set[int]:
+        """续期并获取分区租约, 返回当前持有的分区
+        自己负责的分区无论被谁接管都收回; 其他进程负责的分区过期超过一个租期后接管
+        """
+        expire_time = now + ttl
+        with cls.model._meta.database.atomic():
+            cls.model.insert_many(
+                [{"partition_id": p} for p in range(partition_count)]
+            ).on_conflict_ignore().execute()
+            cls.model.update(expire_time=expire_time).where(
+                cls.model.owner == owner
+            ).execute()
+            cls.model.update(owner=owner, expire_time=expire_time).where(
+                cls.model.partition_id.in_(list(home))
+                | (cls.model.expire_time < now - ttl)
+            ).execute()
+            return {
+                row.partition_id
+                for row in cls.model.select().where(
+                    cls.model.owner == owner,
+                    cls.model.partition_id < partition_count,
+                )
+            }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+"""任务列表的分页渲染
+
+按 (执行时间, 真实ID) 键集分页, 第 N 页的起点只从索引中读取排序键, 不读取前面各页的任务.
+搜索结果按相关度排序, 按偏移量分页.
+每页的文本只拼接一次, 超过单条消息的长度上限时拆分为多条依次发送.
+"""
+
+import math
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional
+
+from dao import ScheduleJobDao
+from models import TableScheduleJob
+from settings import Config
+from storage import RoomRecord
+from utils import TimeUtil
+
+SEPARATOR = "-" * 25
+
+
+class JobPage(NamedTuple):
+    count: int
+    page: int
+    pages: int
+    # 本页第一条任务的序号
+    start: int
+    jobs: List[TableScheduleJob]
+
+
+@lru_cache(maxsize=4096)
+def _format_time(timestamp: int) -> str:
+    return TimeUtil.timestamp2datetime(timestamp)
+
+
+def get_job_page(
+    room: str, page: int, page_size: int = Config.LIST_PAGE_SIZE
+) -> JobPage:
+    """群聊生效中的任务的第 page 页, 没有任务时为空页"""
+    count = ScheduleJobDao.count_jobs(room)
+    pages = max(math.ceil(count / page_size), 1)
+    assert 1 <= page <= pages, f"页码超出范围, 共{pages}页"
+    offset = (page - 1) * page_size
+    after = ScheduleJobDao.get_page_key(room, offset) if offset else None
+    jobs = ScheduleJobDao.get_jobs_page(room, after, page_size)
+    return JobPage(count, page, pages, offset + 1, jobs)
+
+
+def search_job_page(
+    room: str, keyword: str, page: int, page_size: int = Config.LIST_PAGE_SIZE
+) -> JobPage:
+    """群聊生效中的任务按内容搜索的第 page 页, 没有匹配的任务时为空页"""
+    assert page >= 1, "页码超出范围"
+    offset = (page - 1) * page_size
+    count, jobs = ScheduleJobDao.search_jobs(room, keyword, offset, page_size)
+    pages = max(math.ceil(count / page_size), 1)
+    assert page <= pages, f"页码超出范围, 共{pages}页"
+    return JobPage(count, page, pages, offset + 1, jobs)
+
+
+def job_row(job: TableScheduleJob, number: int = None) -> str:
+    prefix = "" if number is None else f"{number}. "
+    return (
+        f"{SEPARATOR}\n{prefix}ID:{job.job_id}\n"
+        f"下一次执行时间:\n{_format_time(job.next_run_time)}\n"
+        f"内容:{job.remind_msg}\n"
+    )
+
+
+def record_row(record: RoomRecord) -> str:
+    return (
+        f"{SEPARATOR}\nID:{record.job_id}\n"
+        f"执行时间:\n{_format_time(record.create_time)}\n"
+        f"内容:{record.remind_msg}\n"
+    )
+
+
+def split_messages(parts: Iterable[str], limit: int) -> List[str]:
+    """按顺序拼接为多条消息, 每条不超过 limit 个字符, 超长的部分单独截断"""
+    messages, buf, size = [], [], 0
+    for part in parts:
+        if size + len(part) > limit and buf:
+            messages.append("".join(buf))
+            buf, size = [], 0
+        while len(part) > limit:
+            messages.append(part[:limit])
+            part = part[limit:]
+        if part:
+            buf.append(part)
+            size += len(part)
+    if buf:
+        messages.append("".join(buf))
+    return messages
+
+
+def render_job_page(
+    title: str,
+    page: JobPage,
+    next_command: Optional[str],
+    numbered: bool = False,
+    limit: int = Config.MESSAGE_MAX_LEN,
+) -> List[str]:
+    """-> 依次发送的消息
+    :param next_command: 查看下一页的命令(如 "/all tasks"), 后面加上页码;
+        为 None 时该命令不能翻页, 只提示未列出的任务数
+    """
+    if page.pages > 1:
+        title = f"{title}(第{page.page}/{page.pages}页)"
+    rows = (
+        job_row(job, number if numbered else None)
+        for number, job in enumerate(page.jobs, start=page.start)
+    )
+    footer = ""
+    if page.page < page.pages:
+        if next_command is None:
+            rest = page.count - page.start - len(page.jobs) + 1
+            footer = f"{SEPARATOR}\n还有{rest}条任务未列出\n"
+        else:
+            footer = f"{SEPARATOR}\n输入 {next_command},{page.page + 1} 查看下一页\n"
+    return split_messages([f"{title}\n", *rows, footer], limit)
+
+
+def render_history(
+    records: List[RoomRecord], limit: int = Config.MESSAGE_MAX_LEN
+) -> List[str]:
+    """提醒记录 -> 依次发送的消息"""
+    title = f"最近{len(records)}条提醒记录:\n"
+    return split_messages([title, *map(record_row, records)], limit)
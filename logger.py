@@ -1,35 +1,157 @@
 # coding: utf-8
+"""日志
+
+调用方只把日志记录放入队列, 由单独的线程格式化并写入标准输出, 写日志不会阻塞事件循环.
+- 按模块(文件名)设置日志级别: LOG_MODULE_LEVELS="dtime=WARNING,dao=DEBUG"
+- 同一行代码的 DEBUG 日志每 LOG_SAMPLE_EVERY 条只保留一条
+- LOG_FORMAT=json 时每条日志输出一行 JSON
+被级别或采样过滤掉的日志不会格式化消息, 因此请使用 logger.debug("xxx: %s", obj)
+而不是 f-string, 保留的日志也在写日志的线程中才格式化.
+"""
+
+import atexit
 import datetime
-import logging.config
+import json
+import logging
+import queue
+import sys
+from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from settings import Config
 
 LOG_FILE = datetime.datetime.now().strftime("%Y-%m-%d") + ".log"
 LOG_PATH = "../main.log"
 
-logging_config = {
-    "version": 1,
-    "incremental": False,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
-            "class": "logging.Formatter",
-            'format': '+ %(asctime)s.%(msecs)03dZ %(levelname)s <%(module)s> | %(lineno)d %(message)s',
-            'datefmt': '%Y-%m-%dT%H:%M:%S',
-        },
-    },
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "level": "DEBUG",
-            "formatter": "default",
-            "stream": "ext://sys.stdout",
-        },
-    },
-    "root": {
-        "level": "INFO",
-        "handlers": ["console"],
-    },
-}
-
-logging.config.dictConfig(logging_config)
+TEXT_FORMAT = (
+    "+ %(asctime)s.%(msecs)03dZ %(levelname)s <%(module)s> | %(lineno)d %(message)s"
+)
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def parse_module_levels(value: str) -> Dict[str, int]:
+    """解析按模块设置的级别: dtime=WARNING,dao=DEBUG -> {"dtime": 30, "dao": 10}"""
+    ret = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        module, level = item.split("=")
+        ret[module.strip()] = logging.getLevelName(level.strip().upper())
+    return ret
+
+
+class ModuleLevelFilter(logging.Filter):
+    """按日志所在模块(文件名)的级别过滤"""
+
+    def __init__(self, default: int, levels: Dict[str, int]):
+        super().__init__()
+        self.default = default
+        self.levels = levels
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.levels.get(record.module, self.default)
+
+
+class SamplingFilter(logging.Filter):
+    """DEBUG 及以下的日志按代码位置采样, 每 every 条保留第一条"""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = every
+        self._seen: Dict[Tuple[str, int], int] = defaultdict(int)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        seen = self._seen[key]
+        self._seen[key] = seen + 1
+        return seen % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record, DATE_FORMAT) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "module": record.module,
+            "line": record.lineno,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(QueueHandler):
+    """放入队列时不格式化, 队列满时丢弃并计数"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(
+    level: str = Config.LOG_LEVEL,
+    module_levels: str = Config.LOG_MODULE_LEVELS,
+    fmt: str = Config.LOG_FORMAT,
+    sample_every: int = Config.LOG_SAMPLE_EVERY,
+    queue_size: int = Config.LOG_QUEUE_SIZE,
+    stream=None,
+) -> LazyQueueHandler:
+    """配置根日志, 重复调用时替换之前的配置"""
+    global _listener
+    stop_logging()
+
+    default = logging.getLevelName(level.upper())
+    levels = parse_module_levels(module_levels)
+    console = logging.StreamHandler(stream or sys.stdout)
+    console.setFormatter(
+        JsonFormatter()
+        if fmt == "json"
+        else logging.Formatter(TEXT_FORMAT, DATE_FORMAT)
+    )
+    handler = LazyQueueHandler(queue.Queue(queue_size))
+    handler.addFilter(ModuleLevelFilter(default, levels))
+    handler.addFilter(SamplingFilter(sample_every))
+
+    root = logging.getLogger()
+    for old in [h for h in root.handlers if isinstance(h, LazyQueueHandler)]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    # 记录器按最低的级别放行, 再由过滤器按模块判断
+    lowest = min([default, *levels.values()])
+    root.setLevel(lowest)
+    logger.setLevel(lowest)
+
+    _listener = QueueListener(handler.queue, console, respect_handler_level=True)
+    _listener.start()
+    return handler
+
+
+def stop_logging():
+    """写完队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 logger = logging.getLogger("default")
-logger.setLevel(logging.INFO)
+setup_logging()
+atexit.register(stop_logging)
@@ -1,10 +1,10 @@
 import asyncio
-import inspect
+import functools
 import os
 import re
 import time
-from collections import Iterable
-from typing import Optional, Union
+from collections.abc import Iterable
+from typing import List, Optional, Tuple, Union
 
 from wechaty import (
     Wechaty,
@@ -22,12 +22,31 @@ from wechaty_puppet import (
     EventErrorPayload,
 )
 
-from constants import EN2ZH_MAP
+from actors import RoomActors
+from archive import Archiver
+from catchup import plan_catch_up
 from templates.poem import poem
 from templates.weather import weather_selenium
-from dao import ScheduleJobDao, ScheduleRecordDao
+from dao import ScheduleJobDao, ScheduleRecordDao, CatchupPolicyDao
+from listing import (
+    SEPARATOR,
+    get_job_page,
+    render_history,
+    render_job_page,
+    search_job_page,
+    split_messages,
+)
 from logger import logger
-from typevar import JobScheduleType
+from metrics import metrics, start_metrics
+from models import TableScheduleJob
+from outbox import Outbox, Priority
+import recurrence
+from router import Arg, CommandRouter
+from scheduler import PollingScheduler, RoomJobs
+from shard import ShardedScheduler
+from timing_wheel import WheelScheduler
+from settings import Config
+from typevar import CatchupPolicy
 from utils import TimeUtil, NerUtil, QRCode, Email, r_command, r_template
 
 
@@ -64,11 +83,10 @@ class RenderTemplate:
         msg, others = self._parse(msg)
         return [msg, *others]
 
-    def show_help(self, *templates: str):
+    def show_help(self, template: str = None):
         """显示模板消息帮助"""
-        if not templates:
+        if not template:
             return f"当前模板: {','.join(self._templates)}\n输入: help,template,模板名称 获取详细使用说明"
-        template = templates[0]
         assert (
             template in self._templates
         ), f"无此模板: {template}\n当前支持模板:\n{', '.join(self._templates)}"
@@ -96,39 +114,57 @@ class RenderTemplate:
         return poem.get_poem()
 
 
+SCHEDULERS = {
+    "polling": PollingScheduler,
+    "wheel": WheelScheduler,
+    "sharded": ShardedScheduler,
+}
+
+
 class ReminderBot(Wechaty):
     def __init__(self, options: Optional[WechatyOptions] = None):
         super().__init__(options)
-        self._commands = r_command.get_members(ReminderBot)
+        self.router = CommandRouter(self, r_command)
         self._render_template = RenderTemplate()
         self.ner = NerUtil()
+        self.outbox = Outbox()
+        self.actors = RoomActors()
+        self.scheduler = SCHEDULERS[Config.SCHEDULER](self._fire_due_jobs)
+        self.archiver = Archiver()
         self.login = False
+        # 登录后启动的后台任务, 重新登录时不重复启动
+        self._tasks: List[asyncio.Task] = []
 
     @property
     def supported_cmds(self):
-        return [*self._commands, "template"]
+        return [*self.router.commands, "template"]
 
     @property
     def supported_cmds_str(self) -> str:
         return ", ".join(self.supported_cmds)
 
+    @metrics.timed("render_seconds", "模板渲染耗时(秒)")
     def render_msg(self, msg: str) -> list:
         return self._render_template.render(msg)
 
     async def render(
-        self, room: Room, send_msg: Union[str, Contact, FileBox, MiniProgram, UrlLink]
-    ):
-        await room.ready()
+        self,
+        room: Room,
+        send_msg: Union[str, Contact, FileBox, MiniProgram, UrlLink],
+        priority: Priority = Priority.reminder,
+    ) -> List[asyncio.Future]:
+        """渲染模板后放入发送队列, 不等待发送完成 -> 各条消息发送完成的 future"""
         msgs = self.render_msg(send_msg)
-        for msg in msgs:
-            await room.say(msg)
+        return [self.outbox.put(room, msg, priority) for msg in msgs]
 
-    @staticmethod
     async def say(
-        room: Room, send_msg: Union[str, Contact, FileBox, MiniProgram, UrlLink]
+        self,
+        room: Room,
+        send_msg: Union[str, Contact, FileBox, MiniProgram, UrlLink],
+        priority: Priority = Priority.command,
     ):
-        await room.ready()
-        await room.say(send_msg)
+        """放入发送队列, 并等待发送完成"""
+        await self.outbox.put(room, send_msg, priority)
 
     async def on_scan(
         self, qr_code: str, status: ScanStatus, data: Optional[str] = None
@@ -143,14 +179,22 @@ class ReminderBot(Wechaty):
         await asyncio.sleep(3)
         logger.info("login success")
         self.login = True
-        asyncio.create_task(self._run_schedule_task())
+        self.outbox.start()
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._run_schedule_task()),
+            asyncio.create_task(self._run_archive_task()),
+            asyncio.create_task(self._run_snapshot_task()),
+            *start_metrics(),
+        ]
 
     async def on_error(self, payload: EventErrorPayload):
-        logger.error(f"wechaty error: {payload}")
+        logger.error("wechaty error: %s", payload)
         self._restart_wechaty()
 
     async def on_logout(self, contact: Contact):
-        logger.warning(f"wechaty logout: {contact}")
+        logger.warning("wechaty logout: %s", contact)
         self._restart_wechaty()
 
     def _restart_wechaty(self):
@@ -167,193 +211,344 @@ class ReminderBot(Wechaty):
         except Exception as e:
             logger.error("restart wechaty failed, ", e)
 
+    @metrics.timed("message_seconds", "处理消息耗时(秒)")
     async def on_message(self, msg: Message):
         text = msg.text()
+        # /开头的是命令
+        if not self.router.is_command(text):
+            return
+
         room = msg.room()
         # 仅回复群聊及其他人消息
         if room is None or msg.is_self():
             return
 
-        # /开头的是命令
-        if not text.strip().startswith("/"):
-            return
+        # 同一群聊的命令按顺序执行
+        try:
+            await self.actors.submit(
+                room.payload.topic, functools.partial(self._handle_command, room, text)
+            )
+        except Exception as e:
+            await self.say(room, f"处理消息失败:\n{text}\n\n{e}")
 
+    async def _handle_command(self, room: Room, text: str):
         try:
-            cmd, *args = text[1:].translate(EN2ZH_MAP).split(",")
-            if cmd in self._commands:
-                func = self._commands[cmd]
-                if inspect.iscoroutinefunction(func):
-                    await func(self, *args, room=room)
-                else:
-                    func(self, *args, room=room)
+            cmd, command, args = self.router.route(text)
+            if command is not None:
+                await command(args, room=room)
             else:
                 await self.say(
-                    room, f"无此命令: {cmd}\n当前支持命令:\n{', '.join(self._commands)}"
+                    room,
+                    f"无此命令: {cmd}\n当前支持命令:\n{', '.join(self.router.commands)}",
                 )
         except Exception as e:
             await self.say(room, f"处理消息失败:\n{text}\n\n{e}")
 
+    async def _catch_up(self):
+        """批量处理停机期间错过的任务, 消息经发送队列限速发出"""
+        now = int(time.time())
+        jobs = ScheduleJobDao.get_overdue_jobs(now - Config.SCHEDULE_GRACE)
+        if not jobs:
+            return
+
+        policies = CatchupPolicyDao.get_policies({job.room for job in jobs})
+        plan = plan_catch_up(jobs, policies, now)
+        ScheduleJobDao.settle_jobs(plan.done_ids, plan.renewals, plan.records)
+        logger.info("catch up %s jobs, %s reminded", len(jobs), len(plan.records))
+
+        for room, msgs in plan.messages.items():
+            try:
+                reminder_room = await self._find_room(room)
+            except Exception as e:
+                logger.warning("错误: %s", e)
+                continue
+            for msg in msgs:
+                await self.render(reminder_room, msg)
+
     async def _run_schedule_task(self):
+        try:
+            await self._catch_up()
+        except Exception as e:
+            logger.exception("错误: %s", e)
+
+        await self.scheduler.run()
+
+    async def _run_archive_task(self):
+        """定期归档历史数据, 在线程中执行避免阻塞消息处理"""
+        if not self.archiver.enabled:
+            return
+        loop = asyncio.get_event_loop()
         while True:
-            _, all_jobs = ScheduleJobDao.get_all_jobs()
-            cur_time = int(time.time())
-            for job in all_jobs:
-                # 允许1秒以内的误差
-                if abs(job.next_run_time - cur_time) <= 1:
-                    try:
-                        await self._remind_something(
-                            room=job.room,
-                            job_id=job.job_id,
-                            remind_msg=job.remind_msg,
-                            schedule_info=job.schedule_info,
-                            current_run_time=job.next_run_time,
-                            send_msg=(
-                                f"{TimeUtil.timestamp2datetime(job.next_run_time)}\n"
-                                f"内容:\n"
-                                f"{job.remind_msg}"
-                            ),
-                        )
-                    except Exception as e:
-                        logger.exception(f"错误: {e}")
-                    continue
-                # 已经过了执行时间的任务提醒未完成, 并更新
-                elif job.next_run_time < cur_time:
-                    try:
-                        await self._remind_something(
-                            room=job.room,
-                            job_id=job.job_id,
-                            remind_msg=job.remind_msg,
-                            schedule_info=job.schedule_info,
-                            current_run_time=job.next_run_time,
-                            send_msg=(
-                                "任务超时, 应执行时间为:\n"
-                                f"{TimeUtil.timestamp2datetime(job.next_run_time)}\n"
-                                f"内容:\n"
-                                f"{job.remind_msg}"
-                            ),
-                        )
-                    except Exception as e:
-                        logger.warning(f"错误: {e}")
-                    continue
+            try:
+                await loop.run_in_executor(None, self.archiver.run)
+            except Exception as e:
+                logger.exception("错误: %s", e)
+            await asyncio.sleep(Config.ARCHIVE_INTERVAL)
+
+    async def _run_snapshot_task(self):
+        """定期保存调度状态快照, 重启时从快照恢复, 在线程中执行"""
+        if not self.scheduler.checkpoint_enabled:
+            return
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(Config.SNAPSHOT_INTERVAL)
+            try:
+                with metrics.timer("snapshot_seconds", "保存调度快照耗时(秒)"):
+                    await loop.run_in_executor(None, self.scheduler.checkpoint)
+            except Exception as e:
+                logger.exception("错误: %s", e)
+
+    def _fire_due_jobs(self, room: str, jobs: RoomJobs) -> "asyncio.Future":
+        """群聊的提醒放入群聊的执行者, 与该群聊的命令按顺序执行, 群聊之间并发"""
+        return self.actors.submit(
+            room, functools.partial(self._fire_room_jobs, room, jobs)
+        )
 
-            await asyncio.sleep(1)
+    @metrics.timed("fire_seconds", "触发一个群聊的到期任务耗时(秒)")
+    async def _fire_room_jobs(self, room: str, jobs: RoomJobs):
+        if Config.COALESCE_WINDOW > 0:
+            try:
+                await self._remind_coalesced(room, jobs)
+            except Exception as e:
+                logger.exception("错误: %s", e)
+            return
 
-    async def _remind_once(
-        self, job_id: int, room: str, reminder_room: Room, send_msg: str
-    ):
+        for job, overdue in jobs:
+            try:
+                await self._remind_something(
+                    room=job.room,
+                    job_real_id=job.id,
+                    job_id=job.job_id,
+                    remind_msg=job.remind_msg,
+                    schedule_info=job.schedule_info,
+                    current_run_time=job.next_run_time,
+                    send_msg=self._job_message(job, overdue),
+                    anchor_time=job.anchor_time,
+                )
+            except Exception as e:
+                if overdue:
+                    logger.warning("错误: %s", e)
+                else:
+                    logger.exception("错误: %s", e)
+
+    @staticmethod
+    def _job_message(job: TableScheduleJob, overdue: bool) -> str:
+        send_msg = (
+            f"{TimeUtil.timestamp2datetime(job.next_run_time)}\n"
+            f"内容:\n"
+            f"{job.remind_msg}"
+        )
+        if overdue:
+            return f"任务超时, 应执行时间为:\n{send_msg}"
+        return send_msg
+
+    def _remind_once(self, job_id: int, room: str, send_msg: str) -> str:
         ScheduleJobDao.job_done(job_id, room=room)
-        await self.render(reminder_room, f"{send_msg}")
-        logger.info(f"task done, room:{room},job_id:{job_id},remind_msg:{send_msg}")
-        return
+        logger.info(
+            "task done, room:%s,job_id:%s,remind_msg:%s", room, job_id, send_msg
+        )
+        return send_msg
 
     @staticmethod
     def _renew_job(
         room: str,
         job_id: int,
-        remind_msg: str,
         schedule_info: str,
         current_run_time: int,
+        anchor_time: Optional[int] = None,
     ) -> int:
-        """周期性任务重新创建"""
-
-        now_time = int(time.time())
-        while True:
-            if schedule_info not in JobScheduleType.all_values():
-                time_diff = int(schedule_info) * 24 * 60 * 60
-            else:
-                time_diff = JobScheduleType.get_type(schedule_info).timestamp2now()
-            current_run_time = current_run_time + time_diff
-            if current_run_time > now_time:
-                break
-
-        ScheduleJobDao.update_job(
-            job_id=job_id,
-            room=room,
-            next_run_time=current_run_time,
-            remind_msg=remind_msg,
+        """周期性任务续期, 只修改下一次执行时间"""
+        next_run_time = recurrence.next_run_time(
+            schedule_info, current_run_time, anchor_time=anchor_time
         )
-        return current_run_time
+        ScheduleJobDao.update_job(job_id=job_id, room=room, next_run_time=next_run_time)
+        return next_run_time
 
-    async def _remind_schedule(
+    def _remind_schedule(
         self,
         room: str,
         job_id: int,
-        remind_msg: str,
         schedule_info: str,
         current_run_time: int,
-        reminder_room: Room,
         send_msg: str,
-    ):
+        anchor_time: Optional[int] = None,
+    ) -> str:
         next_run_time = self._renew_job(
             room=room,
             job_id=job_id,
-            remind_msg=remind_msg,
             schedule_info=schedule_info,
             current_run_time=current_run_time,
+            anchor_time=anchor_time,
         )
-        await self.render(
-            reminder_room,
+        logger.info(
+            "task done, room:%s,job_id:%s,remind_msg:%s", room, job_id, send_msg
+        )
+        return (
             f"{send_msg}\n"
             f"下一次执行时间: \n"
-            f"{TimeUtil.timestamp2datetime(next_run_time)}",
+            f"{TimeUtil.timestamp2datetime(next_run_time)}"
         )
-        logger.info(f"task done, room:{room},job_id:{job_id},remind_msg:{send_msg}")
 
-    async def _remind_something(
+    def _settle_job(
         self,
         room: str,
+        job_real_id: int,
         job_id: int,
         current_run_time: int,
         remind_msg: str,
         send_msg: str,
         schedule_info: Optional[str],
-    ):
+        anchor_time: Optional[int] = None,
+    ) -> str:
+        """记录本次提醒并完成/续期任务, 返回需要发送的消息"""
         logger.info(
-            f"task execute, room:{room},job_id:{job_id},remind_msg:{remind_msg}"
+            "task execute, room:%s,job_id:%s,remind_msg:%s", room, job_id, remind_msg
         )
-        reminder_room = await self.Room.find(RoomQueryFilter(topic=room))
-        assert reminder_room, f"未找到群聊: {room}"
-        ScheduleRecordDao.create_record(job_id, remind_msg)
+        ScheduleRecordDao.create_record(job_real_id, remind_msg)
         if not schedule_info:
-            return await self._remind_once(job_id, room, reminder_room, send_msg)
-        return await self._remind_schedule(
+            return self._remind_once(job_id, room, send_msg)
+        return self._remind_schedule(
             room,
             job_id,
-            remind_msg,
             schedule_info,
             current_run_time,
-            reminder_room,
             send_msg,
+            anchor_time,
         )
 
-    @r_command("all tasks")
-    async def all_tasks(self, *args, room: Room, **kwargs):
-        """获取当前任务列表
-        > /all tasks
+    async def _find_room(self, room: str) -> Room:
+        reminder_room = await self.Room.find(RoomQueryFilter(topic=room))
+        assert reminder_room, f"未找到群聊: {room}"
+        return reminder_room
+
+    async def _remind_something(
+        self,
+        room: str,
+        job_real_id: int,
+        job_id: int,
+        current_run_time: int,
+        remind_msg: str,
+        send_msg: str,
+        schedule_info: Optional[str],
+        anchor_time: Optional[int] = None,
+    ):
+        reminder_room = await self._find_room(room)
+        send_msg = self._settle_job(
+            room,
+            job_real_id,
+            job_id,
+            current_run_time,
+            remind_msg,
+            send_msg,
+            schedule_info,
+            anchor_time,
+        )
+        futures = await self.render(reminder_room, send_msg)
+        self._observe_lateness(futures, [current_run_time])
+
+    def _observe_lateness(self, futures: List[asyncio.Future], run_times: List[int]):
+        """提醒发出后记录各任务的触发延迟, 包括在群聊队列及发送队列中等待的时间"""
+
+        def observe(future: asyncio.Future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            now = time.time()
+            for run_time in run_times:
+                self.scheduler.lateness.observe(max(now - run_time, 0))
+
+        if futures:
+            futures[-1].add_done_callback(observe)
+
+    async def _remind_coalesced(
+        self, room: str, jobs: List[Tuple[TableScheduleJob, bool]]
+    ):
+        """同一群聊的多条提醒合并为一条消息发送, 每个任务仍单独记录及续期"""
+        reminder_room = await self._find_room(room)
+        send_msgs, run_times = [], []
+        for job, overdue in jobs:
+            try:
+                send_msgs.append(
+                    self._settle_job(
+                        room=job.room,
+                        job_real_id=job.id,
+                        job_id=job.job_id,
+                        current_run_time=job.next_run_time,
+                        remind_msg=job.remind_msg,
+                        send_msg=self._job_message(job, overdue),
+                        schedule_info=job.schedule_info,
+                        anchor_time=job.anchor_time,
+                    )
+                )
+                run_times.append(job.next_run_time)
+            except Exception as e:
+                logger.exception("错误: %s", e)
+        if not send_msgs:
+            return
+        if len(send_msgs) == 1:
+            futures = await self.render(reminder_room, send_msgs[0])
+        else:
+            # 提醒较多时按消息长度上限拆分为多条, 依次发送
+            parts = [f"共有{len(send_msgs)}条提醒:\n"]
+            parts.extend(f"{SEPARATOR}\n{msg}\n" for msg in send_msgs)
+            futures = []
+            for text in split_messages(parts, Config.MESSAGE_MAX_LEN):
+                futures.extend(await self.render(reminder_room, text))
+        self._observe_lateness(futures, run_times)
+
+    @r_command(
+        "all tasks",
+        aliases=("all", "任务列表"),
+        args=(Arg("页码", int, required=False),),
+    )
+    async def all_tasks(self, page: Optional[int], *, room: Room):
+        """获取当前任务列表, 任务较多时分页
+        > /all tasks[,页码]
+        例:
+        > /all tasks,2
         """
-        job_count, all_jobs = ScheduleJobDao.get_all_jobs(room.payload.topic)
-        if not job_count:
+        job_page = get_job_page(room.payload.topic, page or 1)
+        if not job_page.count:
             return await self.say(room, "当前无生效任务\n请通过 [ /remind,日期,提醒内容 ] 进行创建")
 
-        txt = f"当前共有{job_count}条任务: \n"
-        for i, job in enumerate(all_jobs, start=1):
-            txt += (
-                f"{'-' * 25}\n"
-                f"ID:{job.job_id}\n"
-                f"下一次执行时间:\n{TimeUtil.timestamp2datetime(job.next_run_time)}\n"
-                f"内容:{job.remind_msg}\n"
-            )
-        await self.say(room, txt)
-
-    @r_command
-    async def remind(self, *args, room: Room, **kwargs):
+        for msg in render_job_page(
+            f"当前共有{job_page.count}条任务: ", job_page, "/all tasks"
+        ):
+            await self.say(room, msg)
+
+    @r_command(
+        "search",
+        aliases=("搜索",),
+        args=(Arg("关键词"), Arg("页码", int, required=False)),
+    )
+    async def search(self, keyword: str, page: Optional[int], *, room: Room):
+        """按内容搜索生效中的任务, 按相关度排序
+        > /search,关键词[,页码]
+        例:
+        > /search,周报
+        > /search,周报 会议,2
+        """
+        keyword = keyword.strip()
+        assert keyword, "请输入关键词"
+        job_page = search_job_page(room.payload.topic, keyword, page or 1)
+        if not job_page.count:
+            return await self.say(room, f"没有找到包含 [{keyword}] 的任务")
+
+        title = f"找到{job_page.count}条任务: "
+        for msg in render_job_page(title, job_page, f"/search,{keyword}"):
+            await self.say(room, msg)
+
+    @r_command(
+        "remind",
+        aliases=("提醒",),
+        args=(Arg("提醒时间"), Arg("提醒内容", variadic=True)),
+    )
+    async def remind(self, given_time: str, *remind_msg: str, room: Room):
         """创建一条提醒记录
         > /remind,提醒时间,提醒内容
         例:
         > /remind,明天上午11点,吃东西
         """
-        given_time, remind_msg, *remind_left = args
-        remind_msg = ", ".join([remind_msg, *remind_left])
+        remind_msg = ", ".join(remind_msg)
         next_run_time, schedule_info = self.ner.extract_time(given_time)
         job = ScheduleJobDao.create_job(
             room=room.payload.topic,
@@ -362,6 +557,7 @@ class ReminderBot(Wechaty):
             schedule_info=schedule_info,
         )
         assert job, "任务失败, 请重试"
+        self.scheduler.notify(job)
         await self.say(
             room,
             f"任务已创建\n"
@@ -370,89 +566,147 @@ class ReminderBot(Wechaty):
             f"内容:{remind_msg}\n",
         )
 
-    @r_command
-    async def cancel(self, *args, room: Room, **kwargs):
+    @r_command(
+        "cancel", aliases=("取消",), args=(Arg("任务ID", int, variadic=True),)
+    )
+    async def cancel(self, *job_ids: int, room: Room):
         """取消一条任务/多条任务
         > /cancel,id[,id2...]
         例:
         > /cancel,12
         > /cancel,12,13,14
         """
-        job_id, *other_job_ids = args
-        assert int(job_id), "任务ID不合法"
-        if other_job_ids:
-            assert [int(j_id) for j_id in other_job_ids], "任务ID不合法"
-
-        nrows = ScheduleJobDao.cancel_jobs(
-            job_id, *other_job_ids, room=room.payload.topic
-        )
-        assert nrows == len([job_id, *other_job_ids]), "任务失败, 请重试"
+        nrows = ScheduleJobDao.cancel_jobs(*job_ids, room=room.payload.topic)
+        assert nrows == len(job_ids), "任务失败, 请重试"
 
-        txt = f"ID:{', '.join([job_id, *other_job_ids])}, 任务已取消\n\n"
+        txt = f"ID:{', '.join(map(str, job_ids))}, 任务已取消\n\n"
 
-        job_count, all_jobs = ScheduleJobDao.get_all_jobs(room.payload.topic)
-        if not job_count:
+        job_page = get_job_page(room.payload.topic, 1)
+        if not job_page.count:
             txt += "当前已无生效任务\n请通过 [ /remind,日期,提醒内容 ] 进行创建"
             return await self.say(room, txt)
 
-        txt += f"当前还有{job_count}条任务:\n"
-        for i, job in enumerate(all_jobs, start=1):
-            txt += (
-                f"{'-' * 25}\n"
-                f"{i}. ID:{job.job_id}\n"
-                f"下一次执行时间:\n{TimeUtil.timestamp2datetime(job.next_run_time)}\n"
-                f"内容:{job.remind_msg}\n"
-            )
-        await self.say(room, txt)
-
-    @r_command("help")
-    async def show_help(self, *args, room: Room, **kwargs):
+        title = f"{txt}当前还有{job_page.count}条任务:"
+        # /cancel 的参数是任务ID, 不能用来翻页
+        for msg in render_job_page(title, job_page, None, numbered=True):
+            await self.say(room, msg)
+
+    @r_command(
+        "catchup",
+        aliases=("补发",),
+        args=(Arg("策略"), Arg("任务ID", int, required=False, variadic=True)),
+    )
+    async def catchup(self, policy: str, *job_ids: int, room: Room):
+        """设置停机期间错过的任务的补发策略
+        > /catchup,策略[,id...]
+        策略: summary(汇总为一条) / skip(不提醒) / replay(逐条提醒)
+        例:
+        > /catchup,summary
+        > /catchup,skip,12,13
+        """
+        catchup_policy = CatchupPolicy.get_policy(policy.strip())
+        assert catchup_policy, (
+            f"无此策略: {policy}\n"
+            f"当前支持策略: {', '.join(p.value for p in CatchupPolicy)}"
+        )
+        CatchupPolicyDao.set_policy(room.payload.topic, catchup_policy, *job_ids)
+        target = f"ID:{', '.join(map(str, job_ids))}" if job_ids else "当前群聊"
+        await self.say(room, f"{target} 补发策略已设置为: {catchup_policy.value}")
+
+    @r_command(
+        "history", aliases=("历史",), args=(Arg("条数", int, required=False),)
+    )
+    async def history(self, limit: Optional[int], *, room: Room):
+        """查看最近的提醒记录, 默认10条, 最多 HISTORY_MAX_LIMIT 条
+        > /history[,条数]
+        例:
+        > /history,20
+        """
+        assert limit is None or limit > 0, "条数不合法"
+        assert limit is None or limit <= Config.HISTORY_MAX_LIMIT, (
+            f"条数不合法, 最多查看{Config.HISTORY_MAX_LIMIT}条"
+        )
+        records = self.archiver.get_room_history(room.payload.topic, limit or 10)
+        if not records:
+            return await self.say(room, "当前群聊还没有提醒记录")
+
+        for msg in render_history(records):
+            await self.say(room, msg)
+
+    @r_command(
+        "help",
+        aliases=("帮助",),
+        args=(Arg("命令", required=False), Arg("模板", required=False)),
+    )
+    async def show_help(
+        self, cmd: Optional[str], template: Optional[str], *, room: Room
+    ):
         """显示某命令使用方法
         > /help,remind
         """
-        cmd, *other_args = args
-        assert (
-            cmd in self.supported_cmds
-        ), f"无此命令: {cmd}\n当前支持命令:\n{self.supported_cmds_str}"
+        if cmd is None:
+            return await self.say(
+                room,
+                f"当前支持命令: {self.supported_cmds_str}\n输入: help,命令 获取详细使用说明",
+            )
         if cmd == "template":
-            docs = self._render_template.show_help(*other_args)
+            docs = self._render_template.show_help(template)
         else:
-            docs = self._commands[cmd].__doc__
+            command = self.router.get(cmd)
+            assert (
+                command is not None
+            ), f"无此命令: {cmd}\n当前支持命令:\n{self.supported_cmds_str}"
+            docs = command.doc
+            if command.aliases:
+                docs += f"\n别名: {', '.join(command.aliases)}"
 
         await self.say(room, "\n".join([l.strip() for l in docs.split("\n")]))
 
     @r_command("room info")
-    async def show_room_info(self, *args, room: Room, **kwargs):
+    async def show_room_info(self, *, room: Room):
         """获取当前群聊信息
         > /room info
         """
         await self.say(room, f"Topic: {room.payload.topic}\n" f"Id: {room.room_id}")
 
-    @r_command
-    async def update(self, *args, room: Room, **kwargs):
+    @r_command(
+        "update",
+        aliases=("修改",),
+        args=(
+            Arg("任务ID", int),
+            Arg("时间", required=False),
+            Arg("内容", required=False, variadic=True),
+        ),
+    )
+    async def update(
+        self, job_id: int, n_time: Optional[str], *n_msg: str, room: Room
+    ):
         """更新某个任务
         > /update,id,时间,内容 (m:id, o:时间, o:内容)
         > /update,12,明天上午9点,吃东西
         > /update,12,,吃东西
         > /update,12,后天上午9点,
         """
-        job_id, n_time, *n_msg = args
-        assert job_id and int(job_id), "请填写正确的ID"
         assert n_time or n_msg, "时间和内容必须修改一项"
         _update = {}
         if n_time:
             next_run_time, schedule_info = self.ner.extract_time(n_time)
-            _update.update(next_run_time=next_run_time, schedule_info=schedule_info)
+            _update.update(
+                next_run_time=next_run_time,
+                schedule_info=schedule_info,
+                anchor_time=next_run_time if schedule_info else None,
+            )
 
         if n_msg:
             remind_msg = ", ".join(n_msg)
             _update.update(remind_msg=remind_msg)
 
         nrow = ScheduleJobDao.update_job(
-            job_id=int(job_id), room=room.payload.topic, **_update
+            job_id=job_id, room=room.payload.topic, **_update
         )
         assert nrow, "没有这个ID, 任务失败, 请重试"
-        job = ScheduleJobDao.get_job(job_id=int(job_id), room=room.payload.topic)
+        job = ScheduleJobDao.get_job(job_id=job_id, room=room.payload.topic)
+        self.scheduler.notify(job)
         await self.say(
             room,
             f"任务已更新\n"
@@ -0,0 +1,396 @@
+"""运行指标
+
+计数器 / 仪表盘 / 直方图, 按名称及标签区分, 可导出为 Prometheus 文本格式或 JSON,
+定期写入本地文件, 或在本机端口上通过 HTTP 提供(GET /metrics, /metrics.json).
+未开启(METRICS_ENABLED=0)时获取指标返回空操作对象, timed 装饰的函数只多一次属性判断.
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import math
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from logger import logger
+from settings import Config
+
+# 默认的直方图分桶上限(秒)
+DEFAULT_BOUNDS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels_key(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def get(self) -> float:
+        return self.value
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, func: Callable[[], float] = None):
+        """:param func: 导出时调用获取当前值, 如队列长度"""
+        self.value = 0
+        self._func = func
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def get(self) -> float:
+        return self._func() if self._func is not None else self.value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, bounds: Iterable[float] = DEFAULT_BOUNDS):
+        self.bounds = tuple(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self._counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def counts(self) -> Dict[str, int]:
+        """各分桶(不累计)的数量"""
+        labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+        return dict(zip(labels, self._counts))
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """-> [(分桶上限, 小于等于该上限的数量)], 最后一个上限为 inf"""
+        ret, total = [], 0
+        for bound, count in zip((*self.bounds, math.inf), self._counts):
+            total += count
+            ret.append((bound, total))
+        return ret
+
+    def quantile(self, q: float) -> float:
+        """分位数所在分桶的上限"""
+        target = q * self.count
+        for bound, total in self.cumulative():
+            if total >= target:
+                return bound
+        return math.inf
+
+    def get(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": self.counts(),
+        }
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class _Noop:
+    """未开启时的空操作指标"""
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _Noop()
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _Family:
+    def __init__(self, kind: str, help_text: str):
+        self.kind = kind
+        self.help = help_text
+        self.children: Dict[Labels, Metric] = {}
+
+
+class Registry:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._families: Dict[str, _Family] = {}
+
+    def _get(
+        self, cls, name: str, help_text: str, key: Labels, **kwargs
+    ) -> Union[Metric, _Noop]:
+        if not self.enabled:
+            return _NOOP
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = _Family(cls.kind, help_text)
+        metric = family.children.get(key)
+        if metric is None:
+            metric = family.children[key] = cls(**kwargs)
+        return metric
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        return self._get(Counter, name, help_text, _labels_key(labels))
+
+    def gauge(self, name: str, help_text: str = "", **labels) -> Gauge:
+        return self._get(Gauge, name, help_text, _labels_key(labels))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str = "",
+        bounds: Iterable[float] = DEFAULT_BOUNDS,
+        **labels,
+    ) -> Histogram:
+        return self._get(Histogram, name, help_text, _labels_key(labels), bounds=bounds)
+
+    def register(self, name: str, metric: Metric, help_text: str = "", **labels):
+        """注册已有的指标对象, 同名同标签的指标被替换"""
+        if not self.enabled:
+            return
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = _Family(metric.kind, help_text)
+        family.children[_labels_key(labels)] = metric
+
+    def unregister(self, name: str, **labels):
+        family = self._families.get(name)
+        if family is not None:
+            family.children.pop(_labels_key(labels), None)
+
+    def timer(self, name: str, help_text: str = "", **labels):
+        """with metrics.timer("xxx_seconds"): ... 记录耗时到直方图"""
+        if not self.enabled:
+            return _NOOP
+        return _Timer(self.histogram(name, help_text, **labels))
+
+    def timed(self, name: str, help_text: str = "", **labels):
+        """记录函数耗时到直方图, 默认以函数名作为 func 标签"""
+
+        def decorator(fn):
+            key = _labels_key({"func": fn.__qualname__, **labels})
+
+            if inspect.iscoroutinefunction(fn):
+
+                @functools.wraps(fn)
+                async def wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    start = time.perf_counter()
+                    try:
+                        return await fn(*args, **kwargs)
+                    finally:
+                        self._get(Histogram, name, help_text, key).observe(
+                            time.perf_counter() - start
+                        )
+
+            else:
+
+                @functools.wraps(fn)
+                def wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return fn(*args, **kwargs)
+                    start = time.perf_counter()
+                    try:
+                        return fn(*args, **kwargs)
+                    finally:
+                        self._get(Histogram, name, help_text, key).observe(
+                            time.perf_counter() - start
+                        )
+
+            return wrapper
+
+        return decorator
+
+    def reset(self):
+        self._families.clear()
+
+    def to_json(self) -> dict:
+        """-> {名称: [{"labels": {...}, "value": ...}]}"""
+        return {
+            name: [
+                {"labels": dict(key), "value": metric.get()}
+                for key, metric in family.children.items()
+            ]
+            for name, family in sorted(self._families.items())
+        }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for name, family in sorted(self._families.items()):
+            if family.help:
+                lines.append(f"# HELP {name} {family.help}")
+            lines.append(f"# TYPE {name} {family.kind}")
+            for key, metric in family.children.items():
+                if family.kind != "histogram":
+                    lines.append(f"{name}{_format_labels(key)} {metric.get()}")
+                    continue
+                for bound, total in metric.cumulative():
+                    le = "+Inf" if bound == math.inf else repr(float(bound))
+                    lines.append(
+                        f"{name}_bucket{_format_labels(key + (('le', le),))} {total}"
+                    )
+                lines.append(f"{name}_sum{_format_labels(key)} {metric.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """写入文件, 扩展名为 .json 时写入 JSON, 否则为 Prometheus 文本格式"""
+        if path.endswith(".json"):
+            content = json.dumps(self.to_json(), ensure_ascii=False)
+        else:
+            content = self.to_prometheus()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    async def export_loop(self, path: str, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.write(path)
+            except Exception as e:
+                logger.warning("写入指标失败: %s", e)
+
+    async def serve(self, port: int, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+        """HTTP 接口: GET /metrics 返回 Prometheus 文本格式, /metrics.json 返回 JSON"""
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                request = await reader.readline()
+                while (await reader.readline()).strip():
+                    pass
+                parts = request.decode("latin-1").split()
+                path = parts[1] if len(parts) > 1 else "/"
+                if path == "/metrics.json":
+                    body = json.dumps(self.to_json(), ensure_ascii=False)
+                    content_type = "application/json"
+                else:
+                    body = self.to_prometheus()
+                    content_type = "text/plain; version=0.0.4"
+                data = body.encode("utf-8")
+                writer.write(
+                    (
+                        f"HTTP/1.0 200 OK\r\nContent-Type: {content_type}; charset=utf-8"
+                        f"\r\nContent-Length: {len(data)}\r\n\r\n"
+                    ).encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: Labels) -> str:
+    if not key:
+        return ""
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+    return f"{{{pairs}}}"
+
+
+class LoopLagSampler:
+    """定期睡眠一小段时间, 实际唤醒时间比预期晚的部分即为事件循环被阻塞的时间"""
+
+    def __init__(self, registry: "Registry", interval: float = 0.5):
+        self.registry = registry
+        self.interval = interval
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - start - self.interval, 0)
+            self.registry.histogram(
+                "event_loop_lag_seconds", "事件循环延迟(秒)"
+            ).observe(lag)
+            self.registry.gauge(
+                "event_loop_lag_last_seconds", "最近一次采样的事件循环延迟(秒)"
+            ).set(lag)
+
+
+metrics = Registry(enabled=Config.METRICS_ENABLED)
+
+
+def start_metrics(
+    path: Optional[str] = Config.METRICS_PATH,
+    interval: float = Config.METRICS_INTERVAL,
+    port: int = Config.METRICS_PORT,
+    lag_interval: float = Config.METRICS_LOOP_LAG_INTERVAL,
+) -> List[asyncio.Task]:
+    """在事件循环中启动事件循环延迟采样及导出, 未开启时什么都不做"""
+    if not metrics.enabled:
+        return []
+    tasks = [asyncio.create_task(LoopLagSampler(metrics, lag_interval).run())]
+    if path:
+        tasks.append(asyncio.create_task(metrics.export_loop(path, interval)))
+    if port:
+        tasks.append(asyncio.create_task(metrics.serve(port)))
+    return tasks
@@ -1,10 +1,32 @@
 import time
+import zlib
 
-from peewee import SqliteDatabase, Model, CharField, IntegerField, TextField
+from typing import Iterable, Tuple
 
+from peewee import (
+    SqliteDatabase,
+    Model,
+    CharField,
+    IntegerField,
+    TextField,
+    FloatField,
+    chunked,
+)
+from playhouse.migrate import SqliteMigrator, make_index_name, migrate
+from playhouse.sqlite_ext import FTS5Model, SearchField
+
+from search import tokenize
 from typevar import JobState
 
 db = SqliteDatabase("wxbotv2.db")
+# auto_vacuum=INCREMENTAL, 归档后按页释放空间
+INCREMENTAL = 2
+
+
+@db.func("room_partition", 2)
+def room_partition(room: str, partition_count: int) -> int:
+    """群聊所属的哈希分区, 各进程中结果一致"""
+    return zlib.crc32(room.encode()) % partition_count
 
 
 class TableScheduleJob(Model):
@@ -15,8 +37,35 @@ class TableScheduleJob(Model):
     start_time = IntegerField(default=lambda: int(time.time()), help_text="开始时间")
     next_run_time = IntegerField(help_text="下一次执行时间")
     schedule_info = CharField(null=True, help_text="周期类型或天数")
+    anchor_time = IntegerField(null=True, help_text="周期任务最初设定的执行时间")
     state = IntegerField(default=JobState.ready, choices=JobState, help_text="任务执行状态")
     remind_msg = TextField(help_text="定时提醒内容")
+    # 升级前的任务为空, 视为在快照之前修改
+    update_time = IntegerField(
+        null=True,
+        index=True,
+        default=lambda: int(time.time()),
+        help_text="最后修改时间",
+    )
+
+    class Meta:
+        database = db
+        indexes = (
+            # 按群聊分页列出任务
+            (("room", "state", "next_run_time"), False),
+            # 时间轮等按执行时间范围加载生效中的任务
+            (("state", "next_run_time"), False),
+        )
+
+
+class TableJobSearch(FTS5Model):
+    """任务内容的全文索引, rowid 为任务真实ID
+    分词在 Python 中进行, 由存储层在写入任务的同一事务中同步(见 index_jobs),
+    任务表的触发器只用纯 SQL 删除过期的索引, 不依赖自定义函数, 其他连接也可以写任务表.
+    """
+
+    # 分词后的提醒内容
+    tokens = SearchField()
 
     class Meta:
         database = db
@@ -26,15 +75,109 @@ class TableScheduleRecord(Model):
     id = IntegerField(index=True, primary_key=True)
     job_real_id = IntegerField(index=True, help_text="任务真实ID")
     remind_msg = TextField(help_text="本次提醒内容")
-    create_time = IntegerField(default=lambda: int(time.time()), help_text="执行时间")
+    create_time = IntegerField(
+        index=True, default=lambda: int(time.time()), help_text="执行时间"
+    )
+
+    class Meta:
+        database = db
+
+
+class TableCatchupPolicy(Model):
+    id = IntegerField(index=True, primary_key=True)
+    room = TextField(help_text="群聊房间")
+    job_id = IntegerField(default=0, help_text="任务ID, 0为整个群聊的默认策略")
+    policy = CharField(help_text="补发策略")
+
+    class Meta:
+        database = db
+        indexes = ((("room", "job_id"), True),)
+
+
+class TableSchedulerLease(Model):
+    partition_id = IntegerField(primary_key=True, help_text="群聊哈希分区")
+    owner = CharField(null=True, help_text="持有该分区的调度进程")
+    expire_time = FloatField(default=0, help_text="租约到期时间")
 
     class Meta:
         database = db
 
 
+def migrate_tables(*models: Model):
+    """为已存在的表补充新增的字段及联合索引"""
+    migrator = SqliteMigrator(db)
+    operations = []
+    for model in models:
+        table = model._meta.table_name
+        if not db.table_exists(table):
+            continue
+        columns = {c.name for c in db.get_columns(table)}
+        for field in model._meta.sorted_fields:
+            if field.column_name not in columns:
+                operations.append(migrator.add_column(table, field.column_name, field))
+        indexes = {index.name for index in db.get_indexes(table)}
+        for index_columns, unique in model._meta.indexes:
+            if make_index_name(table, index_columns) not in indexes:
+                operations.append(migrator.add_index(table, index_columns, unique))
+    if operations:
+        migrate(*operations)
+
+
+def index_jobs(rows: Iterable[Tuple[int, str]]):
+    """为任务 [(真实ID, 提醒内容)] 建立或更新全文索引"""
+    index = TableJobSearch
+    fields = [index.rowid, index.tokens]
+    for batch in chunked(((rowid, tokenize(msg)) for rowid, msg in rows), 500):
+        index.insert_many(batch, fields=fields).on_conflict_replace().execute()
+
+
+def create_search_index():
+    """创建全文索引及触发器, 为没有索引的任务(如其他连接直接写入的)补建索引"""
+    job, index = TableScheduleJob, TableJobSearch
+    database = index._meta.database
+    job_table, index_table = job._meta.table_name, index._meta.table_name
+    with database.atomic():
+        index.create_table()
+        # 旧版本的触发器调用自定义分词函数, 没有注册该函数的连接无法写任务表;
+        # 旧版本的 modify 触发器在内容未变时也会删除索引, 重新创建
+        for name in ("insert", "update", "modify"):
+            database.execute_sql(f"DROP TRIGGER IF EXISTS {job_table}_search_{name}")
+        for name, event, when in (
+            ("delete", "DELETE", ""),
+            # 内容修改后旧的索引失效, 由存储层或下次启动时重新建立
+            (
+                "modify",
+                "UPDATE OF remind_msg",
+                "WHEN old.remind_msg IS NOT new.remind_msg ",
+            ),
+        ):
+            database.execute_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {job_table}_search_{name} "
+                f"AFTER {event} ON {job_table} {when}"
+                f"BEGIN DELETE FROM {index_table} WHERE rowid = old.id; END"
+            )
+        missing = job.select(job.id, job.remind_msg).where(
+            job.id.not_in(index.select(index.rowid))
+        )
+        index_jobs(list(missing.tuples()))
+
+
 def create_tables():
+    # 建表前才能设置 auto_vacuum, 已有的数据库需停机后用 scripts.vacuum 转换
+    if not db.get_tables():
+        db.pragma("auto_vacuum", INCREMENTAL)
     with db:
-        db.create_tables([TableScheduleJob, TableScheduleRecord])
+        # 先补充字段, 否则 sqlite 建表时会把不存在的字段当作字符串创建索引
+        migrate_tables(TableScheduleJob, TableScheduleRecord)
+        db.create_tables(
+            [
+                TableScheduleJob,
+                TableScheduleRecord,
+                TableCatchupPolicy,
+                TableSchedulerLease,
+            ]
+        )
+        create_search_index()
 
 
 create_tables()
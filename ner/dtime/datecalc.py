@@ -0,0 +1,74 @@
+"""日期计算
+
+时间识别中用到的 relativedelta 运算, 以月份天数表及整数序数直接计算, 结果与 relativedelta 一致:
+先按年/月移动, 当月没有这一天时取当月最后一天, 再加上天数及秒数.
+"""
+
+from datetime import datetime, timedelta
+from typing import Tuple
+
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+DAY_SECONDS = 24 * 60 * 60
+
+
+def is_leap(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def days_in_month(year: int, month: int) -> int:
+    if month == 2 and is_leap(year):
+        return 29
+    return _DAYS_IN_MONTH[month]
+
+
+def add_months(dt: datetime, months: int) -> datetime:
+    """dt + relativedelta(months=months)"""
+    if not months:
+        return dt
+    year, month = divmod(dt.year * 12 + dt.month - 1 + months, 12)
+    month += 1
+    return dt.replace(
+        year=year, month=month, day=min(dt.day, days_in_month(year, month))
+    )
+
+
+def add_years(dt: datetime, years: int) -> datetime:
+    """dt + relativedelta(years=years)"""
+    return add_months(dt, years * 12)
+
+
+def shift(
+    dt: datetime, years: int = 0, months: int = 0, days: int = 0, seconds: int = 0
+) -> datetime:
+    """dt + relativedelta(years=years, months=months, days=days, seconds=seconds)"""
+    dt = add_months(dt, years * 12 + months)
+    if days or seconds:
+        dt += timedelta(days=days, seconds=seconds)
+    return dt
+
+
+def weekday_date(dt: datetime, weekday: int) -> datetime:
+    """dt 所在的周(周一至周日)中星期 weekday(1-7) 的 0 点"""
+    return datetime.fromordinal(dt.toordinal() - dt.weekday() + weekday - 1)
+
+
+def _carry(value: int, base: int) -> Tuple[int, int]:
+    """按绝对值进位, 余数与 value 同号"""
+    sign = -1 if value < 0 else 1
+    div, mod = divmod(value * sign, base)
+    return div * sign, mod * sign
+
+
+def normalize(
+    years: int = 0, months: int = 0, days: int = 0, seconds: int = 0
+) -> Tuple[int, int, int, int]:
+    """与 relativedelta 相同的进位: 超过一天的秒进位到天, 超过一年的月进位到年
+    -> (年, 月, 日, 秒)
+    """
+    if abs(seconds) >= DAY_SECONDS:
+        extra_days, seconds = _carry(seconds, DAY_SECONDS)
+        days += extra_days
+    if abs(months) > 11:
+        extra_years, months = _carry(months, 12)
+        years += extra_years
+    return years, months, days, seconds
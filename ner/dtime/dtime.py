@@ -1,17 +1,18 @@
 import regex as re
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
 from typing import Optional, Dict, Union, Tuple, List, Callable
 from typing import Any, Text
 
-from dateutil.relativedelta import relativedelta
-
 from ner import BaseExtractor
-from ner.models import Datetime
+from ner.dtime import datecalc, holiday
+from ner.models import DatetimeResult, DatetimeTypeEnum, DatetimeValue
 from ner.number import number_ext
 from ner.dtime.date_pattern import YEAR_OPTIONAL_DATE, YEAR
 
 __all__ = ("DateObject", "Duration", "ZHDatetimeExtractor", "date_extractor")
 
+WEEK = timedelta(weeks=1)
+
 
 # Duration除外的日期表达
 class DateObject:
@@ -122,22 +123,6 @@ class DateObject:
             "大前": -3,
             "大后": 3,
         }
-        self.holiday_dict = {
-            "元旦": (datetime(2018, 1, 1), datetime(2019, 1, 1), datetime(2020, 1, 1)),
-            "除夕": (datetime(2018, 2, 15), datetime(2019, 2, 4), datetime(2020, 1, 24)),
-            "年30": (datetime(2018, 2, 15), datetime(2019, 2, 4), datetime(2020, 1, 24)),
-            "春节": (datetime(2018, 2, 16), datetime(2019, 2, 5), datetime(2020, 1, 25)),
-            "清明": (datetime(2018, 4, 5), datetime(2019, 4, 5), datetime(2020, 4, 5)),
-            "劳动": (datetime(2018, 5, 1), datetime(2019, 5, 1), datetime(2020, 5, 1)),
-            "端午": (datetime(2018, 6, 18), datetime(2019, 6, 7), datetime(2020, 6, 25)),
-            "中秋": (datetime(2018, 9, 24), datetime(2019, 9, 13), datetime(2020, 10, 1)),
-            "国庆": (datetime(2018, 10, 1), datetime(2019, 10, 1), datetime(2020, 10, 1)),
-            "圣诞": (
-                datetime(2018, 12, 25),
-                datetime(2019, 12, 25),
-                datetime(2020, 12, 25),
-            ),
-        }
         self.timerange_dict = {
             "清晨": (4, 4),
             "黎明": (4, 4),
@@ -211,13 +196,8 @@ class DateObject:
                 if self.is_week == 1:
                     if other.is_week is None:
                         return False
-            # TODO 2021年节假日还需修改这里
             if other.parse_code == 30:
-                if (
-                    (self.base_time.year != 2018)
-                    and (self.base_time.year != 2019)
-                    and (self.base_time.year != 2020)
-                ) or (not (self.is_range[0])):
+                if not holiday.in_range(self.base_time.year) or not self.is_range[0]:
                     return False
             if self.is_specific_time and not (snd_highest == 3):
                 return False
@@ -253,9 +233,9 @@ class DateObject:
                     sum_duration[3] = other.duration[3]
             sum_datetime_type = self.calculate_datetime_type(sum_is_range)
             if other.parse_code == 30:
-                sum_base_time = self.holiday_dict[other.entity][
-                    self.base_time.year - 2018
-                ]
+                sum_base_time = holiday.holiday_date(
+                    other.entity, self.base_time.year
+                )
             else:
                 sum_base_time = self.add_base_time_helper(self.base_time, other)
             if not sum_base_time:
@@ -335,21 +315,19 @@ class DateObject:
             sum_base_time = sum_base_time["start"]
         if other.is_week == 2:
             if (other.base_time >= base_time) and (
-                other.base_time < (base_time + relativedelta(weeks=1))
+                other.base_time < (base_time + WEEK)
             ):
                 sum_base_time = other.base_time
-            elif (other.base_time - relativedelta(weeks=1) >= base_time) and (
-                other.base_time - relativedelta(weeks=1)
-                < (base_time + relativedelta(weeks=1))
+            elif (other.base_time - WEEK >= base_time) and (
+                other.base_time - WEEK < (base_time + WEEK)
             ):
-                sum_base_time = other.base_time - relativedelta(weeks=1)
-            elif (other.base_time + relativedelta(weeks=1) >= base_time) and (
-                other.base_time + relativedelta(weeks=1)
-                < (base_time + relativedelta(weeks=1))
+                sum_base_time = other.base_time - WEEK
+            elif (other.base_time + WEEK >= base_time) and (
+                other.base_time + WEEK < (base_time + WEEK)
             ):
-                sum_base_time = other.base_time + relativedelta(weeks=1)
+                sum_base_time = other.base_time + WEEK
             else:
-                sum_base_time = other.base_time + relativedelta(weeks=2)
+                sum_base_time = other.base_time + 2 * WEEK
         elif self.is_specific_time:
             found = False
             if self.is_range[1]:
@@ -485,12 +463,7 @@ class DateObject:
     # 调整离散日期的base_time为现在的上一个日期
     def adjust_base_to_previous(self):
         if self.base_time > self.now:
-            self.base_time -= relativedelta(
-                years=self.period[0],
-                months=self.period[1],
-                days=self.period[2],
-                seconds=self.period[3],
-            )
+            self.base_time = datecalc.shift(self.base_time, *(-p for p in self.period))
 
     # 类似"(年.)月.日"的处理
     def parse_input_0(self):
@@ -550,86 +523,55 @@ class DateObject:
 
     # 表示X时刻前/后以及前/后X时刻的处理
     def parse_input_3(self):
+        # 各级别的单位及"半"对应的 (年, 月, 日, 秒)
+        unit_dict = {
+            "years": (1, 0, 0, 0),
+            "months": (0, 1, 0, 0),
+            "weeks": (0, 0, 7, 0),
+            "days": (0, 0, 1, 0),
+            "hours": (0, 0, 0, 3600),
+            "minutes": (0, 0, 0, 60),
+            "seconds": (0, 0, 0, 1),
+        }
         half_delta_dict = {
-            "years": relativedelta(months=6),
-            "months": relativedelta(days=15),
-            "days": relativedelta(hours=12),
-            "hours": relativedelta(minutes=30),
-            "minutes": relativedelta(seconds=30),
+            "years": (0, 6, 0, 0),
+            "months": (0, 0, 15, 0),
+            "days": (0, 0, 0, 43200),
+            "hours": (0, 0, 0, 1800),
+            "minutes": (0, 0, 0, 30),
         }
-        if self.data["level"] == "years":
-            if self.data["years"]:
-                delta = relativedelta(years=int(self.data["years"]))
-                if "半" in self.entity:
-                    delta += half_delta_dict["years"]
-            else:
-                delta = half_delta_dict["years"]
-        elif self.data["level"] == "months":
-            if self.data["months"]:
-                delta = relativedelta(months=int(self.data["months"]))
-                if "半" in self.entity:
-                    delta += half_delta_dict["months"]
-            else:
-                delta = half_delta_dict["months"]
-        elif self.data["level"] == "weeks":
-            delta = relativedelta(weeks=int(self.data["weeks"]))
-        elif self.data["level"] == "days":
-            if self.data["days"]:
-                delta = relativedelta(days=int(self.data["days"]))
-                if "半" in self.entity:
-                    delta += half_delta_dict["days"]
-            else:
-                delta = half_delta_dict["days"]
-        elif self.data["level"] == "hours":
-            if self.data["hours"]:
-                delta = relativedelta(hours=int(self.data["hours"]))
-                if "半" in self.entity:
-                    delta += half_delta_dict["hours"]
-            else:
-                delta = half_delta_dict["hours"]
-        elif self.data["level"] == "minutes":
-            if self.data["minutes"]:
-                delta = relativedelta(minutes=int(self.data["minutes"]))
-                if "半" in self.entity:
-                    delta += half_delta_dict["minutes"]
-            else:
-                if "1刻钟" in self.entity:
-                    delta = relativedelta(minutes=15)
-                elif "3刻钟" in self.entity:
-                    delta = relativedelta(minutes=45)
-                else:
-                    delta = half_delta_dict["minutes"]
+        level = self.data["level"]
+        if level not in unit_dict:
+            level = "seconds"
+        if level not in half_delta_dict or self.data[level]:
+            number = int(self.data[level])
+            delta = tuple(number * u for u in unit_dict[level])
+            if level in half_delta_dict and "半" in self.entity:
+                delta = tuple(a + b for a, b in zip(delta, half_delta_dict[level]))
+        elif level == "minutes" and "1刻钟" in self.entity:
+            delta = (0, 0, 0, 900)
+        elif level == "minutes" and "3刻钟" in self.entity:
+            delta = (0, 0, 0, 2700)
         else:
-            delta = relativedelta(seconds=int(self.data["seconds"]))
+            delta = half_delta_dict[level]
         if (self.entity[-1] == "前") or (self.entity[0] == "前"):
-            self.base_time = (self.now - delta).replace(microsecond=0)
+            self.base_time = datecalc.shift(self.now, *(-d for d in delta))
+            self.base_time = self.base_time.replace(microsecond=0)
         elif self.entity[-1] == "后":
-            self.base_time = (self.now + delta).replace(microsecond=0)
+            self.base_time = datecalc.shift(self.now, *delta).replace(microsecond=0)
         else:
             self.base_time = self.now.replace(microsecond=0)
         if any(self.is_range):
-            self.duration = [
-                delta.years,
-                delta.months,
-                delta.days,
-                delta.hours * 3600 + delta.minutes * 60 + delta.seconds,
-            ]
+            self.duration = list(datecalc.normalize(*delta))
 
     # 获取本周X日期
     def get_weekday_date(self, weekday):
-        weekday -= 1
-        result_date = self.now
-        while result_date.weekday() != weekday:
-            if result_date.weekday() > weekday:
-                result_date += relativedelta(days=-1)
-            else:
-                result_date += relativedelta(days=1)
-        return datetime(result_date.year, result_date.month, result_date.day)
+        return datecalc.weekday_date(self.now, weekday)
 
     def discrete_week_helper(self):
         self.datetime_level[0], self.datetime_level[1] = 0, 0
         if self.base_time > self.now:
-            self.base_time += relativedelta(weeks=-1)
+            self.base_time -= WEEK
         self.is_discrete[0] = 1
         self.period[2] = 7
         self.is_week = 2
@@ -638,39 +580,25 @@ class DateObject:
     def parse_input_4(self):
         # 相对年表达
         if self.parse_code == 24:
-            if self.data["relative"][0]:
-                relative_delta = relativedelta(
-                    years=self.relative_date_dict[self.data["relative"][0]]
-                )
-            else:
-                relative_delta = relativedelta(
-                    years=self.relative_date_dict[self.data["relative"][1]]
-                )
-            self.base_time += relative_delta
+            relative = self.data["relative"][0] or self.data["relative"][1]
+            self.base_time = datecalc.add_years(
+                self.base_time, self.relative_date_dict[relative]
+            )
         # 相对月表达
         elif self.parse_code == 25:
-            self.base_time += relativedelta(
-                months=self.relative_date_dict[self.data["relative"]]
+            self.base_time = datecalc.add_months(
+                self.base_time, self.relative_date_dict[self.data["relative"]]
             )
         # 相对周表达
         elif self.parse_code == 26:
             self.base_time = self.get_weekday_date(1)
-            if self.data["relative"][0]:
-                relative_delta = relativedelta(
-                    weeks=self.relative_date_dict[self.data["relative"][0]]
-                )
-            else:
-                relative_delta = relativedelta(
-                    weeks=self.relative_date_dict[self.data["relative"][1]]
-                )
-            self.base_time += relative_delta
+            relative = self.data["relative"][0] or self.data["relative"][1]
+            self.base_time += self.relative_date_dict[relative] * WEEK
         # 相对周末表达
         elif self.parse_code == 27:
             self.base_time = self.get_weekday_date(6)
             if self.data["relative"]:
-                self.base_time += relativedelta(
-                    weeks=self.relative_date_dict[self.data["relative"]]
-                )
+                self.base_time += self.relative_date_dict[self.data["relative"]] * WEEK
             else:
                 self.discrete_week_helper()
         # 相对周X(具体日期)表达
@@ -679,29 +607,26 @@ class DateObject:
                 self.data["weekday"] = "7"
             self.base_time = self.get_weekday_date(int(self.data["weekday"]))
             if self.data["relative"][1]:
-                self.base_time += relativedelta(
-                    weeks=self.relative_date_dict[self.data["relative"][1]]
-                )
+                relative = self.data["relative"][1]
+                self.base_time += self.relative_date_dict[relative] * WEEK
             elif not (self.data["relative"][0]):
                 self.discrete_week_helper()
         # 相对日表达
         elif self.parse_code == 29:
-            self.base_time += relativedelta(
-                days=self.relative_date_dict[self.entity[0:-1]]
-            )
+            self.base_time += timedelta(days=self.relative_date_dict[self.entity[0:-1]])
         # 相对小时表达
         elif self.parse_code == 34:
-            self.base_time += relativedelta(
+            self.base_time += timedelta(
                 hours=self.relative_date_dict[self.entity[0:-2]]
             )
         # 相对小时表达
         elif self.parse_code == 35:
-            self.base_time += relativedelta(
+            self.base_time += timedelta(
                 minutes=self.relative_date_dict[self.data["relative"]]
             )
         # 相对小时表达
         elif self.parse_code == 36:
-            self.base_time += relativedelta(
+            self.base_time += timedelta(
                 seconds=self.relative_date_dict[self.data["relative"]]
             )
 
@@ -717,24 +642,21 @@ class DateObject:
             self.duration[3] = 3600 * self.datetimerange_dict[self.entity][1]
         self.base_time = self.now.replace(hour=hour, minute=0, second=0, microsecond=0)
         if self.parse_code == 33:
-            self.base_time += relativedelta(
-                days=self.datetimerange_dict[self.entity][2]
-            )
+            self.base_time += timedelta(days=self.datetimerange_dict[self.entity][2])
 
     # 解析日期表述，按需要更新base_time, period, 以及duration字段, 计算出具体输出值以及最接近目前时间的值。
     def parse_input(self):
         if self.parse_code == 30:  # 假期
-            self.base_time = self.holiday_dict[self.entity][1]
+            # 去年, 今年, 明年
+            dates = [
+                holiday.holiday_date(self.entity, year)
+                for year in range(self.now.year - 1, self.now.year + 2)
+            ]
+            self.base_time = dates[1]
             if self.base_time > self.now:
-                self.value = [
-                    self.holiday_dict[self.entity][0],
-                    self.holiday_dict[self.entity][1],
-                ]
+                self.value = dates[:2]
             else:
-                self.value = [
-                    self.holiday_dict[self.entity][1],
-                    self.holiday_dict[self.entity][2],
-                ]
+                self.value = dates[1:]
         else:
             if self.parse_code in self.parse_dict:
                 self.parse_dict[self.parse_code]()
@@ -742,42 +664,41 @@ class DateObject:
         self.calculate_nearest()
 
     def calculate_value(self):
-        date_period = relativedelta(
-            years=self.period[0], months=self.period[1], days=self.period[2]
-        )
-        time_period = relativedelta(seconds=self.period[3])
-        duration = relativedelta(
-            years=self.duration[0],
-            months=self.duration[1],
-            days=self.duration[2],
-            seconds=self.duration[3],
-        )
+        base_time = self.base_time
+        time_period = timedelta(seconds=self.period[3])
         if any(self.period):
+            next_base_time = datecalc.shift(base_time, *self.period[0:3])
             if any(self.duration):
                 self.value = [
-                    {"start": self.base_time, "end": self.base_time + duration},
                     {
-                        "start": self.base_time + date_period,
-                        "end": self.base_time + date_period + duration,
+                        "start": base_time,
+                        "end": datecalc.shift(base_time, *self.duration),
+                    },
+                    {
+                        "start": next_base_time,
+                        "end": datecalc.shift(next_base_time, *self.duration),
                     },
                 ]
             else:
                 if any(self.period[0:3]) and self.period[3]:
                     self.value = [
-                        self.base_time,
-                        self.base_time + time_period,
-                        self.base_time + date_period,
-                        self.base_time + date_period + time_period,
+                        base_time,
+                        base_time + time_period,
+                        next_base_time,
+                        next_base_time + time_period,
                     ]
                 elif self.period[3]:
-                    self.value = [self.base_time, self.base_time + time_period]
+                    self.value = [base_time, base_time + time_period]
                 else:
-                    self.value = [self.base_time, self.base_time + date_period]
+                    self.value = [base_time, next_base_time]
         else:
             if any(self.duration):
-                self.value = {"start": self.base_time, "end": self.base_time + duration}
+                self.value = {
+                    "start": base_time,
+                    "end": datecalc.shift(base_time, *self.duration),
+                }
             else:
-                self.value = self.base_time
+                self.value = base_time
 
     def calculate_nearest(self):
         if type(self.value) == list:
@@ -878,10 +799,12 @@ def get_type(
     return rtn, is_range
 
 
-def get_datetime_value(data: Union[Dict, datetime]) -> Tuple[datetime, Optional[int]]:
+def get_datetime_value(
+    data: Union[Dict, datetime]
+) -> Tuple[datetime, Optional[timedelta]]:
     if isinstance(data, dict):
         value = data["start"]
-        delta = int((data["end"] - value).total_seconds())
+        delta = timedelta(seconds=int((data["end"] - value).total_seconds()))
     else:
         value = data
         delta = None
@@ -997,7 +920,7 @@ class ZHDatetimeExtractor(BaseExtractor):
         }
         self.now_func = now_func
 
-    def parse(self, text: Text, *args: Any) -> List[Datetime]:
+    def parse(self, text: Text, *args: Any) -> List[DatetimeResult]:
         # s_arabic_without_dot: 中文数字转换为阿拉伯数字 (不替换"点")
         (
             s_arabic_without_dot,
@@ -1846,10 +1769,13 @@ class ZHDatetimeExtractor(BaseExtractor):
             if is_duration:
                 datetime_level = [0, 0, 0, 0, 0, 1]
                 date_type, is_range = "duration", True
+                # 时长以秒为单位
                 if is_multivalue:
-                    values = [{"value": None, "delta": v} for v in obj.value]
+                    values = [
+                        DatetimeValue(None, timedelta(seconds=v)) for v in obj.value
+                    ]
                 else:
-                    values = [{"value": None, "delta": obj.value}]
+                    values = [DatetimeValue(None, timedelta(seconds=obj.value))]
 
             else:
                 datetime_level = obj.datetime_level
@@ -1857,11 +1783,9 @@ class ZHDatetimeExtractor(BaseExtractor):
                 if is_multivalue:
                     values = []
                     for v in obj.value:
-                        value, delta = get_datetime_value(v)
-                        values.append({"value": value, "delta": delta})
+                        values.append(DatetimeValue(*get_datetime_value(v)))
                 else:
-                    value, delta = get_datetime_value(obj.value)
-                    values = [{"value": value, "delta": delta}]
+                    values = [DatetimeValue(*get_datetime_value(obj.value))]
 
             try:
                 search_rtn = re.search(obj.entity, text)
@@ -1873,17 +1797,15 @@ class ZHDatetimeExtractor(BaseExtractor):
                 raise
             else:
                 date_objects.append(
-                    Datetime(
-                        **{
-                            "entity": obj.entity,
-                            "start_pos": start_pos,
-                            "end_pos": end_pos,
-                            "type": date_type,
-                            "is_range": is_range,
-                            "is_multivalue": is_multivalue,
-                            "values": values,
-                            "datetime_level": datetime_level,
-                        }
+                    DatetimeResult(
+                        entity=obj.entity,
+                        start_pos=start_pos,
+                        end_pos=end_pos,
+                        type=DatetimeTypeEnum(date_type),
+                        is_range=is_range,
+                        is_multivalue=is_multivalue,
+                        datetime_level=list(datetime_level),
+                        values=values,
                     )
                 )
 
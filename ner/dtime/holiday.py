@@ -0,0 +1,36 @@
+"""节日日期
+
+公历固定日期的节日直接计算, 其余节日从 holiday_data 的日期表中按 (节日, 年份) 读取,
+日期表在导入时解码一次. 日期表由 python -m scripts.gen_holidays 生成.
+"""
+
+import base64
+from datetime import datetime, timedelta
+
+from ner.dtime.holiday_data import BASE_MONTHS, DATA, FIRST_YEAR, HOLIDAYS, LAST_YEAR
+
+# 公历固定日期的节日: (月, 日)
+FIXED_HOLIDAYS = {"元旦": (1, 1), "劳动": (5, 1), "国庆": (10, 1), "圣诞": (12, 25)}
+ALIASES = {"年30": "除夕"}
+
+_TABLE = base64.b64decode(DATA)
+_YEARS = LAST_YEAR - FIRST_YEAR + 1
+# {节日: (在日期表中的起始位置, 起算月份)}
+_INDEX = {
+    name: (i * _YEARS, month)
+    for i, (name, month) in enumerate(zip(HOLIDAYS, BASE_MONTHS))
+}
+
+
+def in_range(year: int) -> bool:
+    return FIRST_YEAR <= year <= LAST_YEAR
+
+
+def holiday_date(name: str, year: int) -> datetime:
+    """节日在公历 year 年的日期"""
+    name = ALIASES.get(name, name)
+    assert in_range(year), f"只支持{FIRST_YEAR}-{LAST_YEAR}年的节日"
+    if name in FIXED_HOLIDAYS:
+        return datetime(year, *FIXED_HOLIDAYS[name])
+    start, month = _INDEX[name]
+    return datetime(year, month, 1) + timedelta(days=_TABLE[start + year - FIRST_YEAR])
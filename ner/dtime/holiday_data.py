@@ -0,0 +1,27 @@
+"""节日日期表, 由 python -m scripts.gen_holidays 生成, 请勿手动修改"""
+
+FIRST_YEAR = 1900
+LAST_YEAR = 2099
+HOLIDAYS = ("除夕", "春节", "清明", "端午", "中秋")
+BASE_MONTHS = (1, 1, 4, 5, 9)
+# base64 编码, 节日按 HOLIDAYS 的顺序, 每个节日每年一个字节
+DATA = (
+    "HTAlGy0hFyofFCccLyMYKyAVKB4xJRotIhYqHxUnHC4jGCshFigdMCUZLCIXKh8UJxsuIxkrIBYp"
+    "HS8lGiwiFyofEyYcLiMZLCAVKB0vJBotIhcqHzEmGy4jGSwhFScdMCQaLSIWKR4UJhsvJBgrIBUn"
+    "HTAlGi0iFykeFCcbLiMYKiAVKB0wJRosIRYpHhQnHC4jGCsfFSgeMCUaLCEWKR8TJhsuIhgrIBUo"
+    "HTAkGSwiFikfFCYbLiMYKyAWJxwvJBksIhcpHhMeMSYcLiIYKyAVKB0wJBksIRYpHzImGy4jFysg"
+    "FigdLyQZLCIXKR4xJhotIxgrIBUoHC8kGiwhFyoeMCYbLSMYKyAUJx0vJBotIRYpHjAlGy4jGCsg"
+    "MiccLyQaLSIWKB4xJRsuIxcqHxUnHDAlGSwhFigeMSYbLiMYKh8VKBwvJBkrIRYpHjEmGy0iFyof"
+    "FSgdLyQZLCAWKR8xJhstIhcqIBQnHC8jGSwhFikeMSUaLSMXKiAVJxwvJBksIRcoHTAlGi0jGCof"
+    "FAQEBQUEBAUFBAQFBQQEBAUEBAQFBAQEBQQEBAUEBAQFBAQEBQQEBAUEBAQFBAQEBAQEBAQEBAQE"
+    "BAQEBAQEBAQEBAQEBAQEBAQEBAQDBAQEAwQEBAMEBAQDBAQEAwQEBAMEBAQDBAQEAwQEBAMDBAQD"
+    "AwQEAwMEBAMDBAQDAwQEAwMEBAMDBAQDAwQEAwMDBAMDAwQDAwMEAwMDBAMDAwQDAwMEAwMDBAMD"
+    "AwQDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDHzIoHjAlOC0hNCkfMSccLyM1KyAyKB4wJDcs"
+    "IjQpHzImGy4jNSsgMygdMCU3LCI1KR8xJxstIzYrIDMoHC8kNywiNSoeMSYbLSM2LCAzKB0vJDct"
+    "IjQpHjAmGy4jNisgMicdMCQ3LSI0KR4xJhsuJDUqIDInHTAlNywhNCgeMScbLiM2Kh8yKB0wJRos"
+    "ITQpHjEmHC0iNSsfMigdLyQ3LCE0KR8xJhsuIjUrIDIoHS8kNiwiNCkfMSUaLSM1KyAzJxwvJDYs"
+    "IjUHGg8iFwwfFQkbESMYDiEWCx0SJRkPIhgMHxQJGxAjGQ4hFgsdEiUaDyIXDR4TCRwQIxkOIBUK"
+    "HRIHGhAiFwwfEwkcESMZDiAVCh0TBxoPIhYLHhQJHBEkGA0gFQodEwgaDyIXCx4UChsRIxgNIBUL"
+    "HRIHGg4hFwweFAkcECMYDiAVCx4SBxoPIRcMHxMJGxAiGA4hFQodEgYZDyIXDB8UCBsQIxgOIBYK"
+    "HBIHGQ8iFwseEwkbECMZDSAVChwRBxoPIhcMHRMIHA=="
+)
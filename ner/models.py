@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import List, Optional, Union, Text
+from typing import List, NamedTuple, Optional, Union, Text
 
 from pydantic import BaseModel
 
@@ -35,3 +35,53 @@ class Datetime(Entity):
     is_multivalue: bool
     datetime_level: List[int]
     values: List[Value]
+
+
+# 识别过程内部使用的结果类型, 构造时不做校验.
+# 需要对外提供 pydantic 模型时调用 to_model(), 字段已是目标类型, 不再重复校验
+
+
+class NumberResult(NamedTuple):
+    entity: Text
+    start_pos: int
+    end_pos: int
+    num: Union[int, float]
+
+    def to_model(self) -> Number:
+        return Number.construct(
+            entity=self.entity,
+            start_pos=self.start_pos,
+            end_pos=self.end_pos,
+            num=self.num,
+        )
+
+
+class DatetimeValue(NamedTuple):
+    value: Optional[datetime]
+    delta: Optional[timedelta]
+
+    def to_model(self) -> Datetime.Value:
+        return Datetime.Value.construct(value=self.value, delta=self.delta)
+
+
+class DatetimeResult(NamedTuple):
+    entity: Text
+    start_pos: int
+    end_pos: int
+    type: DatetimeTypeEnum
+    is_range: bool
+    is_multivalue: bool
+    datetime_level: List[int]
+    values: List[DatetimeValue]
+
+    def to_model(self) -> Datetime:
+        return Datetime.construct(
+            entity=self.entity,
+            start_pos=self.start_pos,
+            end_pos=self.end_pos,
+            type=self.type,
+            is_range=self.is_range,
+            is_multivalue=self.is_multivalue,
+            datetime_level=self.datetime_level,
+            values=[v.to_model() for v in self.values],
+        )
@@ -2,7 +2,7 @@ from typing import List, Any, Tuple, Text
 from typing import Union
 
 from ner.number.extractors import ZHCustomizedExtractor, DatetimeIntegerExtractor
-from ner.models import Number
+from ner.models import NumberResult
 from recognizers_number import ModelResult, regex
 from recognizers_number import NumberRecognizer, Culture, AgnosticNumberParserFactory, ParserType, \
     ChineseNumberParserConfiguration, NumberModel, Model
@@ -82,18 +82,27 @@ class ZHNumberRecognizer(NumberRecognizer):
         return self.get_model('DatetimeNumberModel', culture, fallback_to_default_culture)
 
 
+def to_num(value: Text) -> Union[int, float]:
+    """识别结果中的数值为字符串, 整数优先"""
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
 class ZHNumberExtractor(BaseExtractor):
     def __init__(self):
         recognizer = ZHNumberRecognizer(Culture.Chinese)
         self.model = recognizer.get_number_model()
         self.datetime_model = recognizer.get_datetime_num_model()
 
-    def parse(self, text, *args: Any) -> List[Number]:
+    def parse(self, text, *args: Any) -> List[NumberResult]:
         result = self.model.parse(text)
         rtn = []
         for i in result:
-            value = i.resolution["value"]
-            rtn.append(Number(entity=i.text, start_pos=i.start, end_pos=i.end+1, num=value))
+            rtn.append(
+                NumberResult(i.text, i.start, i.end + 1, to_num(i.resolution["value"]))
+            )
         return rtn
 
     def parse_datetime_num(self, text) -> Tuple[Text, List, List]:
@@ -110,4 +119,4 @@ number_ext = ZHNumberExtractor()
 if __name__ == '__main__':
     ext = ZHNumberExtractor()
     while True:
-        print([i.dict() for i in ext.parse(input())])
+        print([i.to_model().dict() for i in ext.parse(input())])
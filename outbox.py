@@ -0,0 +1,233 @@
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from enum import IntEnum, unique
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+from wechaty import Room
+
+from logger import logger
+from metrics import Gauge, metrics
+from settings import Config
+
+
+@unique
+class Priority(IntEnum):
+    """发送优先级, 值越小越先发送"""
+
+    command = 0
+    reminder = 1
+
+
+class TokenBucket:
+    """令牌桶, 每秒补充 rate 个令牌, 最多积攒 capacity 个"""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._last = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._last) * self.rate
+        )
+        self._last = now
+
+    def wait_time(self) -> float:
+        """获取一个令牌还需等待的秒数, 0表示可以立即获取"""
+        self._refill()
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def consume(self):
+        self._refill()
+        self._tokens -= 1
+
+    def is_full(self) -> bool:
+        """令牌已补满, 与新建的令牌桶状态相同"""
+        self._refill()
+        return self._tokens >= self.capacity
+
+
+class _Envelope:
+    __slots__ = ("room", "msg", "priority", "future", "attempts", "not_before")
+
+    def __init__(self, room: Room, msg: Any, priority: Priority, future):
+        self.room = room
+        self.msg = msg
+        self.priority = priority
+        self.future = future
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+def _retrieve_exception(future: asyncio.Future):
+    # 不等待结果的消息发送失败时, 避免 "exception was never retrieved"
+    if not future.cancelled():
+        future.exception()
+
+
+async def _room_say(room: Room, msg: Any):
+    await room.ready()
+    await room.say(msg)
+
+
+class Outbox:
+    """统一的消息发送队列
+    按优先级分道, 全局及每个群聊分别限速, 发送失败时按抖动指数退避重试.
+    同一群聊同一优先级内的消息保持发送顺序.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Room, Any], Awaitable] = _room_say,
+        *,
+        global_rate: float = Config.SEND_GLOBAL_RATE,
+        global_burst: float = Config.SEND_GLOBAL_BURST,
+        room_rate: float = Config.SEND_ROOM_RATE,
+        room_burst: float = Config.SEND_ROOM_BURST,
+        max_retries: int = Config.SEND_MAX_RETRIES,
+        retry_base: float = Config.SEND_RETRY_BASE,
+        retry_cap: float = Config.SEND_RETRY_CAP,
+        reap_interval: float = Config.OUTBOX_REAP_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param reap_interval: 每隔该秒数回收已补满的群聊令牌桶, 下次发送时重新创建
+        """
+        self._send = send
+        self._clock = clock
+        self._room_rate = room_rate
+        self._room_burst = room_burst
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self._global = TokenBucket(global_rate, global_burst, clock)
+        self._rooms: Dict[str, TokenBucket] = {}
+        self.reap_interval = reap_interval
+        self._reap_at = clock() + reap_interval
+        self._lanes: Dict[Priority, Deque[_Envelope]] = {p: deque() for p in Priority}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        metrics.register(
+            "outbox_queue_depth", Gauge(self.__len__), "发送队列中的消息数"
+        )
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def put(
+        self, room: Room, msg: Any, priority: Priority = Priority.command
+    ) -> asyncio.Future:
+        """放入发送队列, 返回的 future 在消息发出(或最终失败)后完成"""
+        future = asyncio.get_event_loop().create_future()
+        future.add_done_callback(_retrieve_exception)
+        self._lanes[priority].append(_Envelope(room, msg, priority, future))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return future
+
+    def _room_bucket(self, room: Room) -> TokenBucket:
+        bucket = self._rooms.get(room.room_id)
+        if bucket is None:
+            bucket = TokenBucket(self._room_rate, self._room_burst, self._clock)
+            self._rooms[room.room_id] = bucket
+        return bucket
+
+    def _reap_buckets(self):
+        """回收空闲的群聊令牌桶, 补满的令牌桶与新建的相同, 回收不影响限速"""
+        now = self._clock()
+        if now < self._reap_at:
+            return
+        self._reap_at = now + self.reap_interval
+        idle = [room_id for room_id, b in self._rooms.items() if b.is_full()]
+        for room_id in idle:
+            del self._rooms[room_id]
+        if idle:
+            logger.debug("reap %s room token buckets", len(idle))
+
+    def _pick(self) -> Tuple[Optional[_Envelope], float]:
+        """-> 可发送的消息, 无可发送消息时需要等待的秒数"""
+        self._reap_buckets()
+        wait = self._global.wait_time()
+        if wait:
+            return None, wait
+
+        wait = math.inf
+        now = self._clock()
+        for priority in Priority:
+            lane = self._lanes[priority]
+            blocked: Set[str] = set()
+            for i, env in enumerate(lane):
+                room_id = env.room.room_id
+                if room_id in blocked:
+                    continue
+                room_wait = max(
+                    env.not_before - now, self._room_bucket(env.room).wait_time()
+                )
+                if room_wait > 0:
+                    blocked.add(room_id)
+                    wait = min(wait, room_wait)
+                    continue
+                del lane[i]
+                return env, 0.0
+        return None, wait
+
+    async def _run(self):
+        while True:
+            env, wait = self._pick()
+            if env is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), None if wait == math.inf else wait
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._global.consume()
+            self._room_bucket(env.room).consume()
+            await self._deliver(env)
+
+    async def _deliver(self, env: _Envelope):
+        try:
+            with metrics.timer("send_seconds", "发送消息耗时(秒)"):
+                await self._send(env.room, env.msg)
+        except Exception as e:
+            metrics.counter("send_failures_total", "消息发送失败次数").inc()
+            env.attempts += 1
+            if env.attempts > self.max_retries:
+                logger.error("消息发送失败, room:%s, error:%s", env.room.room_id, e)
+                if not env.future.done():
+                    env.future.set_exception(e)
+                return
+            delay = min(self.retry_cap, self.retry_base * 2 ** (env.attempts - 1))
+            env.not_before = self._clock() + delay * random.uniform(0.5, 1.5)
+            self._lanes[env.priority].appendleft(env)
+            logger.warning(
+                "消息发送失败, 第%s次重试, room:%s, error:%s",
+                env.attempts,
+                env.room.room_id,
+                e,
+            )
+            return
+
+        if not env.future.done():
+            env.future.set_result(None)
@@ -0,0 +1,223 @@
+"""周期任务下一次执行时间的计算
+
+直接跳到晚于当前时间的下一次执行时间, 不逐个周期累加;
+按月/按年的周期按日历计算, 日期锚定在任务最初设定的那一天, 当月没有这一天时取当月最后一天.
+
+除周期类型及天数外, schedule_info 还可以是周期规则, 格式为 单位[/间隔][:参数]:
+    h/2      每两小时
+    w/2      隔周, 星期及时刻与最初的执行时间相同
+    d:12345  每个工作日(周一至周五)
+    m:-1     每月最后一天
+    m:1#1    每月第一个周一, m:5#-1 每月最后一个周五
+规则的执行时刻及间隔的起点为任务最初设定的执行时间, 解析后的规则会缓存, 每次计算为常数时间.
+"""
+
+from calendar import monthrange
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import FrozenSet, Optional, Union
+
+from typevar import JobScheduleType
+
+_PERIOD_DAYS = {
+    JobScheduleType.daily: 1,
+    JobScheduleType.weekly: 7,
+}
+_PERIOD_MONTHS = {
+    JobScheduleType.monthly: 1,
+    JobScheduleType.yearly: 12,
+}
+
+
+def add_months(anchor: datetime, months: int) -> datetime:
+    """anchor 之后第 months 个月的同一天, 超出当月天数时取当月最后一天"""
+    year, month = divmod(anchor.month - 1 + months, 12)
+    year += anchor.year
+    month += 1
+    return anchor.replace(
+        year=year, month=month, day=min(anchor.day, monthrange(year, month)[1])
+    )
+
+
+class Rule:
+    __slots__ = ()
+
+    def next_after(self, anchor: datetime, ref: datetime) -> datetime:
+        """anchor 起的第一个晚于 ref 的执行时间"""
+        raise NotImplementedError
+
+    def first_after(self, anchor: datetime, now: datetime) -> datetime:
+        """不早于 anchor 且晚于 now 的第一个执行时间"""
+        return self.next_after(anchor, max(now, anchor - timedelta(seconds=1)))
+
+
+class IntervalRule(Rule):
+    """每 interval 小时/天/周"""
+
+    __slots__ = ("unit", "interval", "step")
+    UNITS = {"h": timedelta(hours=1), "d": timedelta(days=1), "w": timedelta(weeks=1)}
+
+    def __init__(self, unit: str, interval: int = 1):
+        assert interval > 0, "间隔必须大于0"
+        self.unit = unit
+        self.interval = interval
+        self.step = self.UNITS[unit] * interval
+
+    def __str__(self):
+        return f"{self.unit}/{self.interval}" if self.interval != 1 else self.unit
+
+    def next_after(self, anchor: datetime, ref: datetime) -> datetime:
+        periods = max((ref - anchor) // self.step + 1, 0)
+        return anchor + periods * self.step
+
+
+class WeekdayRule(Rule):
+    """每天, 只在指定的星期执行"""
+
+    __slots__ = ("weekdays", "_skip")
+
+    def __init__(self, weekdays: FrozenSet[int]):
+        """:param weekdays: 星期, 1-7 为周一至周日"""
+        assert weekdays and weekdays <= set(range(1, 8)), "星期不合法"
+        self.weekdays = frozenset(weekdays)
+        # 周一至周日各自到下一个执行日(含当天)的天数
+        self._skip = tuple(
+            next(n for n in range(7) if (w + n) % 7 + 1 in self.weekdays)
+            for w in range(7)
+        )
+
+    def __str__(self):
+        return "d:" + "".join(str(w) for w in sorted(self.weekdays))
+
+    def next_after(self, anchor: datetime, ref: datetime) -> datetime:
+        candidate = datetime.combine(ref.date(), anchor.time())
+        if candidate <= ref:
+            candidate += timedelta(days=1)
+        candidate = max(candidate, anchor)
+        return candidate + timedelta(days=self._skip[candidate.weekday()])
+
+
+class MonthlyRule(Rule):
+    """每 interval 个月, 在月末或第 n 个星期几执行"""
+
+    __slots__ = ("interval", "weekday", "nth")
+
+    def __init__(self, interval: int = 1, weekday: int = None, nth: int = -1):
+        """
+        :param weekday: 星期 1-7, 为空时表示月末
+        :param nth: 第几个星期几, -1 为最后一个
+        """
+        assert interval > 0, "间隔必须大于0"
+        assert weekday is None or 1 <= weekday <= 7, "星期不合法"
+        assert nth == -1 or 1 <= nth <= 4, "只支持第1-4个或最后一个"
+        self.interval = interval
+        self.weekday = weekday
+        self.nth = nth
+
+    def __str__(self):
+        interval = f"/{self.interval}" if self.interval != 1 else ""
+        spec = "-1" if self.weekday is None else f"{self.weekday}#{self.nth}"
+        return f"m{interval}:{spec}"
+
+    def day_of(self, year: int, month: int) -> int:
+        first_weekday, days = monthrange(year, month)
+        if self.weekday is None:
+            return days
+        if self.nth == -1:
+            last_weekday = (first_weekday + days - 1) % 7
+            return days - (last_weekday - self.weekday + 1) % 7
+        return 1 + (self.weekday - 1 - first_weekday) % 7 + 7 * (self.nth - 1)
+
+    def _occurrence(self, anchor: datetime, months: int) -> datetime:
+        year, month = divmod(anchor.month - 1 + months, 12)
+        year += anchor.year
+        month += 1
+        return anchor.replace(year=year, month=month, day=self.day_of(year, month))
+
+    def next_after(self, anchor: datetime, ref: datetime) -> datetime:
+        diff = (ref.year - anchor.year) * 12 + ref.month - anchor.month
+        months = max(diff // self.interval, 0) * self.interval
+        # 最多检查两个月: ref 所在的月及其后的下一个周期
+        next_time = self._occurrence(anchor, months)
+        if next_time <= ref:
+            next_time = self._occurrence(anchor, months + self.interval)
+        return next_time
+
+
+def is_rule(schedule_info: Union[str, int, None]) -> bool:
+    return (
+        isinstance(schedule_info, str)
+        and schedule_info[:1] in ("h", "d", "w", "m")
+        and schedule_info[1:2] in ("", "/", ":")
+    )
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(schedule_info: str) -> Rule:
+    """h/2, d:12345, m:1#1 -> 规则"""
+    head, _, spec = schedule_info.partition(":")
+    unit, _, interval = head.partition("/")
+    try:
+        interval = int(interval) if interval else 1
+        if unit in ("h", "w") or (unit == "d" and not spec):
+            assert not spec, f"不支持的周期规则: {schedule_info}"
+            return IntervalRule(unit, interval)
+        if unit == "d":
+            assert interval == 1, f"不支持的周期规则: {schedule_info}"
+            return WeekdayRule(frozenset(int(w) for w in spec))
+        if unit == "m":
+            if spec == "-1":
+                return MonthlyRule(interval)
+            weekday, nth = spec.split("#")
+            return MonthlyRule(interval, int(weekday), int(nth))
+    except ValueError:
+        pass
+    raise AssertionError(f"不支持的周期规则: {schedule_info}")
+
+
+def _next_by_days(current: datetime, ref: datetime, days: int) -> datetime:
+    step = timedelta(days=days)
+    periods = max((ref - current) // step, 0) + 1
+    return current + periods * step
+
+
+def _next_by_months(anchor: datetime, ref: datetime, months: int) -> datetime:
+    diff = (ref.year - anchor.year) * 12 + ref.month - anchor.month
+    periods = max(diff // months, 0)
+    next_time = add_months(anchor, periods * months)
+    while next_time <= ref:
+        periods += 1
+        next_time = add_months(anchor, periods * months)
+    return next_time
+
+
+def next_run_time(
+    schedule_info: Union[str, int],
+    current_run_time: int,
+    now: Optional[int] = None,
+    anchor_time: Optional[int] = None,
+) -> int:
+    """计算周期任务的下一次执行时间
+    :param schedule_info: 周期类型, 天数或周期规则
+    :param current_run_time: 本次执行时间
+    :param now: 当前时间, 默认为 time.time()
+    :param anchor_time: 任务最初设定的执行时间, 按月/按年的周期及周期规则以此确定日期
+    :return: 晚于本次执行时间及当前时间的第一个执行时间
+    """
+    current = datetime.fromtimestamp(current_run_time)
+    ref = max(
+        current, datetime.fromtimestamp(now) if now is not None else datetime.now()
+    )
+
+    anchor = current if anchor_time is None else datetime.fromtimestamp(anchor_time)
+    if is_rule(schedule_info):
+        return int(parse_rule(schedule_info).next_after(anchor, ref).timestamp())
+
+    schedule_type = JobScheduleType.get_type(str(schedule_info))
+    if schedule_type is None:
+        next_time = _next_by_days(current, ref, int(schedule_info))
+    elif schedule_type in _PERIOD_DAYS:
+        next_time = _next_by_days(current, ref, _PERIOD_DAYS[schedule_type])
+    else:
+        next_time = _next_by_months(anchor, ref, _PERIOD_MONTHS[schedule_type])
+    return int(next_time.timestamp())
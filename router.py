@@ -0,0 +1,138 @@
+"""命令路由
+
+启动时根据 r_command 标记的方法构建一次: 规范化后的命令名及别名 -> 命令.
+每个命令持有绑定好的异步处理函数及参数声明, 收到消息时只做一次字典查找,
+参数按声明校验并转换后传给处理函数, 处理耗时按命令记录到 command_seconds.
+
+    @r_command("cancel", aliases=("取消",), args=(Arg("任务ID", int, variadic=True),))
+    async def cancel(self, *job_ids: int, room: Room): ...
+"""
+
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple
+from typing import Optional, Tuple
+
+from constants import EN2ZH_MAP
+from metrics import metrics
+from utils import Decorator
+
+# 命令前缀
+PREFIX = "/"
+
+
+class Arg(NamedTuple):
+    """命令参数声明
+    name: 参数名称, 用于错误提示
+    convert: 转换函数, 失败时提示参数不合法
+    required: 是否必填, 非必填参数为空时传入 None
+    variadic: 收集剩余的全部参数, 只能是最后一个
+    """
+
+    name: str
+    convert: Callable[[str], Any] = str
+    required: bool = True
+    variadic: bool = False
+
+    def parse(self, value: str) -> Any:
+        try:
+            return self.convert(value.strip() if self.convert is not str else value)
+        except (TypeError, ValueError):
+            raise AssertionError(f"{self.name}不合法: {value}")
+
+
+def normalize(name: str) -> str:
+    return " ".join(name.translate(EN2ZH_MAP).lower().split())
+
+
+class Command:
+    __slots__ = ("name", "aliases", "args", "doc", "_handler")
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[..., Awaitable],
+        args: Iterable[Arg] = (),
+        aliases: Iterable[str] = (),
+        doc: str = None,
+    ):
+        self.name = name
+        self.aliases = tuple(aliases)
+        self.args = tuple(args)
+        self.doc = doc or ""
+        self._handler = handler
+        assert all(
+            not arg.variadic for arg in self.args[:-1]
+        ), f"{name}: 只有最后一个参数可以是 variadic"
+
+    def parse_args(self, raw_args: List[str]) -> list:
+        """按参数声明校验并转换, 多余的参数忽略"""
+        values = []
+        for i, arg in enumerate(self.args):
+            if arg.variadic:
+                rest = [v for v in raw_args[i:] if v.strip()]
+                assert rest or not arg.required, f"缺少{arg.name}"
+                values.extend(arg.parse(v) for v in rest)
+                break
+            raw = raw_args[i] if i < len(raw_args) else ""
+            if not raw.strip():
+                assert not arg.required, f"缺少{arg.name}"
+                values.append(None)
+                continue
+            values.append(arg.parse(raw))
+        return values
+
+    async def __call__(self, raw_args: List[str], **kwargs):
+        with metrics.timer("command_seconds", "命令处理耗时(秒)", cmd=self.name):
+            try:
+                return await self._handler(*self.parse_args(raw_args), **kwargs)
+            except Exception:
+                metrics.counter(
+                    "command_errors_total", "命令处理失败次数", cmd=self.name
+                ).inc()
+                raise
+
+
+def _as_async(fn: Callable) -> Callable[..., Awaitable]:
+    if inspect.iscoroutinefunction(fn):
+        return fn
+
+    async def wrapper(*args, **kwargs):
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+class CommandRouter:
+    def __init__(self, owner: object, decorator: Decorator):
+        """:param owner: 命令所在的对象, 处理函数绑定到该对象"""
+        # {命令名: 命令}, 不含别名
+        self.commands: Dict[str, Command] = {}
+        # {规范化后的命令名或别名: 命令}
+        self._routes: Dict[str, Command] = {}
+        for name, fn in decorator.get_members(type(owner)).items():
+            options = decorator.get_options(fn)
+            command = Command(
+                name,
+                _as_async(fn.__get__(owner)),
+                args=options.get("args", ()),
+                aliases=options.get("aliases", ()),
+                doc=fn.__doc__,
+            )
+            self.commands[name] = command
+            for key in (name, *command.aliases):
+                key = normalize(key)
+                assert key not in self._routes, f"命令重复: {key}"
+                self._routes[key] = command
+
+    @staticmethod
+    def is_command(text: str) -> bool:
+        return text.lstrip()[:1] == PREFIX
+
+    def get(self, name: str) -> Optional[Command]:
+        return self._routes.get(normalize(name))
+
+    def route(self, text: str) -> Tuple[str, Optional[Command], List[str]]:
+        """/命令,参数1,参数2 -> (命令名, 命令, [参数]), 无此命令时命令为 None"""
+        body = text.lstrip()[len(PREFIX) :].translate(EN2ZH_MAP)
+        name, sep, rest = body.partition(",")
+        return name, self._routes.get(normalize(name)), rest.split(",") if sep else []
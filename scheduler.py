@@ -0,0 +1,223 @@
+"""定时任务调度
+
+不再每秒轮询一次, 而是睡眠到最近一个任务的到期时间再触发.
+睡眠基于事件循环的单调时钟, 每隔 resync_interval 秒按系统时间重新计算到期时间,
+系统时间跳变(如NTP校时)时不会误触发或漏触发.
+到期任务按群聊提交后不等待触发完成, 一个群聊繁忙时不会推迟其他群聊的提醒.
+"""
+
+import asyncio
+import functools
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from dao import ScheduleJobDao
+from logger import logger
+from metrics import Histogram, metrics
+from models import TableScheduleJob
+from settings import Config
+
+# [(job, 是否超时)]
+RoomJobs = List[Tuple[TableScheduleJob, bool]]
+# {room: [(job, 是否超时)]}
+DueJobs = Dict[str, RoomJobs]
+
+
+# 触发延迟的分桶上限(秒)
+LATENESS_BOUNDS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 60)
+
+
+class BaseScheduler:
+    """调度器基类, 子类负责找出到期任务及计算下一个到期时间"""
+
+    # 触发失败的任务的重试间隔(秒)
+    RETRY_INTERVAL = 1
+
+    def __init__(
+        self,
+        fire: Callable[[str, RoomJobs], Awaitable],
+        *,
+        grace: float = Config.SCHEDULE_GRACE,
+        resync_interval: float = Config.SCHEDULE_RESYNC_INTERVAL,
+        coalesce_window: int = Config.COALESCE_WINDOW,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param fire: 触发一个群聊的到期任务, 返回的 awaitable 在触发完成后完成
+        :param grace: 超过到期时间该秒数后触发的任务视为超时
+        :param resync_interval: 最长睡眠时间, 到时按系统时间重新计算
+        :param coalesce_window: 同一群聊在该秒数内到期的任务一并提前触发, 0为不合并
+        :param clock: 系统时间
+        """
+        self._fire = fire
+        self.grace = grace
+        self.resync_interval = resync_interval
+        self.coalesce_window = coalesce_window
+        self._clock = clock
+        self._wakeup: Optional[asyncio.Event] = None
+        # {任务真实ID: 重试时间}
+        self._retry_at: Dict[int, float] = {}
+        # 已提交尚未触发完成的任务真实ID, 不重复触发
+        self._in_flight: Set[int] = set()
+        # 提醒实际发出时的延迟, 由触发回调记录(包括在群聊队列及发送队列中的等待)
+        self.lateness = Histogram(LATENESS_BOUNDS)
+        metrics.register(
+            "schedule_lateness_seconds", self.lateness, "任务触发延迟(秒)"
+        )
+        # 调度器取出到期任务时的延迟
+        self.collect_lateness = Histogram(LATENESS_BOUNDS)
+        metrics.register(
+            "schedule_collect_lateness_seconds",
+            self.collect_lateness,
+            "取出到期任务时的延迟(秒)",
+        )
+
+    def notify(self, job: TableScheduleJob = None):
+        """任务新增或变更后唤醒调度, 重新计算到期时间"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def checkpoint_enabled(self) -> bool:
+        """是否需要定期保存调度状态快照"""
+        return False
+
+    def checkpoint(self) -> int:
+        """保存调度状态快照, 在线程中执行 -> 快照中的任务数"""
+        raise NotImplementedError
+
+    def collect_due_jobs(self, now: float) -> DueJobs:
+        raise NotImplementedError
+
+    def _next_deadline(self, now: float) -> Optional[float]:
+        raise NotImplementedError
+
+    def _after_fire(self, due_jobs: DueJobs):
+        pass
+
+    def _resync(self):
+        """系统时间跳变后调用, 子类丢弃按系统时间缓存的到期时间"""
+
+    def _group_due_jobs(
+        self, candidates: Iterable[TableScheduleJob], now: float
+    ) -> DueJobs:
+        """按群聊分组需要触发的任务, 跳过触发中及等待重试的任务
+        开启合并时, 同一群聊中在合并窗口内到期的任务一并提前触发
+        """
+        due_jobs = defaultdict(list)
+        pending = []
+        retry_at = {}
+        for job in candidates:
+            if job.id in self._in_flight:
+                continue
+            if job.id in self._retry_at and self._retry_at[job.id] > now:
+                retry_at[job.id] = self._retry_at[job.id]
+                continue
+            if job.next_run_time <= now:
+                due_jobs[job.room].append((job, now - job.next_run_time > self.grace))
+            elif job.next_run_time <= now + self.coalesce_window:
+                pending.append(job)
+        self._retry_at = retry_at
+
+        for job in pending:
+            if job.room in due_jobs:
+                due_jobs[job.room].append((job, False))
+        return due_jobs
+
+    def _expand_coalesced(
+        self, candidates: List[TableScheduleJob], now: float
+    ) -> List[TableScheduleJob]:
+        """开启合并时, 补充有到期任务的群聊中在合并窗口内到期的任务"""
+        rooms = {job.room for job in candidates if job.next_run_time <= now}
+        if not self.coalesce_window or not rooms:
+            return candidates
+        known = {job.id for job in candidates}
+        candidates = candidates + [
+            job
+            for job in ScheduleJobDao.get_due_jobs(
+                int(now) + self.coalesce_window, rooms=rooms
+            )
+            if job.id not in known
+        ]
+        return sorted(candidates, key=lambda job: job.next_run_time)
+
+    async def _sleep_until(self, deadline: Optional[float]):
+        loop = asyncio.get_event_loop()
+        wall_start, mono_start = self._clock(), loop.time()
+        delay = self.resync_interval
+        if deadline is not None:
+            delay = min(delay, deadline - wall_start)
+        mono_deadline = mono_start + max(delay, 0)
+        # 不用 wait_for: 唤醒与取消同时发生时 wait_for 会丢失取消(如触发完成的回调唤醒调度时退出)
+        waiter = asyncio.ensure_future(self._wakeup.wait())
+        try:
+            await asyncio.wait([waiter], timeout=max(mono_deadline - loop.time(), 0))
+        finally:
+            waiter.cancel()
+
+        drift = (self._clock() - wall_start) - (loop.time() - mono_start)
+        if abs(drift) > 1:
+            logger.warning("系统时间跳变%.3f秒, 重新计算到期时间", drift)
+            self._resync()
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            now = self._clock()
+            with metrics.timer("schedule_collect_seconds", "查找到期任务耗时(秒)"):
+                due_jobs = self.collect_due_jobs(now)
+            if due_jobs:
+                for room, jobs in due_jobs.items():
+                    self._submit(room, jobs, now)
+                continue
+
+            await self._sleep_until(self._next_deadline(now))
+
+    def _submit(self, room: str, jobs: RoomJobs, now: float):
+        """提交一个群聊的到期任务, 触发完成后再处理重试及续期"""
+        metrics.counter("jobs_fired_total", "触发的任务数").inc(len(jobs))
+        for job, _ in jobs:
+            self.collect_lateness.observe(max(now - job.next_run_time, 0))
+        try:
+            future = asyncio.ensure_future(self._fire(room, jobs))
+        except Exception as e:
+            # 如群聊的队列已满
+            logger.warning("错误: %s, room:%s", e, room)
+            self._fired(room, jobs)
+            return
+        self._in_flight.update(job.id for job, _ in jobs)
+        future.add_done_callback(functools.partial(self._fired, room, jobs))
+
+    def _fired(self, room: str, jobs: RoomJobs, future: asyncio.Future = None):
+        """触发完成, 未结束(如发送失败)的任务在重试间隔后重新触发"""
+        if future is not None and not future.cancelled() and future.exception():
+            logger.error("错误: %s, room:%s", future.exception(), room)
+        retry_at = self._clock() + self.RETRY_INTERVAL
+        for job, _ in jobs:
+            self._in_flight.discard(job.id)
+            self._retry_at[job.id] = retry_at
+        try:
+            self._after_fire({room: jobs})
+        except Exception as e:
+            logger.exception("错误: %s", e)
+        # 重新计算到期时间
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+
+class PollingScheduler(BaseScheduler):
+    """每次从数据库查询到期任务"""
+
+    def collect_due_jobs(self, now: float) -> DueJobs:
+        return self._group_due_jobs(
+            ScheduleJobDao.get_due_jobs(int(now) + self.coalesce_window), now
+        )
+
+    def _next_deadline(self, now: float) -> Optional[float]:
+        deadlines = list(self._retry_at.values())
+        next_run_time = ScheduleJobDao.get_next_run_time(after=now)
+        if next_run_time is not None:
+            deadlines.append(next_run_time)
+        return min(deadlines) if deadlines else None
@@ -0,0 +1,184 @@
+"""批量导入/导出提醒
+
+导入: python -m scripts.bulk import reminders.csv [--workers 4]
+导出: python -m scripts.bulk export jobs.jsonl [--room 群聊]
+
+文件格式由扩展名决定(.csv / .jsonl), 字段:
+room: 群聊房间
+time: 提醒时间, 与 /remind 命令相同, 如 "明天上午11点", "每周一上午9点"
+remind_msg: 提醒内容
+next_run_time / schedule_info: 可选, 有 next_run_time 时直接使用, 不再解析 time
+anchor_time: 可选, 周期任务最初设定的执行时间, 为空时取 next_run_time
+    (如每月31号的任务在2月执行时间为28号, 需要 anchor_time 才能在3月回到31号)
+导出的文件可以直接导入.
+
+按块读取, 多进程解析时间后每块在一个事务中写入, 内存占用与文件大小无关.
+运行中的 wheel 调度在下次重新加载时才会发现导入的任务.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import time
+from typing import IO, Iterable, Iterator, Optional, Tuple
+
+from peewee import chunked
+
+from dao import ScheduleJobDao
+from logger import logger
+from utils import NerUtil, TimeUtil
+
+FIELDS = [
+    "room",
+    "job_id",
+    "time",
+    "next_run_time",
+    "schedule_info",
+    "anchor_time",
+    "remind_msg",
+]
+
+# 每个解析进程中的 NerUtil
+_ner: Optional[NerUtil] = None
+
+
+def _file_format(path: str) -> str:
+    fmt = path.rsplit(".", 1)[-1].lower()
+    assert fmt in ("csv", "jsonl"), f"不支持的文件格式: {path}"
+    return fmt
+
+
+def read_rows(f: IO[str], fmt: str) -> Iterator[dict]:
+    if fmt == "csv":
+        yield from csv.DictReader(f)
+        return
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_rows(f: IO[str], fmt: str, rows: Iterable[dict]) -> int:
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        for count, row in enumerate(rows, start=1):
+            writer.writerow(row)
+        return count
+    for count, row in enumerate(rows, start=1):
+        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return count
+
+
+def _init_worker():
+    global _ner
+    _ner = NerUtil()
+
+
+def parse_row(item: Tuple[int, dict]) -> Tuple[int, Optional[tuple], Optional[str]]:
+    """-> (序号, (群聊房间, 执行时间, 提醒内容, 周期, 最初设定的执行时间), 错误信息)"""
+    index, row = item
+    try:
+        room, remind_msg = (row.get("room") or "").strip(), row.get("remind_msg")
+        assert room and remind_msg, "群聊和提醒内容不能为空"
+        anchor_time = None
+        if row.get("next_run_time"):
+            next_run_time = int(row["next_run_time"])
+            schedule_info = row.get("schedule_info") or None
+            if row.get("anchor_time"):
+                anchor_time = int(row["anchor_time"])
+        else:
+            next_run_time, schedule_info = _ner.extract_time(row.get("time") or "")
+        job = (room, next_run_time, remind_msg, schedule_info, anchor_time)
+        return index, job, None
+    except Exception as e:
+        return index, None, str(e) or repr(e)
+
+
+def import_jobs(path: str, workers: int = 1, chunk_size: int = 1000) -> Tuple[int, int]:
+    """导入任务 -> (成功数, 失败数)"""
+    fmt = _file_format(path)
+    created = failed = 0
+    start = time.monotonic()
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker)
+    else:
+        _init_worker()
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            rows = enumerate(read_rows(f, fmt), start=1)
+            for chunk in chunked(rows, chunk_size):
+                if pool is None:
+                    results = map(parse_row, chunk)
+                else:
+                    results = pool.map(parse_row, chunk, chunksize=64)
+                jobs = []
+                for index, job, error in results:
+                    if error:
+                        logger.warning("第%s条导入失败: %s", index, error)
+                        failed += 1
+                    else:
+                        jobs.append(job)
+                created += ScheduleJobDao.create_jobs(jobs)
+                logger.info(
+                    "已导入%s条, 失败%s条, %.0f条/秒",
+                    created,
+                    failed,
+                    created / max(time.monotonic() - start, 1e-6),
+                )
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return created, failed
+
+
+def export_jobs(f: IO[str], fmt: str, room: str = None) -> int:
+    """导出生效中的任务, 不指定群聊时导出全部"""
+    rows = (
+        {
+            "room": job.room,
+            "job_id": job.job_id,
+            "time": TimeUtil.timestamp2datetime(job.next_run_time),
+            "next_run_time": job.next_run_time,
+            "schedule_info": job.schedule_info,
+            "anchor_time": job.anchor_time,
+            "remind_msg": job.remind_msg,
+        }
+        for job in ScheduleJobDao.iter_jobs(room)
+    )
+    return write_rows(f, fmt, rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量导入/导出提醒")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_parser = sub.add_parser("import", help="从 csv/jsonl 文件导入提醒")
+    import_parser.add_argument("path")
+    import_parser.add_argument(
+        "--workers",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="解析时间的进程数",
+    )
+    import_parser.add_argument(
+        "--chunk-size", type=int, default=1000, help="每个事务写入的条数"
+    )
+    export_parser = sub.add_parser("export", help="导出生效中的提醒到 csv/jsonl 文件")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--room", help="群聊房间, 默认导出全部")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        created, failed = import_jobs(args.path, args.workers, args.chunk_size)
+        print(f"导入完成: 成功{created}条, 失败{failed}条")
+    else:
+        with open(args.path, "w", encoding="utf-8", newline="") as f:
+            count = export_jobs(f, _file_format(args.path), args.room)
+        print(f"导出完成: {count}条")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,266 @@
-from peewee import SqliteDatabase
+"""旧版数据库(wxbot.db)迁移到 v2
 
-from dao import ScheduleJobDao, ScheduleRecordDao
+python -m scripts.db_2_v2 [--batch-size 1000] [--restart]
 
-old_db = SqliteDatabase("wxbot.db")
+- 生效中及已取消的任务全部迁移, 已完成的任务同一提醒内容只迁移最早的一条
+  (与生效中任务内容相同的不迁移), 按 (群聊, 执行时间) 顺序分配群聊内的任务ID
+- 已完成的任务各生成一条提醒记录, 关联到最后迁移的相同内容的任务
+
+按排序后的游标逐批读取旧数据库, 每批在一个事务中写入新数据库并保存进度,
+中断后重新运行从上次的进度继续, --restart 忽略进度从头开始(不会删除已迁移的数据).
+"""
+
+import argparse
+import json
+import time
+from typing import Iterator, List, Optional, Tuple
 
+from peewee import (
+    CharField,
+    IntegerField,
+    Model,
+    SqliteDatabase,
+    TextField,
+    chunked,
+    fn,
+)
 
-def refresh():
-    data = list(old_db.execute_sql("select * from tableschedulejob"))
-    alive_jobs = [d for d in data if d[-2] == 0]
-    alive_job_msgs = set([d[-1] for d in alive_jobs])
-    full_done_jobs = [d for d in data if d[-2] == 1 and d[-1] not in alive_job_msgs]
-    only_done_jobs = set()
-    done_jobs = []
-    for d in full_done_jobs:
-        if d[-1] in only_done_jobs:
-            continue
+from logger import logger
+from models import TableScheduleJob, TableScheduleRecord, db
+from storage import BATCH_SIZE
 
-        done_jobs.append(d)
-        only_done_jobs.add(d[-1])
+old_db = SqliteDatabase("wxbot.db")
+
+# 已完成任务中需要迁移的: 同一内容中最早的一条, 且内容与生效中的任务不同
+_DONE_FILTER = """
+state = 1
+AND remind_msg NOT IN (SELECT remind_msg FROM tableschedulejob WHERE state = 0)
+"""
 
-    cancel_jobs = [d for d in data if d[-2] == 2]
-    full_jobs = sorted(
-        [*alive_jobs, *done_jobs, *cancel_jobs], key=lambda x: (x[1], x[3])
+JOBS_SQL = f"""
+SELECT id, room, name, next_run_time, schedule_info, state, remind_msg
+FROM tableschedulejob
+WHERE (
+    state IN (0, 2)
+    OR (
+        {_DONE_FILTER}
+        AND id IN (
+            SELECT MIN(id) FROM tableschedulejob WHERE state = 1 GROUP BY remind_msg
+        )
     )
+)
+AND (room, next_run_time, state, id) > (?, ?, ?, ?)
+ORDER BY room, next_run_time, state, id
+"""
+
+RECORDS_SQL = f"""
+SELECT id, room, next_run_time, remind_msg
+FROM tableschedulejob
+WHERE {_DONE_FILTER}
+AND (room, next_run_time, id) > (?, ?, ?)
+ORDER BY room, next_run_time, id
+"""
+
+# 排序键的初始值, 小于任何一行
+JOBS_START = ("", -(2**63), -1, -1)
+RECORDS_START = ("", -(2**63), -1)
+
+
+class MigrateCheckpoint(Model):
+    name = CharField(primary_key=True)
+    phase = CharField(help_text="jobs / records / done")
+    last_key = TextField(null=True, help_text="已迁移的最后一行的排序键")
+    rows = IntegerField(default=0, help_text="当前阶段已迁移的行数")
+
+    class Meta:
+        database = db
+
+
+class MigrateMsgMap(Model):
+    """提醒内容 -> 最后迁移的相同内容的任务真实ID, 用于关联提醒记录"""
+
+    remind_msg = TextField(primary_key=True)
+    job_real_id = IntegerField()
+
+    class Meta:
+        database = db
+
+
+MIGRATE_MODELS = [MigrateCheckpoint, MigrateMsgMap]
+CHECKPOINT_NAME = "db_2_v2"
+
+
+def _stream(sql: str, key: tuple, batch_size: int) -> Iterator[List[tuple]]:
+    cursor = old_db.execute_sql(sql, key)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def _count(sql: str, key: tuple) -> int:
+    return old_db.execute_sql(f"SELECT COUNT(*) FROM ({sql})", key).fetchone()[0]
 
-    row_map = {}
-    for _, room, name, next_run_time, schedule_info, state, remind_msg in full_jobs:
-        job_id = ScheduleJobDao.get_new_id(room)
-        row = ScheduleJobDao.model.create(
-            room=room,
-            job_id=job_id,
-            name=name,
-            next_run_time=next_run_time,
-            schedule_info=schedule_info,
-            remind_msg=remind_msg,
-            state=state,
+
+class _Progress:
+    def __init__(self, phase: str, done: int, total: int):
+        self.phase = phase
+        self.done = done
+        self.total = total
+        self._start = time.monotonic()
+        self._start_done = done
+
+    def update(self, rows: int):
+        self.done += rows
+        rate = (self.done - self._start_done) / max(
+            time.monotonic() - self._start, 1e-6
         )
-        row_map[remind_msg] = row.id
+        logger.info("%s: %s/%s, %.0f行/秒", self.phase, self.done, self.total, rate)
+
 
-    for *_, remind_msg in sorted(full_done_jobs, key=lambda x: (x[1], x[3])):
-        ScheduleRecordDao.create_record(row_map[remind_msg], remind_msg)
+def _save_checkpoint(checkpoint: MigrateCheckpoint, key: Optional[tuple], rows: int):
+    checkpoint.last_key = None if key is None else json.dumps(key, ensure_ascii=False)
+    checkpoint.rows += rows
+    checkpoint.save()
+
+
+def _load_key(checkpoint: MigrateCheckpoint, default: tuple) -> tuple:
+    return (
+        default
+        if checkpoint.last_key is None
+        else tuple(json.loads(checkpoint.last_key))
+    )
+
+
+def _next_job_id(room: str) -> int:
+    model = TableScheduleJob
+    return (
+        model.select(fn.MAX(model.job_id)).where(model.room == room).scalar() or 0
+    ) + 1
+
+
+def migrate_jobs(checkpoint: MigrateCheckpoint, batch_size: int):
+    model = TableScheduleJob
+    key = _load_key(checkpoint, JOBS_START)
+    progress = _Progress(
+        "jobs", checkpoint.rows, checkpoint.rows + _count(JOBS_SQL, key)
+    )
+    # 旧数据按群聊排序, 只需记住当前群聊的下一个任务ID
+    room, next_job_id = None, None
+    for rows in _stream(JOBS_SQL, key, batch_size):
+        with model._meta.database.atomic():
+            next_real_id = (model.select(fn.MAX(model.id)).scalar() or 0) + 1
+            jobs, msg_map = [], {}
+            for _, job_room, name, next_run_time, schedule_info, state, msg in rows:
+                if job_room != room:
+                    room, next_job_id = job_room, _next_job_id(job_room)
+                jobs.append(
+                    {
+                        "id": next_real_id,
+                        "room": room,
+                        "job_id": next_job_id,
+                        "name": name,
+                        "next_run_time": next_run_time,
+                        "schedule_info": schedule_info,
+                        "remind_msg": msg,
+                        "state": state,
+                        "start_time": int(time.time()),
+                    }
+                )
+                msg_map[msg] = next_real_id
+                next_real_id += 1
+                next_job_id += 1
+            for batch in _chunks(jobs):
+                model.insert_many(batch).execute()
+            for batch in _chunks(
+                [{"remind_msg": k, "job_real_id": v} for k, v in msg_map.items()]
+            ):
+                MigrateMsgMap.insert_many(batch).on_conflict_replace().execute()
+            last = rows[-1]
+            _save_checkpoint(
+                checkpoint, (last[1], last[3], last[5], last[0]), len(rows)
+            )
+        progress.update(len(rows))
+
+
+def migrate_records(checkpoint: MigrateCheckpoint, batch_size: int):
+    record_model = TableScheduleRecord
+    key = _load_key(checkpoint, RECORDS_START)
+    progress = _Progress(
+        "records", checkpoint.rows, checkpoint.rows + _count(RECORDS_SQL, key)
+    )
+    for rows in _stream(RECORDS_SQL, key, batch_size):
+        with record_model._meta.database.atomic():
+            msg_map = {}
+            for batch in chunked({row[3] for row in rows}, BATCH_SIZE):
+                msg_map.update(
+                    MigrateMsgMap.select(
+                        MigrateMsgMap.remind_msg, MigrateMsgMap.job_real_id
+                    )
+                    .where(MigrateMsgMap.remind_msg.in_(batch))
+                    .tuples()
+                )
+            records = [
+                {"job_real_id": msg_map[msg], "remind_msg": msg} for *_, msg in rows
+            ]
+            for batch in _chunks(records):
+                record_model.insert_many(batch).execute()
+            last = rows[-1]
+            _save_checkpoint(checkpoint, (last[1], last[2], last[0]), len(rows))
+        progress.update(len(rows))
+
+
+def _chunks(rows: list) -> Iterator[list]:
+    """按字段数拆分, 单条sql的参数数量不超过上限"""
+    if not rows:
+        return
+    size = max(BATCH_SIZE // len(rows[0]), 1)
+    for i in range(0, len(rows), size):
+        yield rows[i : i + size]
+
+
+def refresh(batch_size: int = 1000, restart: bool = False) -> Tuple[int, int]:
+    """迁移任务及提醒记录 -> (本次迁移的任务数, 本次迁移的提醒记录数)"""
+    database = TableScheduleJob._meta.database
+    database.create_tables(MIGRATE_MODELS)
+    checkpoint = MigrateCheckpoint.get_or_none(name=CHECKPOINT_NAME)
+    if checkpoint is not None and restart:
+        checkpoint.delete_instance()
+        MigrateMsgMap.delete().execute()
+        checkpoint = None
+    if checkpoint is None:
+        checkpoint = MigrateCheckpoint.create(name=CHECKPOINT_NAME, phase="jobs")
+    elif checkpoint.phase == "done":
+        logger.info("已迁移完成, 重新迁移请使用 --restart")
+        return 0, 0
+
+    jobs = records = 0
+    if checkpoint.phase == "jobs":
+        start = checkpoint.rows
+        migrate_jobs(checkpoint, batch_size)
+        jobs = checkpoint.rows - start
+        checkpoint.phase, checkpoint.last_key, checkpoint.rows = "records", None, 0
+        checkpoint.save()
+    if checkpoint.phase == "records":
+        start = checkpoint.rows
+        migrate_records(checkpoint, batch_size)
+        records = checkpoint.rows - start
+        with database.atomic():
+            checkpoint.phase = "done"
+            checkpoint.save()
+            MigrateMsgMap.delete().execute()
+    return jobs, records
 
 
 if __name__ == "__main__":
-    refresh()
+    parser = argparse.ArgumentParser(description="旧版数据库迁移到 v2")
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="每个事务迁移的行数"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="忽略已保存的进度, 从头开始"
+    )
+    args = parser.parse_args()
+    jobs, records = refresh(args.batch_size, args.restart)
+    print(f"迁移完成: 任务{jobs}条, 提醒记录{records}条")
@@ -0,0 +1,110 @@
+"""生成节日日期表 ner/dtime/holiday_data.py
+
+python -m scripts.gen_holidays [--output ner/dtime/holiday_data.py]
+
+农历节日(除夕/春节/端午/中秋)由 lunardate 换算, 清明按太阳视黄经到达 15° 的时刻(北京时间)计算.
+lunardate 只在生成时需要(pip install lunardate), 运行时只读取生成的数据模块.
+每个节日每年占一个字节: 该日期距离当年 BASE_MONTHS 中对应月份 1 号的天数.
+"""
+
+import argparse
+import base64
+import math
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Tuple
+
+from lunardate import LunarDate
+
+# lunardate 支持的农历年份范围
+FIRST_YEAR = 1900
+LAST_YEAR = 2099
+
+OUTPUT = os.path.join("ner", "dtime", "holiday_data.py")
+
+# 北京时间
+UTC_OFFSET = timedelta(hours=8)
+
+
+def _julian_day(moment: datetime) -> float:
+    return moment.timestamp() / 86400 + 2440587.5
+
+
+def _sun_longitude(moment: datetime) -> float:
+    """太阳视黄经(度), 低精度算法, 误差约 0.01°"""
+    t = (_julian_day(moment) - 2451545.0) / 36525
+    l0 = 280.46646 + 36000.76983 * t + 0.0003032 * t * t
+    m = math.radians(357.52911 + 35999.05029 * t - 0.0001537 * t * t)
+    c = (
+        (1.914602 - 0.004817 * t - 0.000014 * t * t) * math.sin(m)
+        + (0.019993 - 0.000101 * t) * math.sin(2 * m)
+        + 0.000289 * math.sin(3 * m)
+    )
+    omega = math.radians(125.04 - 1934.136 * t)
+    return (l0 + c - 0.00569 - 0.00478 * math.sin(omega)) % 360
+
+
+def solar_term(year: int, longitude: float, month: int, day: int) -> date:
+    """太阳视黄经到达 longitude 的北京时间日期, 在 (month, day) 前后 5 天内二分查找"""
+    center = datetime(year, month, day, tzinfo=timezone.utc)
+    low, high = center - timedelta(days=5), center + timedelta(days=5)
+    while high - low > timedelta(seconds=1):
+        mid = low + (high - low) / 2
+        # 黄经在 0° 附近会回绕, 按与目标的差值判断
+        if (_sun_longitude(mid) - longitude + 180) % 360 - 180 < 0:
+            low = mid
+        else:
+            high = mid
+    return (low + UTC_OFFSET).date()
+
+
+def _lunar(month: int, day: int) -> Callable[[int], date]:
+    return lambda year: LunarDate(year, month, day).to_solar_date()
+
+
+# {节日: (起算月份, 公历年份 -> 日期)}, 各节日的日期都在起算月份起的 255 天内
+HOLIDAYS: Dict[str, Tuple[int, Callable[[int], date]]] = {
+    "除夕": (1, lambda year: _lunar(1, 1)(year) - timedelta(days=1)),
+    "春节": (1, _lunar(1, 1)),
+    "清明": (4, lambda year: solar_term(year, 15, 4, 5)),
+    "端午": (5, _lunar(5, 5)),
+    "中秋": (9, _lunar(8, 15)),
+}
+
+
+def build() -> bytes:
+    data = bytearray()
+    for base_month, func in HOLIDAYS.values():
+        for year in range(FIRST_YEAR, LAST_YEAR + 1):
+            day = func(year)
+            assert day.year == year, f"{day} 不在 {year} 年"
+            data.append((day - date(year, base_month, 1)).days)
+    return bytes(data)
+
+
+def render(data: bytes) -> str:
+    encoded = base64.b64encode(data).decode()
+    lines = "\n".join(f'    "{encoded[i:i + 76]}"' for i in range(0, len(encoded), 76))
+    names = ", ".join(f'"{name}"' for name in HOLIDAYS)
+    return (
+        '"""节日日期表, 由 python -m scripts.gen_holidays 生成, 请勿手动修改"""\n\n'
+        f"FIRST_YEAR = {FIRST_YEAR}\n"
+        f"LAST_YEAR = {LAST_YEAR}\n"
+        f"HOLIDAYS = ({names})\n"
+        f"BASE_MONTHS = {tuple(m for m, _ in HOLIDAYS.values())!r}\n"
+        "# base64 编码, 节日按 HOLIDAYS 的顺序, 每个节日每年一个字节\n"
+        f"DATA = (\n{lines}\n)\n"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成节日日期表")
+    parser.add_argument("--output", default=OUTPUT, help="生成的数据模块路径")
+    args = parser.parse_args(argv)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(render(build()))
+    print(f"{args.output}: {FIRST_YEAR}-{LAST_YEAR}, {len(HOLIDAYS)}个节日")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""把数据库转换为增量 VACUUM 模式
+
+归档后只对主数据库做有限页数的增量 VACUUM, 要求数据库为 auto_vacuum=INCREMENTAL,
+新建的数据库默认即为增量模式. 之前创建的数据库需要完整 VACUUM 一次才能转换,
+期间独占数据库, 并需要与数据库大小相当的临时空间, 请在机器人停止时执行:
+
+python -m scripts.vacuum [--db wxbotv2.db]
+"""
+
+import argparse
+
+from peewee import SqliteDatabase
+
+from models import INCREMENTAL, db
+
+
+def convert(path: str) -> bool:
+    """-> 是否进行了转换, 已是增量模式时不做任何操作"""
+    database = SqliteDatabase(path)
+    # VACUUM 不能在事务中执行
+    with database.connection_context():
+        if database.pragma("auto_vacuum") == INCREMENTAL:
+            return False
+        database.pragma("auto_vacuum", INCREMENTAL)
+        database.execute_sql("VACUUM")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把数据库转换为增量 VACUUM 模式")
+    parser.add_argument("--db", default=db.database, help="数据库文件")
+    args = parser.parse_args()
+    if convert(args.db):
+        print(f"已转换为增量 VACUUM 模式: {args.db}")
+    else:
+        print(f"已是增量 VACUUM 模式: {args.db}")
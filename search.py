@@ -0,0 +1,48 @@
+"""任务内容全文搜索的分词
+
+sqlite FTS5 自带的分词器按空白及标点切分, 连续的中文会成为一个词, 无法搜索其中的一部分.
+写入索引前先在 Python 中分词, 以空格分隔后交给 FTS5:
+连续的中文按相邻两字切分(二元分词), 最后一个字再单独作为一个词, 英文及数字按单词切分并转为小写.
+搜索时关键词按同样方式切分: 两字及以上的中文为连续的二元词组成的短语, 单字及英文单词按前缀匹配,
+多段关键词需全部匹配.
+"""
+
+import re
+from typing import List, Optional
+
+_CJK = r"\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TERM_RE = re.compile(rf"[{_CJK}]+|[0-9A-Za-z]+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+
+def terms(text: str) -> List[str]:
+    """连续的中文或英文数字, 英文转为小写"""
+    return [term.lower() for term in _TERM_RE.findall(text or "")]
+
+
+def _bigrams(term: str) -> List[str]:
+    return [term[i : i + 2] for i in range(len(term) - 1)]
+
+
+def tokenize(text: str) -> str:
+    """写入索引的分词结果"""
+    tokens = []
+    for term in terms(text):
+        if _CJK_RE.match(term):
+            # 最后一个字单独成词, 每个字都是某个词的开头, 单字可以按前缀搜索
+            tokens.extend(_bigrams(term))
+            tokens.append(term[-1])
+        else:
+            tokens.append(term)
+    return " ".join(tokens)
+
+
+def match_query(keyword: str) -> Optional[str]:
+    """关键词 -> FTS5 查询, 关键词中没有可搜索的字符时为 None"""
+    phrases = []
+    for term in terms(keyword):
+        if _CJK_RE.match(term) and len(term) > 1:
+            phrases.append(f'"{" ".join(_bigrams(term))}"')
+        else:
+            phrases.append(f'"{term}"*')
+    return " AND ".join(phrases) or None
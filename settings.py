@@ -9,3 +9,80 @@ class Config:
     MAIL_USER = os.getenv("MAIL_USER")
     MAIL_PASS = os.getenv("MAIL_PASS")
     GEO_KEY = os.getenv("GEO_KEY")
+
+    # 消息发送限速: 每秒令牌数 / 令牌桶容量
+    SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 5))
+    SEND_GLOBAL_BURST = float(os.getenv("SEND_GLOBAL_BURST", 10))
+    SEND_ROOM_RATE = float(os.getenv("SEND_ROOM_RATE", 1))
+    SEND_ROOM_BURST = float(os.getenv("SEND_ROOM_BURST", 3))
+    # 发送失败重试次数及退避时间(秒)
+    SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", 3))
+    SEND_RETRY_BASE = float(os.getenv("SEND_RETRY_BASE", 1))
+    SEND_RETRY_CAP = float(os.getenv("SEND_RETRY_CAP", 30))
+    # 每隔该秒数回收已补满的群聊令牌桶
+    OUTBOX_REAP_INTERVAL = float(os.getenv("OUTBOX_REAP_INTERVAL", 300))
+
+    # 同一群聊在该秒数内到期的提醒合并为一条消息发送, 0为不合并
+    COALESCE_WINDOW = int(os.getenv("COALESCE_WINDOW", 0))
+    # 超过执行时间该秒数后才发出的提醒标记为超时
+    SCHEDULE_GRACE = float(os.getenv("SCHEDULE_GRACE", 5))
+    # 调度器最长睡眠时间(秒), 到时按系统时间重新计算到期时间
+    SCHEDULE_RESYNC_INTERVAL = float(os.getenv("SCHEDULE_RESYNC_INTERVAL", 5))
+    # 调度方式: polling(每次查询数据库) / wheel(时间轮, 适用于任务量非常大的情况)
+    # / sharded(多进程按群聊分片)
+    SCHEDULER = os.getenv("SCHEDULER", "polling")
+    # 时间轮中保存多少秒内到期的任务
+    WHEEL_WINDOW = int(os.getenv("WHEEL_WINDOW", 3600))
+    # 时间轮调度定期把任务索引写入快照, 重启时从快照恢复, 为空不保存; 保存间隔(秒)
+    SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "scheduler.snap")
+    SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", 300))
+    # 分片调度的进程数, 群聊哈希分区数, 分区租约时长(秒)
+    SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", 2))
+    SHARD_PARTITIONS = int(os.getenv("SHARD_PARTITIONS", 16))
+    SHARD_LEASE_TTL = float(os.getenv("SHARD_LEASE_TTL", 15))
+
+    # 任务存储方式: sqlite / memory(仅用于测试) / log(追加写日志, 适用于写入非常频繁的情况)
+    # 分片调度需要多个进程共享数据, 只支持 sqlite
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+    STORAGE_LOG_PATH = os.getenv("STORAGE_LOG_PATH", "wxbotv2.log")
+
+    # 主数据库中保留最近多少天的提醒记录, 更早的记录及已结束的任务按月归档, 0为不归档
+    ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", 90))
+    ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+    # 归档间隔(秒), 每次增量 VACUUM 最多释放的页数
+    ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", 86400))
+    ARCHIVE_VACUUM_PAGES = int(os.getenv("ARCHIVE_VACUUM_PAGES", 1000))
+    # /history 一次最多查看的提醒记录条数
+    HISTORY_MAX_LIMIT = int(os.getenv("HISTORY_MAX_LIMIT", 50))
+
+    # 停机期间错过的任务的默认补发策略: summary / skip / replay
+    CATCHUP_POLICY = os.getenv("CATCHUP_POLICY", "replay")
+
+    # 运行指标, 关闭时几乎没有开销
+    METRICS_ENABLED = bool(int(os.getenv("METRICS_ENABLED", 0)))
+    # 指标定期写入的文件, 扩展名为 .json 时写入 JSON, 否则为 Prometheus 文本格式, 为空不写入
+    METRICS_PATH = os.getenv("METRICS_PATH", "metrics.prom")
+    METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", 15))
+    # 在本机该端口提供 HTTP 指标接口, 0为不提供
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+    # 事件循环延迟的采样间隔(秒)
+    METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", 0.5))
+
+    # 日志级别, 按模块(文件名)单独设置的级别如 "dtime=WARNING,dao=DEBUG"
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_MODULE_LEVELS = os.getenv("LOG_MODULE_LEVELS", "")
+    # 日志格式: text / json(每条一行 JSON)
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+    # 同一行代码的 DEBUG 日志每多少条保留一条, 1为全部保留
+    LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", 100))
+    # 日志队列长度, 写日志跟不上时丢弃新的日志
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+    # 每个群聊的命令及提醒由一个执行者按顺序处理, 空闲该秒数后回收
+    ACTOR_IDLE_TIMEOUT = float(os.getenv("ACTOR_IDLE_TIMEOUT", 300))
+    # 每个群聊最多排队的命令及提醒数
+    ACTOR_QUEUE_SIZE = int(os.getenv("ACTOR_QUEUE_SIZE", 100))
+
+    # 任务列表每页的任务数, 单条消息的最大字符数, 超出时拆分为多条发送
+    LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", 20))
+    MESSAGE_MAX_LEN = int(os.getenv("MESSAGE_MAX_LEN", 1500))
@@ -0,0 +1,189 @@
+"""多进程分片调度
+
+启动 workers 个调度进程, 群聊按哈希分为 partitions 个分区, 每个进程负责其中一部分.
+分区的归属以租约的形式保存在数据库中, 进程崩溃后其分区由其他进程接管, 进程重启后收回.
+调度进程只负责找出到期任务, 通过队列把任务ID发给 Wechaty 进程, 由 Wechaty 进程发送消息.
+"""
+
+import asyncio
+import multiprocessing
+import queue
+import time
+from typing import Dict, List, Optional, Set
+
+import dao
+from dao import ScheduleJobDao, SchedulerLeaseDao
+from logger import logger
+from scheduler import BaseScheduler, DueJobs
+from settings import Config
+
+
+class ShardWorker:
+    """调度进程, 负责部分群聊哈希分区"""
+
+    def __init__(
+        self,
+        index: int,
+        workers: int,
+        partitions: int,
+        job_queue: multiprocessing.Queue,
+        changed: multiprocessing.Event,
+        *,
+        lease_ttl: float = Config.SHARD_LEASE_TTL,
+        resync_interval: float = Config.SCHEDULE_RESYNC_INTERVAL,
+        clock=time.time,
+    ):
+        """
+        :param index: 进程序号, 负责 partition % workers == index 的分区
+        :param job_queue: 发送到期任务ID的队列
+        :param changed: 任务新增或变更时被设置, 用于唤醒
+        """
+        self.owner = f"worker-{index}"
+        self.home = {p for p in range(partitions) if p % workers == index}
+        self.partitions = partitions
+        self.owned: Set[int] = set()
+        self.lease_ttl = lease_ttl
+        self.resync_interval = resync_interval
+        self._queue = job_queue
+        self._changed = changed
+        self._clock = clock
+        self._refresh_at = 0.0
+        # {任务真实ID: (执行时间, 发送时间)}
+        self._dispatched: Dict[int, tuple] = {}
+
+    def refresh_leases(self, now: float):
+        owned = SchedulerLeaseDao.refresh(
+            self.owner, self.home, self.partitions, now, self.lease_ttl
+        )
+        if owned != self.owned:
+            logger.info("%s 持有分区: %s", self.owner, sorted(owned))
+        self.owned = owned
+        self._refresh_at = now + self.lease_ttl / 3
+
+    def dispatch(self, now: float) -> Optional[int]:
+        """发送到期任务, 同一任务在未续期前每隔 resync_interval 秒重发一次
+        :return: 下一个到期时间
+        """
+        if not self.owned:
+            return None
+        dispatched = {}
+        for real_id, next_run_time in ScheduleJobDao.iter_job_times(
+            int(now), partitions=self.owned, partition_count=self.partitions
+        ):
+            last = self._dispatched.get(real_id)
+            if (
+                last
+                and last[0] == next_run_time
+                and now - last[1] < self.resync_interval
+            ):
+                dispatched[real_id] = last
+                continue
+            self._queue.put(real_id)
+            dispatched[real_id] = (next_run_time, now)
+        self._dispatched = dispatched
+        return ScheduleJobDao.get_next_run_time(
+            now, partitions=self.owned, partition_count=self.partitions
+        )
+
+    def run(self):
+        while True:
+            now = self._clock()
+            if now >= self._refresh_at:
+                self.refresh_leases(now)
+            deadlines = [self._refresh_at, now + self.resync_interval]
+            next_run_time = self.dispatch(now)
+            if next_run_time is not None:
+                deadlines.append(next_run_time)
+            if self._changed.wait(max(min(deadlines) - self._clock(), 0)):
+                self._changed.clear()
+
+
+def run_worker(*args, **kwargs):
+    try:
+        ShardWorker(*args, **kwargs).run()
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardedScheduler(BaseScheduler):
+    """多进程分片调度, 与 PollingScheduler 可通过配置 SCHEDULER 切换"""
+
+    def __init__(
+        self,
+        *args,
+        workers: int = Config.SHARD_WORKERS,
+        partitions: int = Config.SHARD_PARTITIONS,
+        **kwargs,
+    ):
+        if not dao.storage.shared:
+            raise ValueError("分片调度需要多个进程共享数据, 只支持 sqlite 存储")
+        super().__init__(*args, **kwargs)
+        self.workers = workers
+        self.partitions = max(partitions, workers)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._queue = self._ctx.Queue()
+        self._changed = [self._ctx.Event() for _ in range(workers)]
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._inbox: List[int] = []
+
+    def _ensure_workers(self):
+        """启动调度进程, 已退出的重新启动"""
+        for index, process in enumerate(self._processes):
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                logger.warning(
+                    "调度进程 worker-%s 已退出: %s, 重新启动", index, process.exitcode
+                )
+            process = self._ctx.Process(
+                target=run_worker,
+                args=(
+                    index,
+                    self.workers,
+                    self.partitions,
+                    self._queue,
+                    self._changed[index],
+                ),
+                name=f"scheduler-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._processes[index] = process
+
+    def notify(self, job=None):
+        for changed in self._changed:
+            changed.set()
+        super().notify(job)
+
+    def _drain(self, timeout: float) -> List[int]:
+        """最多等待 timeout 秒, 取出队列中的所有任务ID"""
+        ret = []
+        try:
+            ret.append(self._queue.get(timeout=timeout))
+            while True:
+                ret.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return ret
+
+    def collect_due_jobs(self, now: float) -> DueJobs:
+        self._ensure_workers()
+        real_ids = dict.fromkeys(self._inbox)
+        self._inbox = []
+        real_ids.update(dict.fromkeys(self._retry_at))
+        if not real_ids:
+            return {}
+
+        # 同一任务可能被多个进程重复发送, 以数据库为准
+        candidates = ScheduleJobDao.get_jobs_by_ids(real_ids)
+        return self._group_due_jobs(self._expand_coalesced(candidates, now), now)
+
+    def _next_deadline(self, now: float) -> Optional[float]:
+        return min(self._retry_at.values(), default=None)
+
+    async def _sleep_until(self, deadline: Optional[float]):
+        timeout = self.resync_interval
+        if deadline is not None:
+            timeout = max(min(timeout, deadline - self._clock()), 0)
+        loop = asyncio.get_event_loop()
+        self._inbox.extend(await loop.run_in_executor(None, self._drain, timeout))
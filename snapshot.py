@@ -0,0 +1,139 @@
+"""调度状态快照
+
+定期把生效中任务的索引 (下一次执行时间, 真实ID, 群聊房间) 按执行时间排序写入紧凑的二进制文件,
+重启时以 mmap 打开, 二分查找出时间轮窗口内的任务, 不需要逐行解码整个文件.
+快照之后修改过的任务(update_time 不早于快照时间)从数据库增量读取,
+快照中过期的条目在触发前会以数据库为准再次校验.
+
+文件格式(小端):
+    头部: 魔数, 版本, 快照时间, 条目数, 群聊表位置
+    条目: (下一次执行时间 int64, 真实ID int64, 群聊序号 uint32) * 条目数
+    群聊表: JSON 数组, 条目中的群聊序号为在其中的位置
+"""
+
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from logger import logger
+
+MAGIC = b"EZRS"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxqQQ")
+ENTRY = struct.Struct("<qqI")
+
+
+class SnapshotEntry(NamedTuple):
+    next_run_time: int
+    real_id: int
+    room: str
+
+
+class _RunTimes:
+    """按下标读取条目的执行时间, 用于二分查找"""
+
+    def __init__(self, snapshot: "Snapshot"):
+        self._snapshot = snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def __getitem__(self, index: int) -> int:
+        return self._snapshot.entry(index)[0]
+
+
+class Snapshot:
+    """只读快照, 以 mmap 方式访问"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.checkpoint_time, self._count, self._rooms_offset = (
+                HEADER.unpack_from(self._mmap)
+            )
+            assert magic == MAGIC and version == VERSION, "快照格式不支持"
+            assert (
+                HEADER.size + self._count * ENTRY.size
+                == self._rooms_offset
+                <= len(self._mmap)
+            ), "快照文件不完整"
+        except Exception:
+            self._mmap.close()
+            raise
+        self._rooms: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._mmap.close()
+
+    def entry(self, index: int) -> Tuple[int, int, int]:
+        """-> (下一次执行时间, 真实ID, 群聊序号)"""
+        return ENTRY.unpack_from(self._mmap, HEADER.size + index * ENTRY.size)
+
+    @property
+    def rooms(self) -> List[str]:
+        # 只在需要群聊时解码
+        if self._rooms is None:
+            self._rooms = json.loads(self._mmap[self._rooms_offset :])
+        return self._rooms
+
+    def __iter__(self) -> Iterator[SnapshotEntry]:
+        for index in range(self._count):
+            next_run_time, real_id, room = self.entry(index)
+            yield SnapshotEntry(next_run_time, real_id, self.rooms[room])
+
+    def iter_job_times(self, before: int) -> Iterator[Tuple[int, int]]:
+        """在 before 及之前到期的任务 -> (真实ID, 下一次执行时间)"""
+        for index in range(bisect_right(_RunTimes(self), before)):
+            next_run_time, real_id, _ = self.entry(index)
+            yield real_id, next_run_time
+
+
+def write_snapshot(
+    path: str, jobs: Iterable[Tuple[int, int, str]], checkpoint_time: int
+) -> int:
+    """写入快照, 先写临时文件再替换, 中途退出不影响旧快照
+    :param jobs: 按执行时间排序的 (下一次执行时间, 真实ID, 群聊房间)
+    :param checkpoint_time: 开始读取 jobs 之前的时间, 此后修改的任务在加载时从数据库读取
+    :return: 条目数
+    """
+    tmp_path = f"{path}.tmp"
+    rooms = {}
+    count = 0
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, checkpoint_time, 0, 0))
+        for next_run_time, real_id, room in jobs:
+            index = rooms.setdefault(room, len(rooms))
+            f.write(ENTRY.pack(next_run_time, real_id, index))
+            count += 1
+        rooms_offset = f.tell()
+        f.write(json.dumps(list(rooms), ensure_ascii=False).encode())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, checkpoint_time, count, rooms_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+
+def load_snapshot(path: str) -> Optional[Snapshot]:
+    """打开快照, 文件不存在或无法读取时返回 None"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return Snapshot(path)
+    except Exception as e:
+        logger.warning("快照 %s 无法读取: %s", path, e)
+        return None
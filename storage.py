@@ -0,0 +1,729 @@
+"""任务及提醒记录的存储后端
+
+ScheduleJobDao / ScheduleRecordDao 通过存储后端读写数据, 后端由配置 STORAGE_BACKEND 选择:
+sqlite(默认, 可被多个进程共享) / memory(仅保存在内存中, 用于测试及性能测试)
+/ log(追加写日志, 启动时回放到内存, 适用于写入非常频繁的情况).
+"""
+
+import json
+import os
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from peewee import Case, Tuple as SqlTuple, chunked, fn
+
+from models import (
+    TableJobSearch,
+    TableScheduleJob,
+    TableScheduleRecord,
+    index_jobs,
+    room_partition,
+)
+from search import match_query, terms
+from settings import Config
+from typevar import JobState
+
+# 单条sql中参数数量的上限
+BATCH_SIZE = 400
+
+
+class RoomRecord(NamedTuple):
+    """群聊的一条提醒记录"""
+
+    job_id: int
+    remind_msg: str
+    create_time: int
+
+
+class BaseStorage:
+    """存储后端接口, 任务ID指群聊内的任务编号, 真实ID为全局唯一的主键"""
+
+    # 是否可被多个进程同时读写
+    shared = False
+
+    def create_job(self, **fields) -> TableScheduleJob:
+        raise NotImplementedError
+
+    def create_jobs(self, rows: List[dict]) -> int:
+        """批量创建任务, 按群聊依次分配任务ID"""
+        raise NotImplementedError
+
+    def get_new_id(self, room: str) -> int:
+        raise NotImplementedError
+
+    def get_all_jobs(
+        self, room: Optional[str], state: Optional[JobState]
+    ) -> Tuple[int, Iterable[TableScheduleJob]]:
+        raise NotImplementedError
+
+    def iter_jobs(
+        self, room: Optional[str], state: Optional[JobState]
+    ) -> Iterable[TableScheduleJob]:
+        """逐条读取任务, 按执行时间排序"""
+        return iter(self.get_all_jobs(room, state)[1])
+
+    def count_jobs(self, room: Optional[str], state: Optional[JobState]) -> int:
+        return self.get_all_jobs(room, state)[0]
+
+    def get_jobs_page(
+        self,
+        room: Optional[str],
+        state: Optional[JobState],
+        after: Optional[Tuple[int, int]],
+        limit: int,
+    ) -> List[TableScheduleJob]:
+        """按 (执行时间, 真实ID) 排序, 取排在 after 之后的 limit 条"""
+        jobs = self.iter_jobs(room, state)
+        if after is not None:
+            jobs = (job for job in jobs if (job.next_run_time, job.id) > after)
+        return list(islice(jobs, limit))
+
+    def get_page_key(
+        self, room: Optional[str], state: Optional[JobState], offset: int
+    ) -> Optional[Tuple[int, int]]:
+        """排序后第 offset 条任务的 (执行时间, 真实ID), 即下一页的起点"""
+        for job in islice(self.iter_jobs(room, state), offset - 1, None):
+            return job.next_run_time, job.id
+        return None
+
+    def search_jobs(
+        self, room: str, keyword: str, offset: int, limit: int
+    ) -> Tuple[int, List[TableScheduleJob]]:
+        """按内容搜索群聊中生效中的任务, 按相关度排序 -> (总数, 第 offset 条起的 limit 条)
+        逐条匹配关键词, 按关键词出现的次数排序
+        """
+        keywords = terms(keyword)
+        if not keywords:
+            return 0, []
+        scored = []
+        for job in self.iter_jobs(room, JobState.ready):
+            text = job.remind_msg.lower()
+            if all(k in text for k in keywords):
+                scored.append((-sum(text.count(k) for k in keywords), job))
+        scored.sort(key=lambda item: item[0])
+        return len(scored), [job for _, job in scored[offset : offset + limit]]
+
+    def get_job(
+        self, job_id: int, room: str, state: JobState
+    ) -> Optional[TableScheduleJob]:
+        raise NotImplementedError
+
+    def update_job(self, job_id: int, room: str, fields: dict) -> int:
+        raise NotImplementedError
+
+    def set_state(self, room: str, job_ids: Iterable[int], state: JobState) -> int:
+        raise NotImplementedError
+
+    def get_due_jobs(
+        self, before: int, rooms: Optional[Iterable[str]]
+    ) -> List[TableScheduleJob]:
+        raise NotImplementedError
+
+    def get_overdue_jobs(self, before: float) -> List[TableScheduleJob]:
+        raise NotImplementedError
+
+    def get_jobs_by_ids(self, real_ids: Iterable[int]) -> List[TableScheduleJob]:
+        raise NotImplementedError
+
+    def iter_job_times(
+        self,
+        before: int,
+        after: Optional[int],
+        partitions: Optional[Iterable[int]],
+        partition_count: Optional[int],
+    ) -> Iterable[Tuple[int, int]]:
+        raise NotImplementedError
+
+    def get_next_run_time(
+        self,
+        after: float,
+        partitions: Optional[Iterable[int]],
+        partition_count: Optional[int],
+    ) -> Optional[int]:
+        raise NotImplementedError
+
+    def iter_pending_jobs(self) -> Iterable[Tuple[int, int, str]]:
+        """生效中的任务 (下一次执行时间, 真实ID, 群聊房间), 按 (执行时间, 真实ID) 排序"""
+        raise NotImplementedError
+
+    def iter_changed_job_times(
+        self, since: int, before: int
+    ) -> Iterable[Tuple[int, int]]:
+        """since 及之后修改过, 在 before 及之前到期的生效中任务 -> (真实ID, 下一次执行时间)"""
+        raise NotImplementedError
+
+    def settle_jobs(
+        self,
+        done_ids: List[int],
+        renewals: Dict[int, int],
+        records: List[Tuple[int, str]],
+    ):
+        raise NotImplementedError
+
+    def create_records(self, records: Iterable[Tuple[int, str]]):
+        raise NotImplementedError
+
+    def get_records(self, job_real_id: int) -> List[TableScheduleRecord]:
+        raise NotImplementedError
+
+    def get_room_records(self, room: str, limit: int) -> List[RoomRecord]:
+        """群聊最近的提醒记录, 按时间倒序"""
+        raise NotImplementedError
+
+
+class SqliteStorage(BaseStorage):
+    """基于 peewee 模型的存储, 数据库连接由模型绑定"""
+
+    shared = True
+    job_model = TableScheduleJob
+    record_model = TableScheduleRecord
+    search_model = TableJobSearch
+
+    def create_job(self, **fields) -> TableScheduleJob:
+        with self.job_model._meta.database.atomic():
+            job = self.job_model.create(**fields)
+            index_jobs([(job.id, job.remind_msg)])
+        return job
+
+    def _index_jobs(self, *where):
+        """在写入任务的同一事务中同步全文索引"""
+        model = self.job_model
+        rows = model.select(model.id, model.remind_msg).where(*where).tuples()
+        index_jobs(list(rows))
+
+    def create_jobs(self, rows):
+        model = self.job_model
+        with model._meta.database.atomic():
+            last_id = model.select(fn.MAX(model.id)).scalar() or 0
+            next_ids = {}
+            for batch in chunked({row["room"] for row in rows}, BATCH_SIZE):
+                next_ids.update(
+                    model.select(model.room, fn.MAX(model.job_id))
+                    .where(model.room.in_(batch))
+                    .group_by(model.room)
+                    .tuples()
+                )
+            new_rows = []
+            for row in rows:
+                job_id = next_ids[row["room"]] = next_ids.get(row["room"], 0) + 1
+                new_rows.append(dict(model(job_id=job_id, **row).__data__))
+            for batch in chunked(new_rows, BATCH_SIZE // len(model._meta.fields)):
+                model.insert_many(batch).execute()
+            self._index_jobs(model.id > last_id)
+        return len(new_rows)
+
+    def get_new_id(self, room: str) -> int:
+        model = self.job_model
+        row = model.select().where(model.room == room).order_by(-model.job_id).first()
+        return row.job_id + 1 if row else 1
+
+    def _filter_jobs(self, query, room, state):
+        model = self.job_model
+        if state is not None:
+            query = query.where(model.state == state)
+        if room:
+            query = query.where(model.room == room)
+        return query
+
+    def get_all_jobs(self, room, state):
+        model = self.job_model
+        query = self._filter_jobs(model.select(), room, state)
+        return query.count(), query.order_by(model.next_run_time)
+
+    def iter_jobs(self, room, state):
+        return self.get_all_jobs(room, state)[1].iterator()
+
+    def count_jobs(self, room, state):
+        return self._filter_jobs(self.job_model.select(), room, state).count()
+
+    def get_jobs_page(self, room, state, after, limit):
+        model = self.job_model
+        query = self._filter_jobs(model.select(), room, state)
+        if after is not None:
+            query = query.where(
+                SqlTuple(model.next_run_time, model.id) > SqlTuple(*after)
+            )
+        return list(query.order_by(model.next_run_time, model.id).limit(limit))
+
+    def get_page_key(self, room, state, offset):
+        # 只读取索引中的排序键
+        model = self.job_model
+        query = self._filter_jobs(
+            model.select(model.next_run_time, model.id), room, state
+        )
+        return (
+            query.order_by(model.next_run_time, model.id)
+            .limit(1)
+            .offset(offset - 1)
+            .tuples()
+            .first()
+        )
+
+    def search_jobs(self, room, keyword, offset, limit):
+        # 按 bm25 相关度排序
+        query = match_query(keyword)
+        if query is None:
+            return 0, []
+        model, index = self.job_model, self.search_model
+        matched = (
+            model.select()
+            .join(index, on=(index.rowid == model.id))
+            .where(
+                index.match(query), model.room == room, model.state == JobState.ready
+            )
+        )
+        jobs = matched.order_by(index.bm25(), model.next_run_time, model.id)
+        return matched.count(), list(jobs.offset(offset).limit(limit))
+
+    def get_job(self, job_id, room, state):
+        model = self.job_model
+        return model.get_or_none(
+            model.job_id == job_id, model.room == room, model.state == state
+        )
+
+    def update_job(self, job_id, room, fields):
+        model = self.job_model
+        where = (model.job_id == job_id, model.room == room)
+        with model._meta.database.atomic():
+            # 内容未变时不重建索引
+            reindex = (
+                "remind_msg" in fields
+                and model.select()
+                .where(*where, model.remind_msg != fields["remind_msg"])
+                .exists()
+            )
+            count = (
+                model.update(**fields, update_time=int(time.time()))
+                .where(*where)
+                .execute()
+            )
+            if reindex:
+                self._index_jobs(*where)
+        return count
+
+    def set_state(self, room, job_ids, state):
+        model = self.job_model
+        return (
+            model.update(state=state, update_time=int(time.time()))
+            .where(model.job_id.in_(list(job_ids)), model.room == room)
+            .execute()
+        )
+
+    def get_due_jobs(self, before, rooms):
+        model = self.job_model
+        query_filter = [model.state == JobState.ready, model.next_run_time <= before]
+        if rooms is not None:
+            query_filter.append(model.room.in_(list(rooms)))
+        return list(model.select().where(*query_filter).order_by(model.next_run_time))
+
+    def get_overdue_jobs(self, before):
+        model = self.job_model
+        return list(
+            model.select()
+            .where(model.state == JobState.ready, model.next_run_time < before)
+            .order_by(model.next_run_time)
+        )
+
+    def get_jobs_by_ids(self, real_ids):
+        model = self.job_model
+        ret = []
+        for batch in chunked(real_ids, BATCH_SIZE):
+            ret.extend(
+                model.select().where(model.state == JobState.ready, model.id.in_(batch))
+            )
+        return sorted(ret, key=lambda job: job.next_run_time)
+
+    def _partition_filter(self, partitions: Iterable[int], partition_count: int):
+        return fn.room_partition(self.job_model.room, partition_count).in_(
+            list(partitions)
+        )
+
+    def iter_job_times(self, before, after, partitions, partition_count):
+        model = self.job_model
+        query_filter = [model.state == JobState.ready, model.next_run_time <= before]
+        if after is not None:
+            query_filter.append(model.next_run_time > after)
+        if partitions is not None:
+            query_filter.append(self._partition_filter(partitions, partition_count))
+        return (
+            model.select(model.id, model.next_run_time)
+            .where(*query_filter)
+            .tuples()
+            .iterator()
+        )
+
+    def get_next_run_time(self, after, partitions, partition_count):
+        model = self.job_model
+        query_filter = [model.state == JobState.ready, model.next_run_time > after]
+        if partitions is not None:
+            query_filter.append(self._partition_filter(partitions, partition_count))
+        return model.select(fn.MIN(model.next_run_time)).where(*query_filter).scalar()
+
+    def iter_pending_jobs(self):
+        model = self.job_model
+        return (
+            model.select(model.next_run_time, model.id, model.room)
+            .where(model.state == JobState.ready)
+            .order_by(model.next_run_time, model.id)
+            .tuples()
+            .iterator()
+        )
+
+    def iter_changed_job_times(self, since, before):
+        model = self.job_model
+        return (
+            model.select(model.id, model.next_run_time)
+            .where(
+                model.update_time >= since,
+                model.state == JobState.ready,
+                model.next_run_time <= before,
+            )
+            .tuples()
+            .iterator()
+        )
+
+    def settle_jobs(self, done_ids, renewals, records):
+        model = self.job_model
+        update_time = int(time.time())
+        with model._meta.database.atomic():
+            self.create_records(records)
+            for batch in chunked(done_ids, BATCH_SIZE):
+                model.update(state=JobState.done, update_time=update_time).where(
+                    model.id.in_(batch)
+                ).execute()
+            for batch in chunked(renewals.items(), BATCH_SIZE):
+                model.update(
+                    next_run_time=Case(model.id, batch), update_time=update_time
+                ).where(model.id.in_([real_id for real_id, _ in batch])).execute()
+
+    def create_records(self, records):
+        rows = [
+            {"job_real_id": job_real_id, "remind_msg": remind_msg}
+            for job_real_id, remind_msg in records
+        ]
+        for batch in chunked(rows, BATCH_SIZE):
+            self.record_model.insert_many(batch).execute()
+
+    def get_records(self, job_real_id):
+        model = self.record_model
+        return list(
+            model.select().where(model.job_real_id == job_real_id).order_by(model.id)
+        )
+
+    def get_room_records(self, room, limit):
+        record, job = self.record_model, self.job_model
+        query = (
+            record.select(job.job_id, record.remind_msg, record.create_time)
+            .join(job, on=(record.job_real_id == job.id))
+            .where(job.room == room)
+            .order_by(record.create_time.desc(), record.id.desc())
+            .limit(limit)
+            .tuples()
+        )
+        return [RoomRecord(*row) for row in query]
+
+
+class MemoryStorage(BaseStorage):
+    """内存存储, 按执行时间维护生效中任务的有序索引"""
+
+    def __init__(self):
+        # {真实ID: 字段}
+        self._jobs: Dict[int, dict] = {}
+        # {群聊房间: {任务ID: 真实ID}}
+        self._rooms: Dict[str, Dict[int, int]] = defaultdict(dict)
+        # 生效中的任务 [(下一次执行时间, 真实ID)]
+        self._ready: List[Tuple[int, int]] = []
+        self._records: List[dict] = []
+        self._last_job_id = 0
+        self._last_record_id = 0
+
+    @staticmethod
+    def _to_model(row: dict) -> TableScheduleJob:
+        return TableScheduleJob(**row)
+
+    def _put_job(self, row: dict):
+        old = self._jobs.get(row["id"])
+        if old is not None and old["state"] == JobState.ready:
+            del self._ready[bisect_left(self._ready, (old["next_run_time"], old["id"]))]
+        if row["state"] == JobState.ready:
+            insort(self._ready, (row["next_run_time"], row["id"]))
+        self._jobs[row["id"]] = row
+        self._rooms[row["room"]][row["job_id"]] = row["id"]
+        self._last_job_id = max(self._last_job_id, row["id"])
+
+    def _put_record(self, row: dict):
+        self._records.append(row)
+        self._last_record_id = max(self._last_record_id, row["id"])
+
+    def _write(self, jobs: List[dict] = (), records: List[dict] = ()):
+        """所有修改都经过这里, 子类可在此持久化"""
+        for row in jobs:
+            self._put_job(row)
+        for row in records:
+            self._put_record(row)
+
+    def _changed(self, row: dict, **fields) -> dict:
+        return {**row, **fields, "update_time": int(time.time())}
+
+    def create_job(self, **fields) -> TableScheduleJob:
+        job = TableScheduleJob(**fields)
+        job.id = self._last_job_id + 1
+        self._write(jobs=[dict(job.__data__)])
+        return job
+
+    def create_jobs(self, rows):
+        next_ids = {}
+        new_rows = []
+        for row in rows:
+            if row["room"] not in next_ids:
+                next_ids[row["room"]] = self.get_new_id(row["room"])
+            job = TableScheduleJob(job_id=next_ids[row["room"]], **row)
+            job.id = self._last_job_id + len(new_rows) + 1
+            next_ids[row["room"]] += 1
+            new_rows.append(dict(job.__data__))
+        self._write(jobs=new_rows)
+        return len(new_rows)
+
+    def get_new_id(self, room):
+        return max(self._rooms.get(room, ()), default=0) + 1
+
+    def _select(self, real_ids: Iterable[int], state=None) -> List[TableScheduleJob]:
+        rows = (self._jobs[real_id] for real_id in real_ids if real_id in self._jobs)
+        if state is not None:
+            rows = (row for row in rows if row["state"] == state)
+        return [
+            self._to_model(row)
+            for row in sorted(rows, key=lambda row: (row["next_run_time"], row["id"]))
+        ]
+
+    def get_all_jobs(self, room, state):
+        if room:
+            real_ids = self._rooms.get(room, {}).values()
+        elif state == JobState.ready:
+            real_ids = [real_id for _, real_id in self._ready]
+        else:
+            real_ids = self._jobs.keys()
+        jobs = self._select(real_ids, state)
+        return len(jobs), jobs
+
+    def _find(self, job_id: int, room: str) -> Optional[dict]:
+        real_id = self._rooms.get(room, {}).get(job_id)
+        return None if real_id is None else self._jobs[real_id]
+
+    def get_job(self, job_id, room, state):
+        row = self._find(job_id, room)
+        if row is None or row["state"] != state:
+            return None
+        return self._to_model(row)
+
+    def update_job(self, job_id, room, fields):
+        row = self._find(job_id, room)
+        if row is None:
+            return 0
+        self._write(jobs=[self._changed(row, **fields)])
+        return 1
+
+    def set_state(self, room, job_ids, state):
+        rows = [self._find(job_id, room) for job_id in job_ids]
+        rows = [row for row in rows if row is not None]
+        self._write(jobs=[self._changed(row, state=state) for row in rows])
+        return len(rows)
+
+    def _ready_between(self, after: Optional[float], before: float) -> List[int]:
+        start = 0 if after is None else self._ready_after(after)
+        stop = self._ready_after(before)
+        return [real_id for _, real_id in self._ready[start:stop]]
+
+    def get_due_jobs(self, before, rooms):
+        jobs = self._select(self._ready_between(None, before))
+        if rooms is not None:
+            rooms = set(rooms)
+            jobs = [job for job in jobs if job.room in rooms]
+        return jobs
+
+    def _ready_after(self, timestamp: float) -> int:
+        """执行时间晚于 timestamp 的第一个生效中任务的位置
+        与 sqlite 一致, 时间先转换为整数(IntegerField)再比较
+        """
+        return bisect_right(self._ready, (int(timestamp), float("inf")))
+
+    def get_overdue_jobs(self, before):
+        stop = bisect_left(self._ready, (int(before), 0))
+        return self._select(real_id for _, real_id in self._ready[:stop])
+
+    def get_jobs_by_ids(self, real_ids):
+        return self._select(set(real_ids), JobState.ready)
+
+    def _in_partitions(
+        self, real_id: int, partitions: Set[int], partition_count: int
+    ) -> bool:
+        return (
+            room_partition(self._jobs[real_id]["room"], partition_count) in partitions
+        )
+
+    def iter_job_times(self, before, after, partitions, partition_count):
+        real_ids = self._ready_between(after, before)
+        if partitions is not None:
+            partitions = set(partitions)
+            real_ids = [
+                real_id
+                for real_id in real_ids
+                if self._in_partitions(real_id, partitions, partition_count)
+            ]
+        return [(real_id, self._jobs[real_id]["next_run_time"]) for real_id in real_ids]
+
+    def get_next_run_time(self, after, partitions, partition_count):
+        start = self._ready_after(after)
+        if partitions is not None:
+            partitions = set(partitions)
+        for next_run_time, real_id in self._ready[start:]:
+            if partitions is None or self._in_partitions(
+                real_id, partitions, partition_count
+            ):
+                return next_run_time
+        return None
+
+    def iter_pending_jobs(self):
+        return [
+            (next_run_time, real_id, self._jobs[real_id]["room"])
+            for next_run_time, real_id in self._ready
+        ]
+
+    def iter_changed_job_times(self, since, before):
+        # 旧版本日志中的任务没有修改时间
+        return [
+            (real_id, next_run_time)
+            for next_run_time, real_id in self._ready[: self._ready_after(before)]
+            if (self._jobs[real_id].get("update_time") or 0) >= since
+        ]
+
+    def _new_records(self, records: Iterable[Tuple[int, str]]) -> List[dict]:
+        ret = []
+        for job_real_id, remind_msg in records:
+            record = TableScheduleRecord(job_real_id=job_real_id, remind_msg=remind_msg)
+            record.id = self._last_record_id + len(ret) + 1
+            ret.append(dict(record.__data__))
+        return ret
+
+    def settle_jobs(self, done_ids, renewals, records):
+        jobs = {}
+        for real_id in done_ids:
+            if real_id in self._jobs:
+                jobs[real_id] = self._changed(self._jobs[real_id], state=JobState.done)
+        for real_id, next_run_time in renewals.items():
+            if real_id in self._jobs:
+                row = jobs.get(real_id, self._jobs[real_id])
+                jobs[real_id] = self._changed(row, next_run_time=next_run_time)
+        self._write(jobs=list(jobs.values()), records=self._new_records(records))
+
+    def create_records(self, records):
+        self._write(records=self._new_records(records))
+
+    def get_records(self, job_real_id):
+        return [
+            TableScheduleRecord(**row)
+            for row in self._records
+            if row["job_real_id"] == job_real_id
+        ]
+
+    def get_room_records(self, room, limit):
+        real_ids = {v: k for k, v in self._rooms.get(room, {}).items()}
+        ret = []
+        for row in reversed(self._records):
+            if row["job_real_id"] in real_ids:
+                ret.append(
+                    RoomRecord(
+                        real_ids[row["job_real_id"]],
+                        row["remind_msg"],
+                        row["create_time"],
+                    )
+                )
+        ret.sort(key=lambda r: r.create_time, reverse=True)
+        return ret[:limit]
+
+
+class LogStorage(MemoryStorage):
+    """追加写日志存储
+    每次修改把变更后的整行追加为日志中的一行, 同一次修改的多行在同一行日志中, 保证原子性.
+    启动时回放日志到内存, 日志中的过期行超过一定比例后重写日志.
+    """
+
+    # 日志行数超过有效数据的该倍数时重写
+    COMPACT_RATIO = 4
+    # 日志行数少于该值时不重写
+    COMPACT_MIN = 10000
+
+    def __init__(self, path: str = Config.STORAGE_LOG_PATH, fsync: bool = False):
+        """
+        :param path: 日志文件
+        :param fsync: 每次写入后是否等待落盘, 关闭时只保证写入操作系统缓存
+        """
+        super().__init__()
+        self.path = path
+        self.fsync = fsync
+        self._entries = 0
+        self._replay()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        valid = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    jobs, records = json.loads(line)
+                except ValueError:
+                    # 写入中途退出导致的不完整的行, 丢弃
+                    break
+                super()._write(jobs, records)
+                valid += len(line)
+                self._entries += 1
+        if valid != os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid)
+
+    def _write(self, jobs: List[dict] = (), records: List[dict] = ()):
+        if not jobs and not records:
+            return
+        self._file.write(json.dumps([jobs, records], ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        super()._write(jobs, records)
+        self._entries += 1
+        if self._entries >= self.COMPACT_MIN and self._entries > self.COMPACT_RATIO * (
+            len(self._jobs) + 1
+        ):
+            self.compact()
+
+    def compact(self):
+        """把当前数据重写为新日志, 替换旧日志"""
+        tmp_path = f"{self.path}.tmp"
+        entries = 0
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for batch in chunked(self._jobs.values(), BATCH_SIZE):
+                f.write(json.dumps([batch, []], ensure_ascii=False) + "\n")
+                entries += 1
+            for batch in chunked(self._records, BATCH_SIZE):
+                f.write(json.dumps([[], batch], ensure_ascii=False) + "\n")
+                entries += 1
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._entries = entries
+
+    def close(self):
+        self._file.close()
+
+
+STORAGES = {"sqlite": SqliteStorage, "memory": MemoryStorage, "log": LogStorage}
+
+
+def create_storage(backend: str = Config.STORAGE_BACKEND) -> BaseStorage:
+    return STORAGES[backend]()
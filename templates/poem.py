@@ -7,7 +7,14 @@ class Poem:
     def __init__(self):
         self._token_url = "https://v2.jinrishici.com/token"
         self._poem_url = "https://v2.jinrishici.com/sentence"
-        self._token = self._init_token()
+        self._token = None
+
+    @property
+    def token(self) -> str:
+        """首次使用时获取, 导入模块时不访问网络"""
+        if self._token is None:
+            self._token = self._init_token()
+        return self._token
 
     def _init_token(self) -> str:
         token_path = Path("./poem_token")
@@ -28,8 +35,8 @@ class Poem:
         return j["data"]
 
     def get_poem(self) -> str:
-        assert self._token, "poem 无可用token"
-        res = httpx.get(self._poem_url, headers={"X-User-Token": self._token})
+        assert self.token, "poem 无可用token"
+        res = httpx.get(self._poem_url, headers={"X-User-Token": self.token})
         assert res.status_code == 200, f"poem 获取诗句失败: {res.status_code}"
         j = res.json()
         assert j["status"] == "success", f"poem 获取诗句失败: {j['status']}"
@@ -8,11 +8,18 @@ from settings import Config
 
 class WeatherSelenium:
     def __init__(self):
-        chrome_options = Options()
-        chrome_options.headless = True
-        self.driver = webdriver.Chrome(options=chrome_options)
+        self._driver = None
         self.geokey = Config.GEO_KEY
 
+    @property
+    def driver(self) -> webdriver.Chrome:
+        """首次使用时启动浏览器, 导入模块时不启动"""
+        if self._driver is None:
+            chrome_options = Options()
+            chrome_options.headless = True
+            self._driver = webdriver.Chrome(options=chrome_options)
+        return self._driver
+
     def screenshot(self, url: str) -> bytes:
         self.driver.get(url)
         elem_summary = self.driver.find_element_by_xpath('//div[@class="c-city-weather-current__bg"]')
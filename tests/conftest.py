@@ -0,0 +1,59 @@
+import pytest
+from peewee import SqliteDatabase
+
+import dao
+from models import (
+    TableScheduleJob,
+    TableScheduleRecord,
+    TableCatchupPolicy,
+    TableSchedulerLease,
+    TableJobSearch,
+    create_search_index,
+    room_partition,
+)
+from storage import SqliteStorage, MemoryStorage, LogStorage
+
+MODELS = [
+    TableScheduleJob,
+    TableScheduleRecord,
+    TableCatchupPolicy,
+    TableSchedulerLease,
+    TableJobSearch,
+]
+
+
+def _bind_db(path: str):
+    test_db = SqliteDatabase(path)
+    test_db.register_function(room_partition, "room_partition", 2)
+    with test_db.bind_ctx(MODELS):
+        test_db.create_tables(MODELS)
+        create_search_index()
+        yield test_db
+    test_db.close()
+
+
+@pytest.fixture
+def memory_db():
+    yield from _bind_db(":memory:")
+
+
+@pytest.fixture
+def file_db(tmp_path):
+    """数据库文件, 可以同时用其他连接访问"""
+    yield from _bind_db(str(tmp_path / "test.db"))
+
+
+@pytest.fixture(params=["sqlite", "memory", "log"])
+def storage(request, tmp_path, monkeypatch):
+    """依次使用每种存储后端"""
+    if request.param == "sqlite":
+        request.getfixturevalue("memory_db")
+        backend = SqliteStorage()
+    elif request.param == "memory":
+        backend = MemoryStorage()
+    else:
+        backend = LogStorage(str(tmp_path / "jobs.log"))
+    monkeypatch.setattr(dao, "storage", backend)
+    yield backend
+    if isinstance(backend, LogStorage):
+        backend.close()
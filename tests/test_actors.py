@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from actors import RoomActors
+
+
+def test_room_order_and_concurrency():
+    events = []
+
+    def job(room, i, delay):
+        async def run():
+            events.append(("start", room, i))
+            await asyncio.sleep(delay)
+            events.append(("end", room, i))
+            return i
+
+        return run
+
+    async def run():
+        actors = RoomActors(idle_timeout=10, max_queue=10)
+        futures = [
+            actors.submit("room1", job("room1", 1, 0.05)),
+            actors.submit("room1", job("room1", 2, 0)),
+            actors.submit("room2", job("room2", 1, 0)),
+        ]
+        assert actors.depth("room1") == 2
+        results = await asyncio.gather(*futures)
+        await actors.close()
+        return results
+
+    assert asyncio.run(run()) == [1, 2, 1]
+    room1 = [e for e in events if e[1] == "room1"]
+    assert room1 == [
+        ("start", "room1", 1),
+        ("end", "room1", 1),
+        ("start", "room1", 2),
+        ("end", "room1", 2),
+    ]
+    # room2 不等待 room1
+    assert events.index(("end", "room2", 1)) < events.index(("end", "room1", 1))
+
+
+def test_errors_queue_limit_and_reaping():
+    async def fail():
+        raise ValueError("失败")
+
+    async def noop():
+        pass
+
+    async def run():
+        actors = RoomActors(idle_timeout=0.05, max_queue=2)
+        with pytest.raises(ValueError):
+            await actors.submit("room1", fail)
+        # 出错后执行者继续处理
+        await actors.submit("room1", noop)
+
+        actors.submit("room1", noop)
+        actors.submit("room1", noop)
+        with pytest.raises(AssertionError, match="过多"):
+            actors.submit("room1", noop)
+
+        await asyncio.sleep(0.2)
+        assert "room1" not in actors and len(actors) == 0
+        await actors.submit("room1", noop)
+        assert "room1" in actors
+        await actors.close()
+
+    asyncio.run(run())
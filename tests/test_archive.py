@@ -0,0 +1,66 @@
+from archive import Archiver
+from dao import ScheduleJobDao, ScheduleRecordDao
+from models import INCREMENTAL, TableScheduleJob, TableScheduleRecord
+from scripts.vacuum import convert
+from typevar import JobState
+from utils import TimeUtil
+
+DAY = 86400
+
+
+def test_archive_and_history(memory_db, tmp_path):
+    now = TimeUtil.datetime2timestamp("2021-07-07 12:00:00")
+    archiver = Archiver(str(tmp_path), retention_days=30, batch_size=2)
+    old = ScheduleJobDao.create_job("room1", now - 60 * DAY, "交周报")
+    daily = ScheduleJobDao.create_job("room1", now - 90 * DAY, "吃药", "daily")
+    cancelled = ScheduleJobDao.create_job("room1", now - 40 * DAY, "取消")
+    latest = ScheduleJobDao.create_job("room1", now - 50 * DAY, "最新")
+    other = ScheduleJobDao.create_job("room2", now - 35 * DAY, "开会")
+    ScheduleJobDao.job_done(old.job_id, "room1")
+    ScheduleJobDao.cancel_jobs(cancelled.job_id, latest.job_id, room="room1")
+
+    for days, job in [(90, daily), (60, old), (45, daily), (35, other), (1, daily)]:
+        ScheduleRecordDao.create_record(job.id, f"{job.remind_msg}-{days}")
+        TableScheduleRecord.update(create_time=now - days * DAY).where(
+            TableScheduleRecord.id == TableScheduleRecord.select().count()
+        ).execute()
+
+    history = [r.remind_msg for r in archiver.get_room_history("room1", 10)]
+    assert archiver.run(now) == (4, 2)
+    assert archiver.months() == ["2021-06", "2021-05", "2021-04"]
+    # 归档后查询结果不变
+    assert [r.remind_msg for r in archiver.get_room_history("room1", 10)] == history
+    assert history == ["吃药-1", "吃药-45", "交周报-60", "吃药-90"]
+    assert [r.remind_msg for r in archiver.get_room_history("room1", 2)] == history[:2]
+    assert [r.job_id for r in archiver.get_room_history("room2", 10)] == [1]
+
+    # 生效中的任务及任务ID最大的任务保留, 不复用任务ID
+    assert {job.id for job in TableScheduleJob.select()} == {
+        daily.id,
+        latest.id,
+        other.id,
+    }
+    assert ScheduleJobDao.get_job(latest.job_id, "room1", JobState.cancel)
+    assert archiver.run(now) == (0, 0)
+    # 运行中不做完整 VACUUM 转换数据库
+    assert memory_db.pragma("auto_vacuum") == 0
+
+
+def _free_pages(database) -> int:
+    ScheduleJobDao.create_jobs([("room1", 0, "x" * 1000, None)] * 200)
+    TableScheduleJob.delete().execute()
+    return database.pragma("freelist_count")
+
+
+def test_incremental_vacuum(file_db, tmp_path):
+    archiver = Archiver(str(tmp_path), vacuum_pages=5)
+    assert _free_pages(file_db) > 5
+    assert archiver.vacuum() == 0
+
+    # 停机后转换为增量模式, 之后每次最多释放 vacuum_pages 页
+    assert convert(file_db.database)
+    assert not convert(file_db.database)
+    free_pages = _free_pages(file_db)
+    assert free_pages > 5 and file_db.pragma("auto_vacuum") == INCREMENTAL
+    assert archiver.vacuum() == 5
+    assert file_db.pragma("freelist_count") == free_pages - 5
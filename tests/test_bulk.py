@@ -0,0 +1,77 @@
+import io
+import json
+from datetime import datetime
+
+import recurrence
+from dao import ScheduleJobDao
+from scripts.bulk import export_jobs, import_jobs, read_rows
+from utils import TimeUtil
+
+
+def test_import_export_roundtrip(memory_db, tmp_path):
+    now = int(TimeUtil.now_datetime().timestamp())
+    path = tmp_path / "reminders.jsonl"
+    rows = [
+        {"room": "room1", "time": "明天上午11点", "remind_msg": "吃东西"},
+        {
+            "room": "room1",
+            "next_run_time": now + 60,
+            "schedule_info": "daily",
+            "remind_msg": "喝水",
+        },
+        {"room": "room2", "next_run_time": now + 30, "remind_msg": "开会"},
+        {"room": "room2", "time": "不是时间", "remind_msg": "无效"},
+        {"room": "", "time": "明天", "remind_msg": "没有群聊"},
+    ]
+    path.write_text("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+    ScheduleJobDao.create_job("room1", now + 10, "已有任务")
+
+    assert import_jobs(str(path), workers=1, chunk_size=2) == (3, 2)
+    count, jobs = ScheduleJobDao.get_all_jobs("room1")
+    assert count == 3 and sorted(job.job_id for job in jobs) == [1, 2, 3]
+    drink = ScheduleJobDao.get_job(3, "room1")
+    assert (drink.remind_msg, drink.schedule_info, drink.anchor_time) == (
+        "喝水",
+        "daily",
+        now + 60,
+    )
+
+    buf = io.StringIO()
+    assert export_jobs(buf, "csv", "room1") == 3
+    buf.seek(0)
+    exported = list(read_rows(buf, "csv"))
+    assert [row["remind_msg"] for row in exported] == ["已有任务", "喝水", "吃东西"]
+
+    csv_path = tmp_path / "room1.csv"
+    csv_path.write_text(buf.getvalue())
+    assert import_jobs(str(csv_path), workers=2) == (3, 0)
+    count, jobs = ScheduleJobDao.get_all_jobs("room1")
+    assert count == 6
+    assert sorted(job.job_id for job in jobs) == list(range(1, 7))
+
+
+def test_roundtrip_keeps_anchor_time(memory_db, tmp_path):
+    # 每月31号的任务, 2月取当月最后一天
+    anchor = int(datetime(2021, 1, 31, 9).timestamp())
+    clamped = int(datetime(2021, 2, 28, 9).timestamp())
+    ScheduleJobDao.create_jobs([("room1", clamped, "交房租", "monthly", anchor)])
+
+    path = tmp_path / "room1.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        assert export_jobs(f, "jsonl", "room1") == 1
+    with open(path, encoding="utf-8") as f:
+        (row,) = read_rows(f, "jsonl")
+    assert (row["next_run_time"], row["anchor_time"]) == (clamped, anchor)
+
+    assert import_jobs(str(path), workers=1) == (1, 0)
+    job = ScheduleJobDao.get_job(2, "room1")
+    assert (job.next_run_time, job.anchor_time) == (clamped, anchor)
+    assert recurrence.next_run_time(
+        job.schedule_info, job.next_run_time, now=clamped, anchor_time=job.anchor_time
+    ) == int(datetime(2021, 3, 31, 9).timestamp())
+
+    # 没有 anchor_time 的行以 next_run_time 为准
+    del row["anchor_time"]
+    path.write_text(json.dumps(row, ensure_ascii=False) + "\n")
+    assert import_jobs(str(path), workers=1) == (1, 0)
+    assert ScheduleJobDao.get_job(3, "room1").anchor_time == clamped
@@ -0,0 +1,35 @@
+from catchup import plan_catch_up
+from dao import ScheduleJobDao, ScheduleRecordDao, CatchupPolicyDao
+from typevar import CatchupPolicy, JobState
+from utils import TimeUtil
+
+
+def test_catch_up(memory_db):
+    now = TimeUtil.datetime2timestamp("2021-07-07 15:00:00")
+    yesterday = TimeUtil.datetime2timestamp("2021-07-06 09:00:00")
+    once = ScheduleJobDao.create_job("room1", yesterday, "交周报")
+    daily = ScheduleJobDao.create_job("room1", yesterday, "吃药", "daily")
+    skipped = ScheduleJobDao.create_job("room1", yesterday, "打卡", "daily")
+    summary = [
+        ScheduleJobDao.create_job("room2", yesterday + i, f"开会{i}") for i in range(3)
+    ]
+    CatchupPolicyDao.set_policy("room1", CatchupPolicy.skip, skipped.job_id)
+    CatchupPolicyDao.set_policy("room2", CatchupPolicy.summary)
+
+    jobs = ScheduleJobDao.get_overdue_jobs(now - 1)
+    assert len(jobs) == 6
+    policies = CatchupPolicyDao.get_policies({job.room for job in jobs})
+    plan = plan_catch_up(jobs, policies, now, default=CatchupPolicy.replay)
+
+    assert len(plan.messages["room1"]) == 2, "逐条提醒, 跳过的任务不提醒"
+    assert len(plan.messages["room2"]) == 1, "汇总为一条"
+    assert "共有3条任务超时" in plan.messages["room2"][0]
+    assert sorted(plan.done_ids) == sorted([once.id, *(job.id for job in summary)])
+    tomorrow = TimeUtil.datetime2timestamp("2021-07-08 09:00:00")
+    assert plan.renewals == {daily.id: tomorrow, skipped.id: tomorrow}
+
+    ScheduleJobDao.settle_jobs(plan.done_ids, plan.renewals, plan.records)
+    assert not ScheduleJobDao.get_overdue_jobs(now - 1)
+    assert ScheduleJobDao.get_job(once.job_id, "room1", JobState.done)
+    assert ScheduleJobDao.get_job(daily.job_id, "room1").next_run_time == tomorrow
+    assert ScheduleRecordDao.model.select().count() == 5
@@ -0,0 +1,79 @@
+import random
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from ner.dtime import datecalc
+
+
+def _random_datetime(rnd: random.Random) -> datetime:
+    start = datetime(1, 1, 1).toordinal()
+    end = datetime(9999, 12, 31).toordinal()
+    day = datetime.fromordinal(rnd.randint(start, end))
+    return day + timedelta(
+        seconds=rnd.randrange(86400), microseconds=rnd.randrange(10**6)
+    )
+
+
+def _result(func):
+    try:
+        return func()
+    except (ValueError, OverflowError) as e:
+        return type(e)
+
+
+def test_shift_matches_relativedelta():
+    rnd = random.Random(20210707)
+    for _ in range(20000):
+        dt = _random_datetime(rnd)
+        # 月末附近的日期更容易出错
+        if rnd.random() < 0.3:
+            dt = dt.replace(day=datecalc.days_in_month(dt.year, dt.month))
+        years = rnd.randint(-50, 50)
+        months = rnd.randint(-30, 30)
+        days = rnd.randint(-400, 400)
+        seconds = rnd.randint(-200000, 200000)
+        expected = _result(
+            lambda: dt
+            + relativedelta(years=years, months=months, days=days, seconds=seconds)
+        )
+        assert (
+            _result(lambda: datecalc.shift(dt, years, months, days, seconds))
+            == expected
+        ), (dt, years, months, days, seconds)
+        assert _result(lambda: datecalc.add_months(dt, months)) == _result(
+            lambda: dt + relativedelta(months=months)
+        )
+        assert _result(lambda: datecalc.add_years(dt, years)) == _result(
+            lambda: dt + relativedelta(years=years)
+        )
+
+
+def test_normalize_matches_relativedelta():
+    rnd = random.Random(7)
+    for _ in range(5000):
+        years = rnd.randint(-50, 50)
+        months = rnd.randint(-30, 30)
+        days = rnd.randint(-400, 400)
+        seconds = rnd.randint(-500000, 500000)
+        delta = relativedelta(years=years, months=months, days=days, seconds=seconds)
+        assert datecalc.normalize(years, months, days, seconds) == (
+            delta.years,
+            delta.months,
+            delta.days,
+            delta.hours * 3600 + delta.minutes * 60 + delta.seconds,
+        )
+
+
+def test_weekday_date():
+    rnd = random.Random(1)
+    for _ in range(2000):
+        dt = _random_datetime(rnd)
+        if not datetime(1, 1, 8) <= dt <= datetime(9999, 12, 24):
+            continue
+        for weekday in range(1, 8):
+            result = datecalc.weekday_date(dt, weekday)
+            assert result.isoweekday() == weekday
+            assert abs((result.date() - dt.date()).days) < 7
+            assert result == datetime(result.year, result.month, result.day)
+            assert result.isocalendar()[:2] == dt.isocalendar()[:2]
@@ -0,0 +1,125 @@
+import random
+
+import pytest
+from peewee import SqliteDatabase
+
+from models import TableScheduleJob, TableScheduleRecord
+from scripts import db_2_v2
+
+SEED = 20210707
+
+
+def legacy_refresh(data):
+    """原实现的迁移规则 -> (任务, 提醒记录)"""
+    alive_jobs = [d for d in data if d[-2] == 0]
+    alive_job_msgs = set([d[-1] for d in alive_jobs])
+    full_done_jobs = [d for d in data if d[-2] == 1 and d[-1] not in alive_job_msgs]
+    only_done_jobs = set()
+    done_jobs = []
+    for d in full_done_jobs:
+        if d[-1] in only_done_jobs:
+            continue
+        done_jobs.append(d)
+        only_done_jobs.add(d[-1])
+    cancel_jobs = [d for d in data if d[-2] == 2]
+    full_jobs = sorted(
+        [*alive_jobs, *done_jobs, *cancel_jobs], key=lambda x: (x[1], x[3])
+    )
+
+    jobs, row_map, next_ids = [], {}, {}
+    for _, room, name, next_run_time, schedule_info, state, remind_msg in full_jobs:
+        next_ids[room] = next_ids.get(room, 0) + 1
+        jobs.append(
+            (
+                room,
+                next_ids[room],
+                name,
+                next_run_time,
+                schedule_info,
+                state,
+                remind_msg,
+            )
+        )
+        row_map[remind_msg] = (room, next_ids[room])
+    records = [
+        (*row_map[remind_msg], remind_msg)
+        for *_, remind_msg in sorted(full_done_jobs, key=lambda x: (x[1], x[3]))
+    ]
+    return jobs, records
+
+
+@pytest.fixture
+def legacy_data(tmp_path, monkeypatch):
+    rnd = random.Random(SEED)
+    data = [
+        (
+            i,
+            f"room{rnd.randint(1, 4)}",
+            f"name{i}",
+            1625641200 + rnd.randint(0, 20) * 60,
+            rnd.choice([None, "daily", "7"]),
+            rnd.choice([0, 1, 1, 1, 2]),
+            f"msg{rnd.randint(1, 40)}",
+        )
+        for i in range(1, 301)
+    ]
+    old_db = SqliteDatabase(str(tmp_path / "wxbot.db"))
+    old_db.execute_sql(
+        "CREATE TABLE tableschedulejob (id INTEGER PRIMARY KEY, room TEXT, name TEXT,"
+        " next_run_time INTEGER, schedule_info TEXT, state INTEGER, remind_msg TEXT)"
+    )
+    with old_db.atomic():
+        for row in data:
+            old_db.execute_sql(
+                "INSERT INTO tableschedulejob VALUES (?,?,?,?,?,?,?)", row
+            )
+    monkeypatch.setattr(db_2_v2, "old_db", old_db)
+    return data
+
+
+def migrated():
+    jobs = {
+        job.id: job for job in TableScheduleJob.select().order_by(TableScheduleJob.id)
+    }
+    return (
+        [
+            (
+                j.room,
+                j.job_id,
+                j.name,
+                j.next_run_time,
+                j.schedule_info,
+                j.state,
+                j.remind_msg,
+            )
+            for j in jobs.values()
+        ],
+        [
+            (jobs[r.job_real_id].room, jobs[r.job_real_id].job_id, r.remind_msg)
+            for r in TableScheduleRecord.select().order_by(TableScheduleRecord.id)
+        ],
+    )
+
+
+def test_migrate_matches_legacy(memory_db, legacy_data, monkeypatch):
+    expected_jobs, expected_records = legacy_refresh(legacy_data)
+    with memory_db.bind_ctx(db_2_v2.MIGRATE_MODELS):
+        # 第三批写入后中断, 重新运行从进度继续
+        calls = []
+
+        def interrupt(self, rows):
+            calls.append(rows)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+
+        update = db_2_v2._Progress.update
+        monkeypatch.setattr(db_2_v2._Progress, "update", interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            db_2_v2.refresh(batch_size=17)
+        monkeypatch.setattr(db_2_v2._Progress, "update", update)
+
+        jobs, records = db_2_v2.refresh(batch_size=17)
+        assert jobs == len(expected_jobs) - 17 * 3
+        assert records == len(expected_records)
+        assert migrated() == (expected_jobs, expected_records)
+        assert db_2_v2.refresh() == (0, 0)
@@ -0,0 +1,97 @@
+from dao import ScheduleJobDao
+from listing import (
+    get_job_page,
+    render_history,
+    render_job_page,
+    search_job_page,
+    split_messages,
+)
+from storage import RoomRecord
+
+
+def test_job_pages(storage):
+    now = 1625641200
+    # 相同执行时间的任务按真实ID排序
+    ScheduleJobDao.create_jobs(
+        [("room1", now + i // 2, f"任务{i}", None) for i in range(7)]
+        + [("room2", now, "其他群聊", None)]
+    )
+    ScheduleJobDao.cancel_jobs(7, room="room1")
+
+    pages = [get_job_page("room1", page, page_size=2) for page in (1, 2, 3)]
+    assert [(p.count, p.pages, p.start) for p in pages] == [
+        (6, 3, 1),
+        (6, 3, 3),
+        (6, 3, 5),
+    ]
+    assert [[job.remind_msg for job in p.jobs] for p in pages] == [
+        ["任务0", "任务1"],
+        ["任务2", "任务3"],
+        ["任务4", "任务5"],
+    ]
+
+    msgs = render_job_page(
+        "当前共有6条任务: ", pages[1], "/all tasks", numbered=True, limit=10000
+    )
+    assert len(msgs) == 1
+    assert msgs[0].startswith("当前共有6条任务: (第2/3页)\n")
+    assert "3. ID:3\n" in msgs[0] and "4. ID:4\n" in msgs[0]
+    assert msgs[0].endswith("输入 /all tasks,3 查看下一页\n")
+    # 不能翻页的命令只提示未列出的任务数
+    msgs = render_job_page("当前还有6条任务:", pages[0], None, numbered=True)
+    assert msgs[-1].endswith("还有4条任务未列出\n") and "查看下一页" not in msgs[-1]
+
+    empty = get_job_page("room3", 1)
+    assert (empty.count, empty.pages, empty.jobs) == (0, 1, [])
+
+
+def test_split_messages():
+    assert split_messages(["ab", "cd", "e"], 4) == ["abcd", "e"]
+    assert split_messages(["ab", "cdefghij", "k"], 4) == ["ab", "cdef", "ghij", "k"]
+    assert split_messages(["", ""], 4) == []
+
+
+def test_search_pages(storage):
+    ScheduleJobDao.create_jobs(
+        [
+            ("room1", 1625641200, "交周报", None),
+            ("room1", 1625641300, "周报周报, 记得交周报", None),
+            ("room1", 1625641400, "周会", None),
+            ("room1", 1625641500, "Weekly report 周报", None),
+            ("room1", 1625641600, "取消的周报", None),
+            ("room2", 1625641200, "其他群聊的周报", None),
+        ]
+    )
+    ScheduleJobDao.cancel_jobs(5, room="room1")
+
+    page = search_job_page("room1", "周报", 1, page_size=2)
+    assert (page.count, page.pages) == (3, 2)
+    # 出现次数多的排在前面
+    assert page.jobs[0].remind_msg == "周报周报, 记得交周报"
+    last = search_job_page("room1", "周报", 2, page_size=2)
+    assert len(last.jobs) == 1 and last.start == 3
+    ids = {job.job_id for job in page.jobs + last.jobs}
+    assert ids == {1, 2, 4}
+
+    # 单字按前缀匹配, 词尾的字也能搜到
+    jobs = search_job_page("room1", "周", 1).jobs
+    assert {job.job_id for job in jobs} == {1, 2, 3, 4}
+    jobs = search_job_page("room1", "报", 1).jobs
+    assert {job.job_id for job in jobs} == {1, 2, 4}
+    assert [job.job_id for job in search_job_page("room1", "WEEK 周报", 1).jobs] == [4]
+    assert search_job_page("room1", "月报", 1).count == 0
+    assert search_job_page("room1", ",,", 1).count == 0
+
+    msgs = render_job_page("找到3条任务: ", page, "/search,周报")
+    assert msgs[-1].endswith("输入 /search,周报,2 查看下一页\n")
+
+
+def test_render_history():
+    records = [RoomRecord(i, f"提醒{i}", 1625641200 + i) for i in range(5)]
+    msgs = render_history(records, limit=80)
+    assert len(msgs) > 1 and all(len(msg) <= 80 for msg in msgs)
+    text = "".join(msgs)
+    assert text.startswith("最近5条提醒记录:\n")
+    assert [text.index(f"提醒{i}") for i in range(5)] == sorted(
+        text.index(f"提醒{i}") for i in range(5)
+    )
@@ -0,0 +1,13 @@
+import asyncio
+
+from benchmarks.load_test import run_load_test
+
+
+def test_load_test_delivers_all_jobs():
+    result = asyncio.run(
+        run_load_test(jobs=60, rooms=6, clusters=2, spread=1, lead=1, timeout=20)
+    )
+    assert result["delivered"] == 60
+    assert len(result["lateness"]) == 60 and min(result["lateness"]) >= 0
+    assert len(result["write_latencies"]["create_records"]) == 60
+    assert result["loop_lags"]
@@ -0,0 +1,61 @@
+import io
+import json
+
+import pytest
+
+from logger import logger, setup_logging, stop_logging
+
+
+@pytest.fixture
+def log_stream():
+    stream = io.StringIO()
+    yield stream
+    setup_logging()
+
+
+def _lines(stream: io.StringIO) -> list:
+    stop_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+class _Repr:
+    calls = 0
+
+    def __repr__(self):
+        _Repr.calls += 1
+        return "repr"
+
+
+def test_json_module_levels_and_sampling(log_stream):
+    setup_logging(
+        level="INFO",
+        module_levels="test_logger=DEBUG,dao=ERROR",
+        fmt="json",
+        sample_every=3,
+        stream=log_stream,
+    )
+    for i in range(7):
+        logger.debug("debug %s", i)
+    logger.info("room:%s", "room1")
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception("失败")
+
+    lines = _lines(log_stream)
+    assert [line["msg"] for line in lines] == [
+        "debug 0",
+        "debug 3",
+        "debug 6",
+        "room:room1",
+        "失败",
+    ]
+    assert lines[3]["module"] == "test_logger" and lines[3]["level"] == "INFO"
+    assert "ZeroDivisionError" in lines[-1]["exc"]
+
+
+def test_filtered_records_are_not_formatted(log_stream):
+    setup_logging(level="INFO", fmt="json", stream=log_stream)
+    _Repr.calls = 0
+    logger.debug("%r", _Repr())
+    assert _lines(log_stream) == [] and _Repr.calls == 0
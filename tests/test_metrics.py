@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from dao import ScheduleJobDao
+from metrics import Histogram, LoopLagSampler, Registry, metrics
+
+
+def test_registry_export(tmp_path):
+    registry = Registry(enabled=True)
+    registry.counter("messages_total", "收到的消息数").inc()
+    registry.counter("messages_total", "收到的消息数").inc(2)
+    registry.gauge("queue_depth", room='a"b').set(3)
+    histogram = registry.histogram("latency_seconds", bounds=(0.1, 1), func="x")
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    assert histogram.counts() == {"<=0.1": 1, "<=1": 1, ">1": 1}
+    assert histogram.quantile(0.5) == 1
+    assert registry.to_prometheus().splitlines() == [
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{func="x",le="0.1"} 1',
+        'latency_seconds_bucket{func="x",le="1.0"} 2',
+        'latency_seconds_bucket{func="x",le="+Inf"} 3',
+        'latency_seconds_sum{func="x"} 5.55',
+        'latency_seconds_count{func="x"} 3',
+        "# HELP messages_total 收到的消息数",
+        "# TYPE messages_total counter",
+        "messages_total 3",
+        "# TYPE queue_depth gauge",
+        'queue_depth{room="a\\"b"} 3',
+    ]
+
+    path = tmp_path / "metrics.json"
+    registry.write(str(path))
+    data = json.loads(path.read_text())
+    assert data["messages_total"] == [{"labels": {}, "value": 3}]
+    assert data["latency_seconds"][0]["value"]["count"] == 3
+
+
+def test_disabled_registry_is_noop():
+    registry = Registry(enabled=False)
+    registry.counter("messages_total").inc()
+    registry.register("lateness_seconds", Histogram())
+    with registry.timer("render_seconds"):
+        pass
+
+    @registry.timed("work_seconds")
+    def work(x):
+        return x * 2
+
+    assert work(2) == 4
+    assert registry.to_json() == {}
+
+
+def test_timed_and_loop_lag():
+    registry = Registry(enabled=True)
+
+    @registry.timed("work_seconds")
+    async def work():
+        await asyncio.sleep(0)
+        return 1
+
+    async def run():
+        sampler = asyncio.ensure_future(LoopLagSampler(registry, 0.01).run())
+        assert await work() == 1
+        await asyncio.sleep(0.05)
+        sampler.cancel()
+
+    asyncio.run(run())
+    data = registry.to_json()
+    assert data["work_seconds"][0]["labels"] == {
+        "func": "test_timed_and_loop_lag.<locals>.work"
+    }
+    assert data["event_loop_lag_seconds"][0]["value"]["count"] >= 1
+
+
+def test_dao_timing(memory_db, monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(metrics, "_families", {})
+    ScheduleJobDao.create_job("room1", 1625641200, "吃东西")
+    funcs = {row["labels"]["func"] for row in metrics.to_json()["dao_seconds"]}
+    assert {"ScheduleJobDao.create_job", "ScheduleJobDao.get_new_id"} <= funcs
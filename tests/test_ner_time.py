@@ -60,6 +60,53 @@ def test_extract_schedule(mocker):
     # test days
     assert_one("每3天", "2021-07-10 15:00:00", 3)
 
+    # test rules, 2021-07-07 为周三
+    assert_one("每个工作日上午九点", "2021-07-08 09:00:00", "d:12345")
+    assert_one("每月最后一天晚上8点", "2021-07-31 20:00:00", "m:-1")
+    assert_one("隔周三上午九点", "2021-07-14 09:00:00", "w/2")
+    assert_one("每月第一个周一上午10点", "2021-08-02 10:00:00", "m:1#1")
+    assert_one("每两小时", "2021-07-07 17:00:00", "h/2")
+
+
+def test_result_to_model():
+    from ner.dtime.dtime import ZHDatetimeExtractor
+    from ner.models import Datetime, DatetimeResult, Number, NumberResult
+    from ner.number import ZHNumberExtractor
+
+    now = datetime(2021, 7, 7, 15)
+    res = ZHDatetimeExtractor(now_func=lambda: now).parse("明天下午三点")
+    assert isinstance(res[0], DatetimeResult)
+    assert res[0].values[-1].value == datetime(2021, 7, 8, 15)
+    model = res[0].to_model()
+    assert isinstance(model, Datetime)
+    assert model.values[-1].value == res[0].values[-1].value
+    assert model.type == res[0].type
+
+    num = ZHNumberExtractor().parse("一百二十")
+    assert isinstance(num[0], NumberResult) and num[0].num == 120
+    assert num[0].to_model() == Number(entity="一百二十", start_pos=0, end_pos=4, num=120)
+
+
+def test_holiday():
+    from ner.dtime.dtime import ZHDatetimeExtractor
+    from ner.dtime.holiday import holiday_date
+
+    assert holiday_date("春节", 2019) == datetime(2019, 2, 5)
+    assert holiday_date("年30", 2020) == datetime(2020, 1, 24)
+    assert holiday_date("清明", 2020) == datetime(2020, 4, 4)
+    assert holiday_date("中秋", 2099) == datetime(2099, 9, 29)
+    assert holiday_date("国庆", 1900) == datetime(1900, 10, 1)
+
+    ext = ZHDatetimeExtractor(now_func=lambda: datetime(2021, 7, 7, 15))
+
+    def last_value(text: str) -> datetime:
+        return ext.parse(text)[0].values[-1].value
+
+    assert last_value("春节") == datetime(2022, 2, 1)
+    assert last_value("中秋节") == datetime(2021, 9, 21)
+    assert last_value("明年春节") == datetime(2022, 2, 1)
+    assert last_value("2030年端午节") == datetime(2030, 6, 5)
+
 
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,129 @@
+import asyncio
+
+from outbox import Outbox, Priority, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeRoom:
+    def __init__(self, room_id: str):
+        self.room_id = room_id
+
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    for _ in range(2):
+        assert bucket.wait_time() == 0
+        bucket.consume()
+    assert bucket.wait_time() == 0.5
+    clock.now = 0.5
+    assert bucket.wait_time() == 0
+    clock.now = 100
+    bucket.consume()
+    bucket.consume()
+    assert bucket.wait_time() == 0.5, "令牌数不能超过容量"
+
+
+def test_outbox_priority_and_room_limit():
+    clock = FakeClock()
+    sent = []
+
+    async def send(room, msg):
+        sent.append(msg)
+
+    room_a, room_b = FakeRoom("a"), FakeRoom("b")
+
+    async def drain(outbox):
+        while True:
+            env, wait = outbox._pick()
+            if env is None:
+                return wait
+            outbox._global.consume()
+            outbox._room_bucket(env.room).consume()
+            await outbox._deliver(env)
+
+    async def run():
+        outbox = Outbox(
+            send,
+            global_rate=100,
+            global_burst=100,
+            room_rate=1,
+            room_burst=1,
+            clock=clock,
+        )
+        outbox.put(room_a, "a-reminder-1", Priority.reminder)
+        outbox.put(room_a, "a-reminder-2", Priority.reminder)
+        outbox.put(room_b, "b-reminder-1", Priority.reminder)
+        outbox.put(room_a, "a-command", Priority.command)
+
+        wait = await drain(outbox)
+        # 命令回复优先, a 群限速后 b 群不受影响
+        assert sent == ["a-command", "b-reminder-1"], sent
+        assert wait == 1
+        for _ in range(2):
+            clock.now += wait
+            wait = await drain(outbox)
+        assert sent[2:] == ["a-reminder-1", "a-reminder-2"], sent
+        assert not len(outbox)
+
+    asyncio.run(run())
+
+
+def test_outbox_retry():
+    clock = FakeClock()
+    calls = []
+
+    async def send(room, msg):
+        calls.append(msg)
+        if len(calls) < 3:
+            raise RuntimeError("puppet error")
+
+    async def run():
+        outbox = Outbox(send, max_retries=2, retry_base=1, clock=clock)
+        future = outbox.put(FakeRoom("a"), "hello")
+        for _ in range(3):
+            env, wait = outbox._pick()
+            if env is None:
+                clock.now += wait
+                env, wait = outbox._pick()
+            await outbox._deliver(env)
+        return future
+
+    future = asyncio.run(run())
+    assert calls == ["hello"] * 3
+    assert future.done() and future.exception() is None
+
+
+def test_outbox_reap_buckets():
+    clock = FakeClock()
+
+    async def send(room, msg):
+        pass
+
+    async def run():
+        outbox = Outbox(send, room_rate=0.1, room_burst=2, reap_interval=60, clock=clock)
+        for room_id in ("a", "b"):
+            outbox._room_bucket(FakeRoom(room_id)).consume()
+        clock.now = 55
+        outbox._room_bucket(FakeRoom("b")).consume()
+        outbox._room_bucket(FakeRoom("b")).consume()
+
+        clock.now = 61
+        outbox._pick()
+        # a 已补满被回收, b 还在补充令牌
+        assert list(outbox._rooms) == ["b"]
+        clock.now = 100
+        outbox._pick()
+        assert list(outbox._rooms) == ["b"], "未到回收间隔"
+        clock.now = 121
+        outbox._pick()
+        assert outbox._rooms == {}
+
+    asyncio.run(run())
@@ -0,0 +1,210 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from recurrence import IntervalRule, MonthlyRule, Rule, WeekdayRule
+from recurrence import add_months, is_rule, next_run_time, parse_rule
+from utils import TimeUtil
+
+SEED = 20210707
+ROUNDS = 2000
+
+
+def ts(date_str: str) -> int:
+    return TimeUtil.datetime2timestamp(date_str)
+
+
+def random_timestamp(rnd: random.Random) -> int:
+    return ts("1990-01-01 00:00:00") + rnd.randrange(0, 60 * 365 * 86400)
+
+
+def test_add_months():
+    jan31 = datetime(2021, 1, 31, 18)
+    assert add_months(jan31, 1) == datetime(2021, 2, 28, 18)
+    assert add_months(jan31, 13) == datetime(2022, 2, 28, 18)
+    assert add_months(jan31, 2) == datetime(2021, 3, 31, 18)
+    assert add_months(jan31, 37) == datetime(2024, 2, 29, 18)
+    assert add_months(jan31, -2) == datetime(2020, 11, 30, 18)
+
+
+def test_next_run_time_examples():
+    # 锚定在31号的月任务, 二月之后回到31号
+    assert next_run_time(
+        "monthly",
+        ts("2021-02-28 18:00:00"),
+        ts("2021-02-28 18:00:01"),
+        anchor_time=ts("2021-01-31 18:00:00"),
+    ) == ts("2021-03-31 18:00:00")
+    assert next_run_time(
+        "yearly", ts("2020-02-29 09:00:00"), ts("2021-01-01 00:00:00")
+    ) == ts("2021-02-28 09:00:00")
+    # 长时间停机后直接跳到下一次
+    assert next_run_time(
+        "daily", ts("2015-03-01 08:00:00"), ts("2021-07-07 15:00:00")
+    ) == ts("2021-07-08 08:00:00")
+    assert next_run_time(3, ts("2021-07-01 08:00:00"), ts("2021-07-07 08:00:00")) == ts(
+        "2021-07-10 08:00:00"
+    )
+    # 尚未到期的任务也至少顺延一个周期
+    assert next_run_time(
+        "weekly", ts("2021-07-14 08:00:00"), ts("2021-07-07 08:00:00")
+    ) == ts("2021-07-21 08:00:00")
+
+
+def test_next_run_time_by_days_property():
+    rnd = random.Random(SEED)
+    for _ in range(ROUNDS):
+        schedule_info = rnd.choice(["daily", "weekly", str(rnd.randint(1, 400))])
+        days = {"daily": 1, "weekly": 7}.get(schedule_info) or int(schedule_info)
+        current, now = random_timestamp(rnd), random_timestamp(rnd)
+        result = datetime.fromtimestamp(next_run_time(schedule_info, current, now))
+        start = datetime.fromtimestamp(current)
+        ref = max(start, datetime.fromtimestamp(now))
+
+        assert result > ref
+        assert result - timedelta(days=days) <= ref, "必须是第一个晚于当前的执行时间"
+        assert (result - start) % timedelta(days=days) == timedelta(0)
+
+
+def test_next_run_time_by_months_property():
+    rnd = random.Random(SEED)
+    for _ in range(ROUNDS):
+        schedule_info = rnd.choice(["monthly", "yearly"])
+        months = 1 if schedule_info == "monthly" else 12
+        anchor = random_timestamp(rnd)
+        anchor_dt = datetime.fromtimestamp(anchor)
+        current_dt = add_months(anchor_dt, rnd.randint(0, 24) * months)
+        now = random_timestamp(rnd)
+        result = datetime.fromtimestamp(
+            next_run_time(
+                schedule_info, int(current_dt.timestamp()), now, anchor_time=anchor
+            )
+        )
+        ref = max(current_dt, datetime.fromtimestamp(now))
+
+        periods = 0
+        expected = anchor_dt
+        while expected <= ref:
+            periods += 1
+            expected = add_months(anchor_dt, periods * months)
+        assert result == expected, (schedule_info, anchor_dt, current_dt, now)
+
+
+def _brute_force(rule: Rule, anchor: datetime, ref: datetime) -> datetime:
+    """从 anchor 起逐个枚举执行时间"""
+    if isinstance(rule, IntervalRule):
+        candidate = anchor
+        while candidate <= ref:
+            candidate += rule.step
+        return candidate
+    if isinstance(rule, WeekdayRule):
+        candidate = anchor
+        while candidate <= ref or candidate.isoweekday() not in rule.weekdays:
+            candidate += timedelta(days=1)
+        return candidate
+    months = 0
+    while True:
+        year, month = divmod(anchor.month - 1 + months, 12)
+        year, month = anchor.year + year, month + 1
+        candidate = anchor.replace(year=year, month=month, day=rule.day_of(year, month))
+        if candidate > ref:
+            return candidate
+        months += rule.interval
+
+
+def test_rule_roundtrip():
+    for text in (
+        "h",
+        "h/2",
+        "d/3",
+        "w/2",
+        "d:12345",
+        "d:67",
+        "m:-1",
+        "m/3:-1",
+        "m:1#1",
+        "m:5#-1",
+    ):
+        assert is_rule(text)
+        assert str(parse_rule(text)) == text
+    for text in ("daily", "weekly", "monthly", "yearly", "3", 3, None):
+        assert not is_rule(text)
+    for text in ("h:1", "d/2:12345", "m:8#1", "m:1#5", "w/0", "m:x"):
+        with pytest.raises(AssertionError):
+            parse_rule(text)
+
+
+def test_rule_day_of():
+    # 2021-07: 周四开始, 31天
+    assert MonthlyRule().day_of(2021, 7) == 31
+    assert MonthlyRule().day_of(2024, 2) == 29
+    assert MonthlyRule(weekday=1, nth=1).day_of(2021, 7) == 5
+    assert MonthlyRule(weekday=4, nth=1).day_of(2021, 7) == 1
+    assert MonthlyRule(weekday=5, nth=-1).day_of(2021, 7) == 30
+    assert MonthlyRule(weekday=6, nth=-1).day_of(2021, 7) == 31
+    assert MonthlyRule(weekday=3, nth=4).day_of(2021, 7) == 28
+
+
+def test_rule_next_run_time_examples():
+    # 周五的工作日任务顺延到下周一
+    assert next_run_time(
+        "d:12345",
+        ts("2021-07-09 09:00:00"),
+        ts("2021-07-09 09:00:01"),
+        anchor_time=ts("2021-07-01 09:00:00"),
+    ) == ts("2021-07-12 09:00:00")
+    assert next_run_time(
+        "m:-1",
+        ts("2021-01-31 20:00:00"),
+        anchor_time=ts("2021-01-31 20:00:00"),
+        now=ts("2021-01-31 20:00:00"),
+    ) == ts("2021-02-28 20:00:00")
+    assert next_run_time(
+        "w/2",
+        ts("2021-07-07 09:00:00"),
+        ts("2021-08-01 00:00:00"),
+        anchor_time=ts("2021-07-07 09:00:00"),
+    ) == ts("2021-08-04 09:00:00")
+    assert next_run_time(
+        "h/2",
+        ts("2021-07-07 09:00:00"),
+        ts("2021-07-08 10:30:00"),
+        anchor_time=ts("2021-07-07 09:00:00"),
+    ) == ts("2021-07-08 11:00:00")
+
+
+def test_rule_next_after_property():
+    rnd = random.Random(SEED)
+    rules = [
+        parse_rule(text)
+        for text in (
+            "h",
+            "h/5",
+            "d/3",
+            "w/2",
+            "d:12345",
+            "d:7",
+            "m:-1",
+            "m/2:-1",
+            "m:1#1",
+            "m:5#-1",
+            "m/3:3#4",
+        )
+    ]
+    for _ in range(ROUNDS):
+        rule = rnd.choice(rules)
+        anchor = datetime.fromtimestamp(random_timestamp(rnd)).replace(microsecond=0)
+        if isinstance(rule, MonthlyRule):
+            year, month = anchor.year, anchor.month
+            anchor = anchor.replace(day=rule.day_of(year, month))
+        elif isinstance(rule, WeekdayRule):
+            while anchor.isoweekday() not in rule.weekdays:
+                anchor += timedelta(days=1)
+        span = 3 * 86400 if rule is rules[0] else 3 * 365 * 86400
+        ref = anchor + timedelta(seconds=rnd.randint(-86400, span))
+        assert rule.next_after(anchor, ref) == _brute_force(rule, anchor, ref), (
+            str(rule),
+            anchor,
+            ref,
+        )
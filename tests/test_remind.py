@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import main
+from dao import ScheduleJobDao
+from main import ReminderBot
+from models import TableScheduleJob, TableScheduleRecord
+from outbox import Outbox
+from typevar import JobState
+
+
+class FakeRoom:
+    room_id = "room1"
+
+    @classmethod
+    async def find(cls, query):
+        return cls()
+
+
+def _bot(sent: list, send_delay: float = 0) -> ReminderBot:
+    async def send(room, msg):
+        await asyncio.sleep(send_delay)
+        sent.append(msg)
+
+    bot = ReminderBot()
+    bot.Room = FakeRoom
+    bot.outbox = Outbox(
+        send, global_rate=100, global_burst=100, room_rate=100, room_burst=100
+    )
+    return bot
+
+
+def test_lateness_recorded_on_send(memory_db):
+    sent = []
+    bot = _bot(sent, send_delay=0.3)
+    job = ScheduleJobDao.create_job("room1", int(time.time()), "开会")
+
+    async def run():
+        bot.outbox.start()
+        await bot._fire_room_jobs("room1", [(job, False)])
+        # 消息发出后才记录
+        assert bot.scheduler.lateness.count == 0
+        await asyncio.sleep(0.5)
+
+    asyncio.run(run())
+    assert len(sent) == 1 and bot.scheduler.lateness.count == 1
+    assert bot.scheduler.lateness.sum >= 0.3
+
+
+def _fire_coalesced(bot: ReminderBot, jobs: list):
+    async def run():
+        bot.outbox.start()
+        await bot._fire_room_jobs("room1", [(job, False) for job in jobs])
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+
+
+def test_coalesced_jobs(memory_db, monkeypatch):
+    monkeypatch.setattr(main.Config, "COALESCE_WINDOW", 1)
+    sent = []
+    bot = _bot(sent)
+    now = int(time.time())
+    once = ScheduleJobDao.create_job("room1", now, "开会")
+    daily = ScheduleJobDao.create_job("room1", now, "喝水", "daily")
+    _fire_coalesced(bot, [once, daily])
+
+    # 合并为一条消息发送, 每个任务仍单独记录及续期
+    assert len(sent) == 1
+    assert "共有2条提醒" in sent[0] and "开会" in sent[0] and "喝水" in sent[0]
+    for job in (once, daily):
+        records = TableScheduleRecord.select().where(
+            TableScheduleRecord.job_real_id == job.id
+        )
+        assert records.count() == 1
+    assert TableScheduleJob.get_by_id(once.id).state == JobState.done
+    renewed = TableScheduleJob.get_by_id(daily.id)
+    assert renewed.state == JobState.ready and renewed.next_run_time > now
+    assert bot.scheduler.lateness.count == 2
+
+
+def test_coalesced_split(memory_db, monkeypatch):
+    monkeypatch.setattr(main.Config, "COALESCE_WINDOW", 1)
+    monkeypatch.setattr(main.Config, "MESSAGE_MAX_LEN", 80)
+    sent = []
+    bot = _bot(sent)
+    now = int(time.time())
+    jobs = [ScheduleJobDao.create_job("room1", now, f"任务{i}") for i in range(5)]
+    _fire_coalesced(bot, jobs)
+
+    # 超过消息长度上限时拆分为多条, 按顺序发送
+    assert len(sent) > 1 and all(len(msg) <= 80 for msg in sent)
+    text = "".join(sent)
+    assert [text.index(f"任务{i}") for i in range(5)] == sorted(
+        text.index(f"任务{i}") for i in range(5)
+    )
+
+
+def test_login_starts_tasks_once(memory_db, monkeypatch):
+    started = []
+
+    async def no_sleep(delay):
+        pass
+
+    def fake_task(name):
+        async def run():
+            started.append(name)
+
+        return run
+
+    def start_metrics():
+        started.append("metrics")
+        return []
+
+    monkeypatch.setattr(main.asyncio, "sleep", no_sleep)
+    monkeypatch.setattr(main, "start_metrics", start_metrics)
+    bot = _bot([])
+    for name in ("_run_schedule_task", "_run_archive_task", "_run_snapshot_task"):
+        monkeypatch.setattr(bot, name, fake_task(name))
+
+    async def run():
+        # 重新登录时不重复启动后台任务
+        await bot.on_login(None)
+        await bot.on_login(None)
+        await asyncio.gather(*bot._tasks)
+
+    asyncio.run(run())
+    assert sorted(started) == [
+        "_run_archive_task",
+        "_run_schedule_task",
+        "_run_snapshot_task",
+        "metrics",
+    ]
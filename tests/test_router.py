@@ -0,0 +1,147 @@
+import asyncio
+from functools import partial
+
+import pytest
+
+import main
+
+from dao import ScheduleJobDao
+from listing import get_job_page, render_job_page
+from main import ReminderBot
+from router import Arg, CommandRouter
+from utils import Decorator
+
+r_test = Decorator(sign="__test_command__")
+
+
+class Handlers:
+    def __init__(self):
+        self.calls = []
+
+    @r_test("all tasks", aliases=("ALL",))
+    async def all_tasks(self, *, room):
+        self.calls.append(("all tasks", room))
+
+    @r_test(args=(Arg("任务ID", int), Arg("内容", required=False, variadic=True)))
+    def update(self, job_id, *msgs, room):
+        self.calls.append(("update", job_id, msgs))
+
+
+def test_route_and_parse_args():
+    handlers = Handlers()
+    router = CommandRouter(handlers, r_test)
+    assert list(router.commands) == ["all tasks", "update"]
+    assert not router.is_command("吃饭了吗") and router.is_command("  /all")
+
+    name, command, args = router.route("/ all   TASKS")
+    assert command is router.commands["all tasks"] and args == []
+    assert router.route("/all")[1] is command
+    assert router.route("/nothing,1")[:2] == ("nothing", None)
+
+    # 全角标点及数字在路由前转换
+    name, command, args = router.route("/update，１２，,吃饭， 喝水")
+    assert (name, args) == ("update", ["12", "", "吃饭", " 喝水"])
+    asyncio.run(command(args, room="room1"))
+    assert handlers.calls[-1] == ("update", 12, ("吃饭", " 喝水"))
+
+    with pytest.raises(AssertionError, match="任务ID不合法"):
+        asyncio.run(command(["abc"], room="room1"))
+    with pytest.raises(AssertionError, match="缺少任务ID"):
+        asyncio.run(command([], room="room1"))
+
+
+class _Payload:
+    topic = "room1"
+
+
+class FakeMessage:
+    def __init__(self, text):
+        self._text = text
+
+    def text(self):
+        return self._text
+
+    def room(self):
+        room = type("FakeRoom", (), {"payload": _Payload(), "room_id": "room1"})
+        return room()
+
+    def is_self(self):
+        return False
+
+
+def test_bot_commands(memory_db, monkeypatch):
+    bot = ReminderBot()
+    said = []
+
+    async def say(room, msg, priority=None):
+        said.append(msg)
+
+    monkeypatch.setattr(bot, "say", say)
+
+    async def run(*texts):
+        for text in texts:
+            await bot.on_message(FakeMessage(text))
+
+    asyncio.run(
+        run(
+            "吃饭了吗",
+            "/提醒,明天上午11点,吃东西",
+            "/all",
+            "/cancel,1,x",
+            "/取消,1",
+            "/history,0",
+            "/history,51",
+            "/help,取消",
+            "/nothing",
+        )
+    )
+    assert len(said) == 8
+    assert said[0].startswith("任务已创建") and "内容:吃东西" in said[0]
+    assert said[1].startswith("当前共有1条任务")
+    assert "任务ID不合法: x" in said[2]
+    assert said[3].startswith("ID:1, 任务已取消")
+    assert "条数不合法" in said[4]
+    assert "最多查看50条" in said[5]
+    assert "/cancel,id" in said[6] and "别名: 取消" in said[6]
+    assert said[7].startswith("无此命令: nothing")
+
+
+def test_all_tasks_pages(memory_db, monkeypatch):
+    bot = ReminderBot()
+    said = []
+
+    async def say(room, msg, priority=None):
+        said.append(msg)
+
+    monkeypatch.setattr(bot, "say", say)
+    monkeypatch.setattr(main, "get_job_page", partial(get_job_page, page_size=10))
+    monkeypatch.setattr(main, "render_job_page", partial(render_job_page, limit=60))
+    ScheduleJobDao.create_jobs(
+        [("room1", 1625641200 + i, f"任务{i}", None) for i in range(25)]
+    )
+
+    asyncio.run(bot.on_message(FakeMessage("/all tasks,2")))
+    text = "".join(said)
+    assert all(len(msg) <= 60 for msg in said) and len(said) > 1
+    assert "(第2/3页)" in text and "任务10\n" in text and "任务19\n" in text
+    assert "任务9\n" not in text and "任务20" not in text
+    assert text.endswith("输入 /all tasks,3 查看下一页\n")
+
+
+def test_cancel_list_hint(memory_db, monkeypatch):
+    bot = ReminderBot()
+    said = []
+
+    async def say(room, msg, priority=None):
+        said.append(msg)
+
+    monkeypatch.setattr(bot, "say", say)
+    monkeypatch.setattr(main, "get_job_page", partial(get_job_page, page_size=10))
+    ScheduleJobDao.create_jobs(
+        [("room1", 1625641200 + i, f"任务{i}", None) for i in range(25)]
+    )
+
+    asyncio.run(bot.on_message(FakeMessage("/cancel,1")))
+    text = "".join(said)
+    assert "1. ID:2\n" in text
+    assert "/all tasks" not in text and text.endswith("还有14条任务未列出\n")
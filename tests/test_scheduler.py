@@ -0,0 +1,95 @@
+import asyncio
+import functools
+import time
+from collections import defaultdict
+
+from actors import RoomActors
+from dao import ScheduleJobDao
+from scheduler import PollingScheduler
+
+
+def test_collect_due_jobs(memory_db):
+    now = 1625641200
+    ScheduleJobDao.create_job("room1", now, "准时")
+    ScheduleJobDao.create_job("room1", now - 60, "超时")
+    ScheduleJobDao.create_job("room1", now + 30, "窗口内")
+    ScheduleJobDao.create_job("room2", now + 30, "其他群聊窗口内")
+    ScheduleJobDao.create_job("room1", now + 120, "窗口外")
+
+    scheduler = PollingScheduler(None, grace=5, coalesce_window=0)
+    due_jobs = scheduler.collect_due_jobs(now + 0.5)
+    assert [(job.remind_msg, overdue) for job, overdue in due_jobs["room1"]] == [
+        ("超时", True),
+        ("准时", False),
+    ]
+
+    scheduler.coalesce_window = 60
+    due_jobs = scheduler.collect_due_jobs(now + 0.5)
+    assert list(due_jobs) == ["room1"]
+    assert [job.remind_msg for job, _ in due_jobs["room1"]] == [
+        "超时",
+        "准时",
+        "窗口内",
+    ]
+
+
+def test_fire_on_deadline(memory_db):
+    fired = []
+
+    async def fire(room, jobs):
+        for job, overdue in jobs:
+            fired.append((time.time() - job.next_run_time, overdue))
+            ScheduleJobDao.job_done(job.job_id, job.room)
+
+    async def run():
+        scheduler = PollingScheduler(fire, resync_interval=5)
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.1)
+        job = ScheduleJobDao.create_job("room1", int(time.time()) + 1, "吃东西")
+        scheduler.notify(job)
+        await asyncio.sleep(1.3)
+        task.cancel()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert len(fired) == 1
+    lateness, overdue = fired[0]
+    assert 0 <= lateness < 0.1 and not overdue, lateness
+    assert scheduler.collect_lateness.count == 1
+
+
+def test_busy_room_does_not_delay_others(memory_db):
+    fired = defaultdict(list)
+
+    async def remind(room, jobs):
+        for job, overdue in jobs:
+            fired[room].append((time.time() - job.next_run_time, overdue))
+            ScheduleJobDao.job_done(job.job_id, job.room)
+
+    async def run():
+        actors = RoomActors(idle_timeout=10, max_queue=10)
+        scheduler = PollingScheduler(
+            lambda room, jobs: actors.submit(
+                room, functools.partial(remind, room, jobs)
+            ),
+            grace=1,
+            coalesce_window=0,
+        )
+        task = asyncio.create_task(scheduler.run())
+        # roomA 的执行者正在处理耗时超过重试间隔的命令, 期间 roomA 及 roomB 的提醒依次到期
+        actors.submit("roomA", functools.partial(asyncio.sleep, 2.5))
+        due = int(time.time()) + 1
+        for room, next_run_time in (("roomA", due), ("roomB", due + 1)):
+            scheduler.notify(ScheduleJobDao.create_job(room, next_run_time, "开会"))
+        await asyncio.sleep(due + 1.2 - time.time())
+        roomb_done = list(fired["roomB"])
+        await asyncio.sleep(1.5)
+        task.cancel()
+        await actors.close()
+        return roomb_done
+
+    roomb_done = asyncio.run(run())
+    ((lateness, overdue),) = roomb_done
+    assert 0 <= lateness < 0.1 and not overdue, lateness
+    # 排队中的任务不会重复触发
+    assert len(fired["roomA"]) == 1 and fired["roomA"][0][0] >= 1
@@ -0,0 +1,81 @@
+import sqlite3
+
+import storage
+from dao import ScheduleJobDao
+from main import ReminderBot
+from models import TableJobSearch, TableScheduleJob, create_search_index
+from search import match_query, tokenize
+
+
+def test_tokenize():
+    assert tokenize("明天交周报, Meeting 3pm") == "明天 天交 交周 周报 报 meeting 3pm"
+    assert tokenize("喝") == "喝"
+    assert tokenize("") == ""
+    assert match_query("交周报 meet 喝") == '"交周 周报" AND "meet"* AND "喝"*'
+    assert match_query(", !") is None
+
+
+def _search(keyword: str) -> set:
+    return {
+        row.rowid
+        for row in TableJobSearch.select(TableJobSearch.rowid).where(
+            TableJobSearch.match(match_query(keyword))
+        )
+    }
+
+
+def test_search_index_sync(memory_db):
+    job = ScheduleJobDao.create_job("room1", 1625641200, "交周报")
+    assert _search("周报") == {job.id}
+
+    # 修改内容时由存储层同步, 删除任务(如归档)时由触发器同步
+    ScheduleJobDao.update_job(job.job_id, "room1", remind_msg="开周会")
+    assert _search("周报") == set() and _search("周会") == {job.id}
+    TableScheduleJob.delete().where(TableScheduleJob.id == job.id).execute()
+    assert _search("周会") == set()
+
+    # 首次创建索引时为已有的任务建立索引
+    other = ScheduleJobDao.create_job("room1", 1625641200, "写日报")
+    TableJobSearch.drop_table()
+    create_search_index()
+    assert _search("日报") == {other.id}
+
+
+def test_raw_connection_writes(file_db):
+    # 没有注册分词函数的连接(如 sqlite3 命令行)也可以写任务表
+    job = ScheduleJobDao.create_job("room1", 1625641200, "交周报")
+    other = ScheduleJobDao.create_job("room1", 1625641200, "写日报")
+
+    conn = sqlite3.connect(file_db.database)
+    with conn:
+        conn.execute(
+            "INSERT INTO tableschedulejob (id, job_id, room, name, start_time, "
+            "next_run_time, state, remind_msg) "
+            "VALUES (100, 3, 'room1', 'raw', 0, 1625641200, 0, '开周会')"
+        )
+        conn.execute(
+            "UPDATE tableschedulejob SET remind_msg = '订会议室' WHERE id = ?",
+            (job.id,),
+        )
+        conn.execute("DELETE FROM tableschedulejob WHERE id = ?", (other.id,))
+    conn.close()
+    # 修改及删除的任务不会搜到过期的内容
+    assert _search("周报") == set() and _search("日报") == set()
+
+    # 启动时为其他连接写入的任务补建索引
+    create_search_index()
+    assert _search("周会") == {100} and _search("会议") == {job.id}
+
+
+def test_renewal_keeps_index(memory_db, monkeypatch):
+    job = ScheduleJobDao.create_job("room1", 1625641200, "交周报", "weekly")
+    reindexed = []
+    monkeypatch.setattr(storage, "index_jobs", reindexed.append)
+
+    # 续期只修改执行时间, 内容未变时既不重建索引, 触发器也不删除索引
+    ReminderBot._renew_job("room1", job.job_id, "weekly", job.next_run_time)
+    ScheduleJobDao.update_job(job.job_id, "room1", remind_msg="交周报")
+    assert not reindexed and _search("周报") == {job.id}
+
+    ScheduleJobDao.update_job(job.job_id, "room1", remind_msg="开周会")
+    assert reindexed == [[(job.id, "开周会")]]
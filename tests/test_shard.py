@@ -0,0 +1,63 @@
+import queue
+
+from dao import ScheduleJobDao
+from models import room_partition
+from shard import ShardWorker
+
+
+class FakeEvent:
+    def wait(self, timeout):
+        return False
+
+
+def test_lease_takeover(memory_db):
+    workers = [
+        ShardWorker(i, 2, 4, queue.Queue(), FakeEvent(), lease_ttl=10) for i in range(2)
+    ]
+    now = 1000
+    # 无主的分区先被接管, 负责的进程启动后收回
+    workers[0].refresh_leases(now)
+    assert workers[0].owned == {0, 1, 2, 3}
+    workers[1].refresh_leases(now)
+    workers[0].refresh_leases(now + 1)
+    assert workers[0].owned == {0, 2} and workers[1].owned == {1, 3}
+
+    # worker-1 崩溃, 租约过期一个租期后由 worker-0 接管
+    workers[0].refresh_leases(now + 16)
+    assert workers[0].owned == {0, 2}
+    workers[0].refresh_leases(now + 26)
+    assert workers[0].owned == {0, 1, 2, 3}
+
+    # worker-1 重启后收回自己负责的分区
+    workers[1].refresh_leases(now + 30)
+    workers[0].refresh_leases(now + 31)
+    assert workers[0].owned == {0, 2} and workers[1].owned == {1, 3}
+
+
+def test_dispatch_by_partition(memory_db):
+    now = 1625641200
+    rooms = [f"room{i}" for i in range(20)]
+    jobs = {room: ScheduleJobDao.create_job(room, now - 1, "到期") for room in rooms}
+    later = ScheduleJobDao.create_job(rooms[0], now + 60, "稍后")
+
+    job_queue = queue.Queue()
+    worker = ShardWorker(0, 2, 4, job_queue, FakeEvent(), resync_interval=5)
+    ShardWorker(1, 2, 4, queue.Queue(), FakeEvent()).refresh_leases(now)
+    worker.refresh_leases(now)
+    next_run_time = worker.dispatch(now)
+
+    dispatched = set()
+    while not job_queue.empty():
+        dispatched.add(job_queue.get())
+    expected = {
+        job.id for room, job in jobs.items() if room_partition(room, 4) in {0, 2}
+    }
+    assert dispatched == expected
+    if room_partition(rooms[0], 4) in {0, 2}:
+        assert next_run_time == later.next_run_time
+
+    # 未续期的任务不立即重复发送
+    worker.dispatch(now + 1)
+    assert job_queue.empty()
+    worker.dispatch(now + 6)
+    assert job_queue.qsize() == len(expected)
@@ -0,0 +1,72 @@
+import pytest
+
+from dao import ScheduleJobDao
+from snapshot import Snapshot, load_snapshot, write_snapshot
+from timing_wheel import WheelScheduler
+
+NOW = 1625641200
+
+
+def test_snapshot_roundtrip(tmp_path):
+    path = str(tmp_path / "scheduler.snap")
+    jobs = [(NOW + i // 2, i + 1, f"room{i % 3}") for i in range(100)]
+    assert write_snapshot(path, iter(jobs), NOW) == 100
+
+    with Snapshot(path) as snapshot:
+        assert snapshot.checkpoint_time == NOW and len(snapshot) == 100
+        assert [tuple(entry) for entry in snapshot] == jobs
+        assert list(snapshot.iter_job_times(NOW + 2)) == [
+            (real_id, next_run_time)
+            for next_run_time, real_id, _ in jobs
+            if next_run_time <= NOW + 2
+        ]
+        assert list(snapshot.iter_job_times(NOW - 1)) == []
+
+    # 空快照
+    write_snapshot(path, [], NOW)
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 0 and list(snapshot.iter_job_times(NOW)) == []
+
+
+def test_load_broken_snapshot(tmp_path):
+    path = tmp_path / "scheduler.snap"
+    assert load_snapshot(str(path)) is None
+    write_snapshot(str(path), [(NOW, 1, "room1")], NOW)
+    data = path.read_bytes()
+    path.write_bytes(data[:30])
+    assert load_snapshot(str(path)) is None
+    path.write_bytes(b"XXXX" + data[4:])
+    assert load_snapshot(str(path)) is None
+    path.write_bytes(b"")
+    assert load_snapshot(str(path)) is None
+
+
+def test_wheel_scheduler_warm_restart(memory_db, tmp_path, monkeypatch):
+    clock = [NOW]
+    monkeypatch.setattr("time.time", lambda: clock[0])
+    path = str(tmp_path / "scheduler.snap")
+    soon = ScheduleJobDao.create_job("room1", NOW + 10, "稍后")
+    moved = ScheduleJobDao.create_job("room1", NOW + 20, "改时间")
+    cancelled = ScheduleJobDao.create_job("room2", NOW + 30, "取消")
+    ScheduleJobDao.create_job("room2", NOW + 7200, "窗口外")
+    scheduler = WheelScheduler(None, window=3600, grace=5, snapshot_path=path)
+    assert scheduler.checkpoint() == 4
+
+    # 快照之后的修改
+    clock[0] = NOW + 60
+    ScheduleJobDao.update_job(moved.job_id, "room1", next_run_time=NOW + 40)
+    ScheduleJobDao.cancel_jobs(cancelled.job_id, room="room2")
+    new = ScheduleJobDao.create_job("room2", NOW + 50, "新任务")
+
+    def full_scan(*args, **kwargs):
+        pytest.fail("从快照恢复时不应扫描整个任务表")
+
+    monkeypatch.setattr(ScheduleJobDao, "iter_job_times", full_scan)
+    restarted = WheelScheduler(None, window=3600, grace=5, snapshot_path=path)
+    fired = []
+    for now in range(NOW, NOW + 61):
+        for jobs in restarted.collect_due_jobs(now).values():
+            for job, _ in jobs:
+                fired.append((job.id, now))
+                ScheduleJobDao.job_done(job.job_id, job.room)
+    assert fired == [(soon.id, NOW + 10), (moved.id, NOW + 40), (new.id, NOW + 50)]
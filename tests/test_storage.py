@@ -0,0 +1,162 @@
+from dao import ScheduleJobDao, ScheduleRecordDao
+from models import room_partition
+from storage import LogStorage
+from typevar import JobState
+
+NOW = 1625641200
+
+
+def test_job_lifecycle(storage):
+    first = ScheduleJobDao.create_job("room1", NOW + 60, "喝水", "daily")
+    second = ScheduleJobDao.create_job("room1", NOW + 30, "开会")
+    other = ScheduleJobDao.create_job("room2", NOW + 90, "交周报")
+    assert (first.job_id, second.job_id, other.job_id) == (1, 2, 1)
+    assert len({first.id, second.id, other.id}) == 3
+    assert first.anchor_time == NOW + 60 and second.anchor_time is None
+    assert ScheduleJobDao.get_new_id("room1") == 3
+
+    count, jobs = ScheduleJobDao.get_all_jobs("room1")
+    assert count == 2 and [job.job_id for job in jobs] == [2, 1]
+    assert ScheduleJobDao.get_all_jobs()[0] == 3
+
+    assert ScheduleJobDao.update_job(1, "room1", remind_msg="多喝水") == 1
+    assert ScheduleJobDao.update_job(9, "room1", remind_msg="不存在") == 0
+    job = ScheduleJobDao.get_job(1, "room1")
+    assert (job.remind_msg, job.next_run_time) == ("多喝水", NOW + 60)
+
+    assert ScheduleJobDao.job_done(2, "room1") == 1
+    assert ScheduleJobDao.get_job(2, "room1") is None
+    assert ScheduleJobDao.get_job(2, "room1", JobState.done).remind_msg == "开会"
+    assert ScheduleJobDao.cancel_jobs(1, 9, room="room1") == 1
+    assert ScheduleJobDao.get_all_jobs("room1")[0] == 0
+    assert ScheduleJobDao.get_all_jobs("room1", state=None)[0] == 2
+    # 已完成的任务编号不复用
+    assert ScheduleJobDao.create_job("room1", NOW, "新任务").job_id == 3
+
+
+def test_due_jobs(storage):
+    jobs = [
+        ScheduleJobDao.create_job(f"room{i % 3}", NOW + i, f"{i}") for i in range(9)
+    ]
+    ScheduleJobDao.job_done(jobs[1].job_id, jobs[1].room)
+
+    due = ScheduleJobDao.get_due_jobs(NOW + 4)
+    assert [job.id for job in due] == [jobs[i].id for i in (0, 2, 3, 4)]
+    due = ScheduleJobDao.get_due_jobs(NOW + 4, rooms={"room0"})
+    assert [job.id for job in due] == [jobs[0].id, jobs[3].id]
+    overdue = ScheduleJobDao.get_overdue_jobs(NOW + 3.5)
+    assert [job.id for job in overdue] == [jobs[i].id for i in (0, 2)]
+
+    by_ids = ScheduleJobDao.get_jobs_by_ids([jobs[5].id, jobs[1].id, jobs[0].id])
+    assert [job.id for job in by_ids] == [jobs[0].id, jobs[5].id]
+
+    times = list(ScheduleJobDao.iter_job_times(NOW + 6, after=NOW + 2))
+    assert sorted(times) == [(jobs[i].id, NOW + i) for i in (3, 4, 5, 6)]
+    assert ScheduleJobDao.get_next_run_time(NOW + 1) == NOW + 2
+    assert ScheduleJobDao.get_next_run_time(NOW + 8) is None
+
+    partitions = {room_partition("room2", 4)}
+    times = list(ScheduleJobDao.iter_job_times(NOW + 8, None, partitions, 4))
+    expected = [job for job in jobs if room_partition(job.room, 4) in partitions]
+    assert sorted(times) == [(job.id, job.next_run_time) for job in expected]
+    assert ScheduleJobDao.get_next_run_time(NOW, partitions, 4) == min(
+        job.next_run_time for job in expected if job.next_run_time > NOW
+    )
+
+
+def test_settle_jobs(storage):
+    once = ScheduleJobDao.create_job("room1", NOW, "交周报")
+    daily = ScheduleJobDao.create_job("room1", NOW, "吃药", "daily")
+    ScheduleJobDao.settle_jobs(
+        [once.id], {daily.id: NOW + 86400}, [(once.id, "交周报"), (daily.id, "吃药")]
+    )
+    assert ScheduleJobDao.get_job(once.job_id, "room1", JobState.done)
+    assert ScheduleJobDao.get_job(daily.job_id, "room1").next_run_time == NOW + 86400
+    assert ScheduleJobDao.get_due_jobs(NOW) == []
+
+    ScheduleRecordDao.create_record(daily.id, "又吃药")
+    records = ScheduleRecordDao.get_records(daily.id)
+    assert [r.remind_msg for r in records] == ["吃药", "又吃药"]
+    assert records[0].id < records[1].id and records[0].create_time
+
+
+def test_log_storage_replay(tmp_path):
+    path = str(tmp_path / "jobs.log")
+    storage = LogStorage(path)
+    storage.COMPACT_MIN = 5
+    for i in range(10):
+        job = storage.create_job(
+            room="room1",
+            job_id=i + 1,
+            name=f"{i}",
+            next_run_time=NOW + i,
+            remind_msg=f"{i}",
+        )
+        storage.update_job(job.job_id, "room1", {"next_run_time": NOW + 100 + i})
+    storage.settle_jobs([1], {2: NOW}, [(1, "完成")])
+    storage.close()
+    # 写入中途退出留下的不完整的行
+    with open(path, "a") as f:
+        f.write('[[{"id": 99')
+
+    replayed = LogStorage(path)
+    assert replayed.get_job(1, "room1", JobState.done).next_run_time == NOW + 100
+    assert [job.id for job in replayed.get_due_jobs(NOW + 102, None)] == [2, 3]
+    assert [r.remind_msg for r in replayed.get_records(1)] == ["完成"]
+    assert (
+        replayed.create_job(
+            room="room2", job_id=1, name="x", next_run_time=NOW, remind_msg="x"
+        ).id
+        == 11
+    )
+    replayed.close()
+
+
+def test_room_records(storage):
+    jobs = [ScheduleJobDao.create_job(f"room{i % 2}", NOW, f"{i}") for i in range(4)]
+    ScheduleJobDao.settle_jobs([], {}, [(job.id, job.remind_msg) for job in jobs])
+    ScheduleRecordDao.create_record(jobs[0].id, "again")
+    records = ScheduleRecordDao.get_room_records("room0", 2)
+    assert [(r.job_id, r.remind_msg) for r in records] == [(1, "again"), (2, "2")]
+    assert ScheduleRecordDao.get_room_records("room2", 2) == []
+
+
+def test_create_jobs(storage):
+    ScheduleJobDao.create_job("room1", NOW, "已有任务")
+    rows = [
+        (f"room{i % 2}", NOW + i, f"{i}", "daily" if i % 3 else None) for i in range(5)
+    ]
+    assert ScheduleJobDao.create_jobs(rows) == 5
+    jobs = list(ScheduleJobDao.iter_jobs("room1"))
+    assert [(job.job_id, job.remind_msg) for job in jobs] == [
+        (1, "已有任务"),
+        (2, "1"),
+        (3, "3"),
+    ]
+    assert jobs[1].anchor_time == NOW + 1 and jobs[2].anchor_time is None
+    assert jobs[1].start_time and jobs[1].state == 0
+    assert ScheduleJobDao.create_job("room0", NOW, "新任务").job_id == 4
+    assert len({job.id for job in ScheduleJobDao.iter_jobs()}) == 7
+
+
+def test_changed_jobs(storage, monkeypatch):
+    clock = [NOW]
+    monkeypatch.setattr("time.time", lambda: clock[0])
+    jobs = [ScheduleJobDao.create_job("room1", NOW + i, f"{i}") for i in range(4)]
+    other = ScheduleJobDao.create_job("room2", NOW + 1, "其他群聊")
+    assert list(ScheduleJobDao.iter_pending_jobs()) == [
+        (NOW, jobs[0].id, "room1"),
+        (NOW + 1, jobs[1].id, "room1"),
+        (NOW + 1, other.id, "room2"),
+        (NOW + 2, jobs[2].id, "room1"),
+        (NOW + 3, jobs[3].id, "room1"),
+    ]
+
+    clock[0] = NOW + 10
+    ScheduleJobDao.update_job(jobs[0].job_id, "room1", next_run_time=NOW + 5)
+    ScheduleJobDao.cancel_jobs(jobs[1].job_id, room="room1")
+    ScheduleJobDao.settle_jobs([], {jobs[2].id: NOW + 100}, [])
+    new = ScheduleJobDao.create_job("room1", NOW + 4, "新任务")
+    changed = ScheduleJobDao.iter_changed_job_times(NOW + 10, NOW + 50)
+    assert sorted(changed) == sorted([(jobs[0].id, NOW + 5), (new.id, NOW + 4)])
+    assert list(ScheduleJobDao.iter_changed_job_times(NOW + 11, NOW + 200)) == []
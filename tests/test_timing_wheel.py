@@ -0,0 +1,97 @@
+import random
+
+from dao import ScheduleJobDao
+from timing_wheel import TimingWheel, WheelScheduler
+
+
+def test_timing_wheel():
+    rnd = random.Random(0)
+    start = 1625641200
+    wheel = TimingWheel(start, slots=8, levels=4)
+    expires = {i: start + rnd.randrange(-5, 8**4) for i in range(2000)}
+    for item, expire in expires.items():
+        assert wheel.add(item, expire)
+    assert not wheel.add(-1, start + 8**4), "超出时间轮范围"
+    assert len(wheel) == len(expires)
+
+    now = start
+    fired = {}
+    while len(wheel):
+        next_expiry = wheel.next_expiry()
+        assert next_expiry >= now
+        # 随机多推进一段时间, 模拟睡眠不精确
+        prev, now = now, max(next_expiry, now + rnd.choice([0, 0, 1, 3, 17]))
+        for item in wheel.advance(now):
+            fired[item] = (prev, now)
+    assert fired.keys() == expires.keys()
+    for item, expire in expires.items():
+        prev, now = fired[item]
+        # 在第一次推进到到期时间之后时触发
+        assert expire <= now and (prev < expire or expire <= start)
+
+
+def test_wheel_scheduler(memory_db):
+    now = 1625641200
+    soon = ScheduleJobDao.create_job("room1", now + 10, "稍后")
+    ScheduleJobDao.create_job("room1", now + 7200, "窗口外")
+    overdue = ScheduleJobDao.create_job("room2", now - 60, "超时")
+
+    scheduler = WheelScheduler(None, window=3600, grace=5, coalesce_window=0)
+    due_jobs = scheduler.collect_due_jobs(now)
+    assert [(job.id, overdue) for job, overdue in due_jobs["room2"]] == [
+        (overdue.id, True)
+    ]
+    ScheduleJobDao.job_done(overdue.job_id, "room2")
+    assert len(scheduler._wheel) == 1, "只加载窗口内的任务"
+    assert scheduler._next_deadline(now) == now + 10
+
+    # 任务修改后以数据库为准
+    ScheduleJobDao.update_job(soon.job_id, "room1", next_run_time=now + 20)
+    scheduler.notify(ScheduleJobDao.get_job(soon.job_id, "room1"))
+    assert not scheduler.collect_due_jobs(now + 10)
+    assert [job.id for job, _ in scheduler.collect_due_jobs(now + 20)["room1"]] == [
+        soon.id
+    ]
+
+    # 超过半个窗口后加载后续的任务
+    due_jobs = scheduler.collect_due_jobs(now + 7200)
+    assert [job.remind_msg for job, _ in due_jobs["room1"]] == ["稍后", "窗口外"]
+
+
+def _fire_due(scheduler: WheelScheduler, now: int) -> list:
+    """-> 到期任务的内容, 并标记为已完成"""
+    jobs = [job for jobs in scheduler.collect_due_jobs(now).values() for job, _ in jobs]
+    for job in jobs:
+        ScheduleJobDao.job_done(job.job_id, job.room)
+    return [job.remind_msg for job in jobs]
+
+
+def test_wheel_incremental_reload(memory_db, monkeypatch):
+    now = 1625641200
+    ScheduleJobDao.create_job("room1", now + 100, "窗口内")
+    scheduler = WheelScheduler(None, window=3600, coalesce_window=0, snapshot_path="")
+    assert not scheduler.collect_due_jobs(now)
+    wheel = scheduler._wheel
+
+    loads = []
+    iter_job_times = ScheduleJobDao.iter_job_times
+
+    def spy(before, after=None, **kwargs):
+        loads.append((before, after))
+        return iter_job_times(before, after, **kwargs)
+
+    monkeypatch.setattr(ScheduleJobDao, "iter_job_times", spy)
+    # 其他进程写入且未通知调度的任务, 在已加载的范围内时按修改时间补充
+    ScheduleJobDao.create_job("room1", now + 2000, "导入")
+    ScheduleJobDao.create_job("room1", now + 4000, "后续")
+
+    # 超过半个窗口后只加载新进入窗口的任务, 不重建时间轮
+    assert _fire_due(scheduler, now + 1800) == ["窗口内"]
+    assert scheduler._wheel is wheel and loads == [(now + 5400, now + 3600)]
+    assert _fire_due(scheduler, now + 2000) == ["导入"]
+    assert _fire_due(scheduler, now + 4000) == ["后续"]
+
+    # 系统时间跳变后重建时间轮
+    scheduler._resync()
+    scheduler.collect_due_jobs(now + 100)
+    assert scheduler._wheel is not wheel and loads[-1] == (now + 3700, None)
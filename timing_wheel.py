@@ -0,0 +1,233 @@
+"""分层时间轮调度
+
+适用于任务量非常大的部署: 内存中只保存近期(window秒内)到期的任务ID,
+更远的任务留在数据库中, 随时间推进按 next_run_time 分段加载到时间轮.
+生效中任务的索引定期写入快照, 重启后首次加载时从快照及快照之后修改过的任务恢复,
+不需要扫描整个任务表.
+"""
+
+import itertools
+import time
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+from dao import ScheduleJobDao
+from logger import logger
+from models import TableScheduleJob
+from scheduler import BaseScheduler, DueJobs
+from settings import Config
+from snapshot import Snapshot, load_snapshot, write_snapshot
+
+T = TypeVar("T")
+
+
+class TimingWheel(Generic[T]):
+    """分层时间轮, 精度为1秒
+    每层 slots 个槽, 第 n 层每个槽的跨度为 slots**n 秒, 可容纳 slots**levels 秒内到期的项.
+    高层的槽到期时, 其中的项重新分配到低层.
+    """
+
+    def __init__(self, now: int, slots: int = 64, levels: int = 4):
+        self.slots = slots
+        self.levels = levels
+        self.current = now
+        self.horizon = slots**levels
+        self._spans = [slots**level for level in range(levels)]
+        self._wheels: List[List[List[Tuple[int, T]]]] = [
+            [[] for _ in range(slots)] for _ in range(levels)
+        ]
+        self._expired: List[Tuple[int, T]] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, item: T, expire: int) -> bool:
+        """加入时间轮, 超出时间轮范围时返回 False"""
+        delta = expire - self.current
+        if delta >= self.horizon:
+            return False
+        self._size += 1
+        if delta <= 0:
+            self._expired.append((expire, item))
+            return True
+        for level, span in enumerate(self._spans):
+            if delta < span * self.slots:
+                self._wheels[level][(expire // span) % self.slots].append(
+                    (expire, item)
+                )
+                return True
+
+    def _cascade(self, level: int, index: int):
+        entries = self._wheels[level][index]
+        if not entries:
+            return
+        self._wheels[level][index] = []
+        self._size -= len(entries)
+        for expire, item in entries:
+            self.add(item, expire)
+
+    def advance(self, now: int) -> List[T]:
+        """推进到 now, 返回期间到期的项"""
+        if not self._size:
+            self.current = max(self.current, now)
+            return []
+
+        while self.current < now:
+            self.current += 1
+            tick = self.current
+            for level in range(self.levels - 1, 0, -1):
+                span = self._spans[level]
+                if tick % span == 0:
+                    self._cascade(level, (tick // span) % self.slots)
+            index = tick % self.slots
+            if self._wheels[0][index]:
+                self._expired.extend(self._wheels[0][index])
+                self._wheels[0][index] = []
+
+        due = [item for _, item in self._expired]
+        self._size -= len(due)
+        self._expired = []
+        return due
+
+    def next_expiry(self) -> Optional[int]:
+        """下一次需要推进的时间(某项到期或高层的槽需要重新分配)"""
+        if self._expired:
+            return self.current
+        if not self._size:
+            return None
+
+        for offset in range(1, self.slots + 1):
+            if self._wheels[0][(self.current + offset) % self.slots]:
+                return self.current + offset
+        ret = None
+        for level in range(1, self.levels):
+            span = self._spans[level]
+            base = self.current // span + 1
+            for index, entries in enumerate(self._wheels[level]):
+                if entries:
+                    tick = (base + (index - base) % self.slots) * span
+                    ret = tick if ret is None else min(ret, tick)
+        return ret
+
+
+class WheelScheduler(BaseScheduler):
+    """时间轮调度, 与 PollingScheduler 可通过配置 SCHEDULER 切换"""
+
+    def __init__(
+        self,
+        *args,
+        window: int = Config.WHEEL_WINDOW,
+        snapshot_path: str = Config.SNAPSHOT_PATH,
+        **kwargs,
+    ):
+        """
+        :param window: 时间轮中保存多少秒内到期的任务, 消耗一半后重新加载
+        :param snapshot_path: 任务索引快照, 为空不使用快照
+        """
+        super().__init__(*args, **kwargs)
+        self.window = window
+        self.snapshot_path = snapshot_path
+        self._wheel: Optional[TimingWheel[int]] = None
+        self._loaded_until: Optional[int] = None
+        # 上次加载的系统时间, 与任务的 update_time 比较
+        self._loaded_at: Optional[int] = None
+        self._rebuild = True
+
+    @property
+    def checkpoint_enabled(self) -> bool:
+        return bool(self.snapshot_path)
+
+    def checkpoint(self) -> int:
+        # 与任务的 update_time 一样使用系统时间, 读取期间修改的任务在加载时从数据库补充
+        checkpoint_time = int(time.time())
+        return write_snapshot(
+            self.snapshot_path, ScheduleJobDao.iter_pending_jobs(), checkpoint_time
+        )
+
+    def _iter_job_times(
+        self, snapshot: Optional[Snapshot]
+    ) -> Iterable[Tuple[int, int]]:
+        if snapshot is None:
+            return ScheduleJobDao.iter_job_times(self._loaded_until)
+        # 快照中可能有已修改或取消的任务, 触发前以数据库为准
+        return itertools.chain(
+            snapshot.iter_job_times(self._loaded_until),
+            ScheduleJobDao.iter_changed_job_times(
+                snapshot.checkpoint_time, self._loaded_until
+            ),
+        )
+
+    def _load(self, now: int):
+        """加载 window 秒内到期(包括已经到期)的任务
+        首次加载及系统时间跳变后重建时间轮, 首次加载时优先从快照恢复;
+        之后保留时间轮, 只加载新进入窗口的任务, 以及上次加载后修改过的任务(如其他进程导入的)
+        """
+        loaded_at = int(time.time())
+        if not self._rebuild:
+            after, self._loaded_until = self._loaded_until, now + self.window
+            job_times = itertools.chain(
+                ScheduleJobDao.iter_job_times(self._loaded_until, after=after),
+                ScheduleJobDao.iter_changed_job_times(self._loaded_at, after),
+            )
+            for real_id, next_run_time in job_times:
+                self._wheel.add(real_id, next_run_time)
+            self._loaded_at = loaded_at
+            return
+
+        snapshot = load_snapshot(self.snapshot_path) if self._wheel is None else None
+        self._wheel = TimingWheel(now)
+        self._loaded_until = now + self.window
+        try:
+            for real_id, next_run_time in self._iter_job_times(snapshot):
+                self._wheel.add(real_id, next_run_time)
+        finally:
+            if snapshot is not None:
+                snapshot.close()
+        self._loaded_at = loaded_at
+        self._rebuild = False
+        if snapshot is not None:
+            logger.info("从快照恢复时间轮, %s 个任务", len(self._wheel))
+
+    def _reload_at(self) -> int:
+        return self._loaded_until - self.window // 2
+
+    def notify(self, job: TableScheduleJob = None):
+        if (
+            job is not None
+            and self._wheel is not None
+            and job.next_run_time <= self._loaded_until
+        ):
+            self._wheel.add(job.id, job.next_run_time)
+        super().notify(job)
+
+    def _resync(self):
+        # 时间轮的当前时间可能已超过回拨后的系统时间, 新任务会立即到期
+        self._rebuild = True
+
+    def collect_due_jobs(self, now: float) -> DueJobs:
+        if self._rebuild or now >= self._reload_at():
+            self._load(int(now))
+
+        real_ids: Dict[int, None] = dict.fromkeys(self._wheel.advance(int(now)))
+        real_ids.update(dict.fromkeys(self._retry_at))
+        if not real_ids:
+            return {}
+
+        # 时间轮中的任务可能已被修改或取消, 以数据库为准
+        candidates = ScheduleJobDao.get_jobs_by_ids(real_ids)
+        return self._group_due_jobs(self._expand_coalesced(candidates, now), now)
+
+    def _after_fire(self, due_jobs: DueJobs):
+        # 周期任务续期后, 下一次执行时间仍在已加载范围内的重新加入时间轮
+        real_ids = [job.id for jobs in due_jobs.values() for job, _ in jobs]
+        now = self._clock()
+        for job in ScheduleJobDao.get_jobs_by_ids(real_ids):
+            if job.next_run_time > now:
+                self.notify(job)
+
+    def _next_deadline(self, now: float) -> Optional[float]:
+        deadlines = [*self._retry_at.values(), self._reload_at()]
+        next_expiry = self._wheel.next_expiry()
+        if next_expiry is not None:
+            deadlines.append(next_expiry)
+        return min(deadlines)
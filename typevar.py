@@ -1,6 +1,4 @@
 from enum import IntEnum, unique, Enum
-from dateutil import relativedelta
-from datetime import date
 
 
 @unique
@@ -26,17 +24,18 @@ class JobScheduleType(Enum):
     def get_type(cls, j_type: str) -> "JobScheduleType":
         return {t.name: t for t in cls}.get(j_type)
 
-    def timestamp2now(self) -> int:
-        if self == JobScheduleType.daily:
-            diff_delta = relativedelta.relativedelta(days=1)
-        elif self == JobScheduleType.weekly:
-            diff_delta = relativedelta.relativedelta(weeks=1)
-        elif self == JobScheduleType.monthly:
-            diff_delta = relativedelta.relativedelta(months=1)
-        else:
-            diff_delta = relativedelta.relativedelta(years=1)
-
-        return ((date.today() + diff_delta) - date.today()).days * 24 * 60 * 60
+
+@unique
+class CatchupPolicy(Enum):
+    """停机期间错过的任务的补发策略"""
+
+    summary = "summary"  # 每个群聊汇总为一条消息
+    skip = "skip"  # 不提醒, 直接跳到下一次执行时间
+    replay = "replay"  # 每个任务单独提醒
+
+    @classmethod
+    def get_policy(cls, policy: str) -> "CatchupPolicy":
+        return {p.value: p for p in cls}.get(policy)
 
 
 if __name__ == '__main__':
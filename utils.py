@@ -8,11 +8,13 @@ from email.message import Message
 from email.mime.image import MIMEImage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import Optional, Union, Tuple
+from typing import Match, Optional, Union, Tuple
 
 import qrcode
 
+import recurrence
 from logger import logger
+from metrics import metrics
 from ner.dtime.dtime import ZHDatetimeExtractor
 from ner.number import ZHNumberExtractor
 from settings import Config
@@ -22,6 +24,22 @@ from typevar import JobScheduleType
 ScheduleRe = re.compile(
     r"每((?P<daily>天|一天|1天)|(?P<days>(.*)天)|(?P<weekly>周[1-6一二三四五六日天]?)|(?P<monthly>月|个月)|(?P<yearly>年|1年|一年))(?P<date>.*)"
 )
+# 复杂周期, 先于 ScheduleRe 匹配, date 为执行时刻
+WorkdayRe = re.compile(r"(每个?)?工作日(?P<date>.*)")
+MonthEndRe = re.compile(r"每个?月的?最后一天(?P<date>.*)")
+BiweeklyRe = re.compile(r"隔周(?P<weekday>[1-7一二三四五六日天])(?P<date>.*)")
+NthWeekdayRe = re.compile(
+    r"每个?月的?第?(?P<nth>[1-4一二三四]|最后一)个(周|星期)(?P<weekday>[1-7一二三四五六日天])(?P<date>.*)"
+)
+HourlyRe = re.compile(
+    r"每(?P<hours>[0-9零一二两三四五六七八九十]*)个?(小时|钟头)(?P<date>.*)"
+)
+WEEKDAY_MAP = {
+    **{str(i): i for i in range(1, 8)},
+    **{w: i for i, w in enumerate("一二三四五六日", start=1)},
+    "天": 7,
+}
+NTH_MAP = {"1": 1, "2": 2, "3": 3, "4": 4, "一": 1, "二": 2, "三": 3, "四": 4, "最后一": -1}
 
 
 class TimeUtil:
@@ -83,10 +101,10 @@ class NerUtil:
         res = self.num_extractor.parse(text)
         if not res:
             return
-        logger.info(res)
-        logger.info(res[0].num)
+        logger.debug("extract_number: %s -> %s", text, res)
         return res[0].num
 
+    @metrics.timed("ner_seconds", "时间识别耗时(秒)")
     def extract_time(
         self, text: str
     ) -> Optional[Tuple[int, Optional[JobScheduleType]]]:
@@ -100,8 +118,7 @@ class NerUtil:
         res = self.date_extractor.parse(text)
         if not res:
             return
-        logger.info(res)
-        logger.info(res[0].values[-1].value)
+        logger.debug("extract_datetime: %s -> %s", text, res)
         return res[0].values[-1].value
 
     def extract_once(self, text: str) -> Optional[int]:
@@ -127,16 +144,55 @@ class NerUtil:
         assert period, "为获取到有效周期, 请重新输入"
         return JobScheduleType.get_type(period)
 
-    def _schedule_refresh_d_datetime(self, match_weekly: str) -> timedelta:
+    def _match_rule(self, text: str) -> Optional[Tuple[recurrence.Rule, Match]]:
+        for pattern in (WorkdayRe, MonthEndRe, NthWeekdayRe, BiweeklyRe, HourlyRe):
+            match = pattern.match(text)
+            if match:
+                break
+        else:
+            return None
+
+        if pattern is WorkdayRe:
+            rule = recurrence.WeekdayRule(frozenset(range(1, 6)))
+        elif pattern is MonthEndRe:
+            rule = recurrence.MonthlyRule()
+        elif pattern is NthWeekdayRe:
+            rule = recurrence.MonthlyRule(
+                weekday=WEEKDAY_MAP[match["weekday"]], nth=NTH_MAP[match["nth"]]
+            )
+        elif pattern is BiweeklyRe:
+            rule = recurrence.IntervalRule("w", 2)
+        else:
+            hours = self.extract_number(match["hours"]) if match["hours"] else 1
+            assert isinstance(hours, int) and hours > 0, "小时数不合法"
+            rule = recurrence.IntervalRule("h", hours)
+        return rule, match
+
+    def extract_rule(self, text: str) -> Optional[Tuple[int, str]]:
+        """工作日/每月最后一天/每月第N个周X/隔周X/每N小时
+        每个工作日上午九点 -> 下次运行时间戳, 周期规则 d:12345
+        """
+        res = self._match_rule(text)
+        if not res:
+            return
+        rule, match = res
         now = TimeUtil.now_datetime()
-        start_date = self.extract_datetime(match_weekly)
-        # 处理今天周三, 询问周二, 日期获取的是昨天的情况
-        days_7 = timedelta(days=7)
-        if start_date.date() - now.date() == days_7:
-            return timedelta(days=0)
-        elif start_date.date() < now.date():
-            start_date += days_7
-        return timedelta(days=(start_date - now).days + 1)
+        given_date = match["date"]
+        d_datetime = self.extract_datetime(given_date) if given_date else None
+        if match.re is HourlyRe:
+            # 未指定时刻时从现在开始计时
+            anchor = d_datetime or now.replace(second=0, microsecond=0)
+        else:
+            assert d_datetime, "未获取到有效时间, 请重新输入"
+            # 只取时刻, 日期由规则决定
+            anchor = datetime.combine(now.date(), d_datetime.time())
+            if match.re is BiweeklyRe:
+                weekday = WEEKDAY_MAP[match["weekday"]]
+                anchor += timedelta(days=(weekday - anchor.isoweekday()) % 7)
+                if anchor <= now:
+                    anchor += timedelta(days=7)
+        next_run_time = rule.first_after(anchor, now)
+        return int(next_run_time.timestamp()), str(rule)
 
     def extract_schedule(
         self, text: str
@@ -144,6 +200,9 @@ class NerUtil:
         """返回下次时间和周期类型
         每周三下午六点 -> 下次运行时间戳, 一周的秒数
         """
+        res = self.extract_rule(text)
+        if res:
+            return res
         match_result = ScheduleRe.match(text)
 
         if not match_result:
@@ -155,21 +214,27 @@ class NerUtil:
         if match_dict["days"]:
             return self._schedule_days_process(match_dict["days"])
 
-        d_datetime = self.extract_datetime(given_date)
+        # 周期后没有时间时不再运行时间识别
+        d_datetime = self.extract_datetime(given_date) if given_date else None
 
         if not d_datetime:
             return
 
         schedule_type = self._schedule_get_type(match_dict)
+        now = TimeUtil.now_datetime()
 
         # 每周几的处理
         match_weekly = match_dict["weekly"]
         if match_weekly and len(match_weekly) != 1:
-            d_datetime += self._schedule_refresh_d_datetime(match_weekly)
-
-        if d_datetime <= TimeUtil.now_datetime():
-            next_run_time = (
-                TimeUtil.datetime2timestamp(d_datetime) + schedule_type.timestamp2now()
+            # 按星期直接计算到下一个周X的天数, 今天即周X时为 0
+            weekday = WEEKDAY_MAP[match_weekly[-1]]
+            d_datetime += timedelta(days=(weekday - now.isoweekday()) % 7)
+
+        if d_datetime <= now:
+            next_run_time = recurrence.next_run_time(
+                schedule_type.value,
+                TimeUtil.datetime2timestamp(d_datetime),
+                now=TimeUtil.datetime2timestamp(now),
             )
         else:
             next_run_time = int(d_datetime.timestamp())
@@ -232,28 +297,26 @@ class Email:
 
 
 class Decorator:
+    """标记命令/模板, 不包装函数
+    @r_command / @r_command("名称") / @r_command("名称", aliases=(...), args=(...))
+    """
+
     def __init__(self, sign: str):
         self.sign = sign
+        self.options_sign = f"{sign.rstrip('_')}_options__"
 
-    def _decorator(self, fn, cmd):
-        setattr(fn, self.sign, cmd)
+    def _decorator(self, fn, cmd, **options):
+        setattr(fn, self.sign, cmd or fn.__name__)
+        setattr(fn, self.options_sign, options)
+        return fn
 
-        if inspect.iscoroutinefunction(fn):
-            @functools.wraps(fn)
-            async def wrapper(*args, **kwargs):
-                return await fn(*args, **kwargs)
-        else:
-            @functools.wraps(fn)
-            def wrapper(*args, **kwargs):
-                return fn(*args, **kwargs)
-
-        return wrapper
-
-    def __call__(self, arg):
-        cmd = arg if isinstance(arg, str) else arg.__name__
+    def __call__(self, arg=None, **options):
         if inspect.isfunction(arg):
-            return self._decorator(arg, cmd)
-        return functools.partial(self._decorator, cmd=arg)
+            return self._decorator(arg, arg.__name__)
+        return functools.partial(self._decorator, cmd=arg, **options)
+
+    def get_options(self, fn) -> dict:
+        return getattr(fn, self.options_sign, {})
 
     def get_members(self, target) -> dict:
         ret = {}